@@ -1,78 +1,141 @@
+import time
+# 記錄程式開始時間，供啟動時間報告使用（須在其他 import 之前）
+STARTUP_BEGIN = time.perf_counter()
+
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
-from datetime import datetime
-import sqlite3
 import os
-import shutil
-import hashlib
-import subprocess
 import sys
-import tempfile
+import threading
+
+import activity_logger
+import auth
+import change_watcher
+import fixture_usage
+from change_watcher import ChangeWatcher
+from data_service import APPLY_LIST_LIMIT, ServiceError, open_backend, prepare_database, query_log_page
+from db_access import get_connection, close_all
+from paged_tree import PAGE_SIZE, PagedTreeview
+from search_index import ResultCache
+from perf import StartupTimer, timed
+from log_archive import ArchiveLocked, list_archive_months, maintain_logs, open_archive
+from products import is_valid_product_code, make_sop_filename
+from settings import (ORIGINAL_DB, LOCAL_DB, DIP_SOP_PATH, ASSEMBLY_SOP_PATH, TEST_SOP_PATH, PACKAGING_SOP_PATH,
+                      OQC_PATH, SOP_FIELDS, LOG_TABLE, LOG_ARCHIVE_DIR, SERVICE_URL)
+from sop_cache import SopDocumentCache
+from sop_index import SopFileIndex
+from sop_store import file_digest
+from sync_engine import open_local_replica, synchronize
+from tk_async import QueryRunner, run_in_background
+from transfer_manager import TransferManager, TransferQueueFull
+
+DB_NAME = LOCAL_DB
+# 設定 SERVICE_URL 時所有資料操作改經資料服務，不再複製整份資料庫到本機
+BACKEND = open_backend(SERVICE_URL, DB_NAME)
 
-from account_management_tab import build_user_management_tab
+CURRENT_LOGS = "目前紀錄"
+# 輸入關鍵字後停頓多久才查詢（毫秒）
+SEARCH_DELAY_MS = 300
 
-# 設定原始資料庫與本機暫存資料庫位置
-ORIGINAL_DB = r"C:\Users\user\Desktop\Nelson\Dev\GitHub\Troubleshooting platform\troubleshooting.db"
-LOCAL_DB = os.path.join(tempfile.gettempdir(), "troubleshooting.db")
-shutil.copy(ORIGINAL_DB, LOCAL_DB)
+# SOP 資料夾檔案索引，讓表格與開檔不必每次對網路路徑 stat
+SOP_INDEX = SopFileIndex([folder for _, folder, _ in SOP_FIELDS])
 
-DB_NAME = LOCAL_DB
+def note_uploaded(src, dst):
+    SOP_INDEX.record(dst, os.path.getsize(src), time.time())
+
+# 開啟過的 SOP 快取在本機，第一次使用時才建立
+_sop_cache = None
+
+def open_cached_sop(widget, full_path):
+    # 背景下載或驗證快取後開啟本機副本；快取失敗時直接開啟網路上的檔案
+    global _sop_cache
+    if _sop_cache is None:
+        _sop_cache = SopDocumentCache()
+    meta = SOP_INDEX.lookup(full_path) or None
+
+    def fetch():
+        with timed("file.open_sop", os.path.basename(full_path)):
+            return _sop_cache.get(full_path, meta)
 
-DIP_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\DIP_SOP"
-ASSEMBLY_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\組裝SOP"
-TEST_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\測試SOP"
-PACKAGING_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\包裝SOP"
-OQC_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\檢查表OQC"
+    run_in_background(widget, fetch, open_file,
+                      lambda e: open_file(full_path))
 
-LOG_TABLE = "activity_logs"
+# 啟動後在背景執行的工作，登出前需等待完成
+_deferred_jobs = []
+
+def run_deferred(func, *args):
+    thread = threading.Thread(target=func, args=args, daemon=True)
+    thread.start()
+    _deferred_jobs.append(thread)
 
 def init_db():
     if not os.access(DB_NAME, os.R_OK | os.W_OK):
         raise IOError(f"無法讀寫資料庫檔案：{DB_NAME}")
-    with sqlite3.connect(DB_NAME) as conn:
-        conn.execute("PRAGMA journal_mode=WAL")
+    # 取得共用連線時即完成 WAL 等 PRAGMA 設定
+    get_connection(DB_NAME)
 
 def sync_back_to_server():
-    try:
-        shutil.copy(DB_NAME, ORIGINAL_DB)
-        print("✅ 已同步本機資料庫回網路磁碟")
-    except Exception as e:
-        print(f"⚠️ 資料回寫失敗: {e}")
+    # 只推送本機有異動的資料列，不再整份覆蓋網路磁碟上的資料庫
+    with timed("sync.sync_back"):
+        stats = synchronize(DB_NAME, ORIGINAL_DB)
+    if stats is None:
+        print("⚠️ 資料回寫失敗，變更保留在本機，下次啟動時會再同步")
+    else:
+        print(f"✅ 已同步本機資料庫回網路磁碟（推送 {stats['pushed']} 筆，衝突 {stats['conflicts']} 筆）")
 
 def logout_and_exit(root):
-    sync_back_to_server()
+    change_watcher.stop_all()
+    SOP_INDEX.stop()
+    for job in _deferred_jobs:
+        job.join()
+    fixture_usage.stop_all()
+    activity_logger.stop_all()
+    close_all()
+    if not BACKEND.remote:
+        sync_back_to_server()
+    auth.end_session()
     root.destroy()
 
-def hash_password(password):
-    return hashlib.sha256(password.encode('utf-8')).hexdigest()
-
-
 def log_activity(user, action, filename):
-    with sqlite3.connect(DB_NAME) as conn:
-        conn.execute("PRAGMA journal_mode=WAL")
-        cursor = conn.cursor()
-        cursor.execute(f"""
-            INSERT INTO {LOG_TABLE} (username, action, filename, timestamp)
-            VALUES (?, ?, ?, ?)
-        """, (user, action, filename, datetime.now().isoformat()))
-        conn.commit()
+    # 交由背景寫入器批次寫入，避免每筆紀錄各自 commit
+    activity_logger.get_writer(BACKEND).log(user, action, filename)
 
 def open_file(filepath):
     try:
         if sys.platform == "win32":
             os.startfile(filepath)
         elif sys.platform == "darwin":
+            import subprocess
             subprocess.call(["open", filepath])
         else:
+            import subprocess
             subprocess.call(["xdg-open", filepath])
     except Exception as e:
         messagebox.showerror("錯誤", f"無法開啟檔案: {e}")
 
-def build_log_view_tab(tab, db_name):
+def show_callback_error(exc_type, exc, tb):
+    # 服務模式下連線或服務端錯誤以對話框提示，其餘例外維持 Tk 預設的輸出
+    if isinstance(exc, ServiceError):
+        messagebox.showerror("錯誤", f"資料服務錯誤：{exc}")
+    else:
+        import traceback
+        traceback.print_exception(exc_type, exc, tb)
+
+def build_log_view_tab(tab, backend, current_user, watcher=None):
     frame = tk.Frame(tab)
     frame.pack(fill="both", expand=True, padx=10, pady=10)
     tk.Label(frame, text="操作紀錄查詢（僅限管理者）").pack(anchor="w")
 
+    # 選擇查看目前紀錄或已封存的月份
+    source_frame = tk.Frame(frame)
+    source_frame.pack(anchor="w", pady=(0, 5))
+    tk.Label(source_frame, text="資料來源：").pack(side="left")
+    source_var = tk.StringVar(value=CURRENT_LOGS)
+    source_combo = ttk.Combobox(source_frame, textvariable=source_var, width=12, state="readonly",
+                                values=[CURRENT_LOGS] + list_archive_months(LOG_ARCHIVE_DIR))
+    source_combo.pack(side="left")
+    archive_connections = {}
+
     columns = ("使用者", "動作", "檔案名稱", "時間")
     tree = ttk.Treeview(frame, columns=columns, show="headings")
     for col in columns:
@@ -80,154 +143,219 @@ def build_log_view_tab(tab, db_name):
         tree.column(col, width=150)
     tree.pack(fill="both", expand=True)
 
+    status_var = tk.StringVar()
+
+    def show_busy(busy):
+        status_var.set("載入中…" if busy else "")
+        tree.configure(cursor="watch" if busy else "")
+
+    # 查詢在背景執行緒執行，資料庫忙碌時視窗仍可操作；來源在重新整理時取值，背景不碰 Tk 元件
+    view_state = {"source": CURRENT_LOGS}
+
+    def fetch_log_page(after, limit):
+        # 以 (timestamp, id) 做 keyset 分頁，資料再多每頁成本都一樣
+        source = view_state["source"]
+        if source == CURRENT_LOGS:
+            if after is None:
+                # 第一頁前先寫入緩衝中的紀錄，才看得到剛才的操作
+                activity_logger.flush_all()
+            rows, next_after = backend.call("fetch_logs", after=after, limit=limit)
+        else:
+            if source not in archive_connections:
+                archive_connections[source] = open_archive(LOG_ARCHIVE_DIR, source)
+            rows, next_after = query_log_page(archive_connections[source], after, limit)
+        return [(row[0], row[1:], ()) for row in rows], next_after
+
+    pager = PagedTreeview(tree, fetch_log_page, runner=QueryRunner(tree, show_busy), name="logs")
+
     def refresh_logs():
-        for row in tree.get_children():
-            tree.delete(row)
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"SELECT id, username, action, filename, timestamp FROM {LOG_TABLE} ORDER BY timestamp DESC")
-            for row in cursor.fetchall():
-                tree.insert("", "end", iid=row[0], values=row[1:])
+        view_state["source"] = source_var.get()
+        pager.reset()
 
-    refresh_button = tk.Button(frame, text="重新整理", command=refresh_logs)
-    refresh_button.pack(anchor="e", pady=5)
+    # 其他人或背景寫入的新紀錄直接補在表格最上方；有紀錄被修改或刪除時才整頁重新載入
+    change_runner = QueryRunner(tree)
+    change_state = {"high_water": None}
+
+    def insert_new_logs(rows, high_water):
+        if len(rows) >= PAGE_SIZE:
+            refresh_logs()
+        else:
+            for row in reversed(rows):
+                if not tree.exists(row[0]):
+                    tree.insert("", 0, iid=row[0], values=row[1:])
+        change_state["high_water"] = high_water
+
+    def on_logs_changed(old, new):
+        if view_state["source"] != CURRENT_LOGS:
+            return
+        if old[1] != new[1]:
+            change_state["high_water"] = new[0]
+            refresh_logs()
+            return
+        # 取較小的標記：先前被較新查詢取代而沒套用的新資料也一併補上，重複的會略過
+        after_id = old[0] or 0
+        if change_state["high_water"] is not None:
+            after_id = min(after_id, change_state["high_water"])
+        if (new[0] or 0) > after_id:
+            change_runner.submit(lambda: backend.call("fetch_logs_since", after_id=after_id, limit=PAGE_SIZE),
+                                 lambda rows: insert_new_logs(rows, new[0]))
+
+    if watcher is not None:
+        watcher.subscribe(LOG_TABLE, on_logs_changed)
+
+    source_combo.bind("<<ComboboxSelected>>", lambda e: refresh_logs())
+
+    refresh_frame = tk.Frame(frame)
+    refresh_frame.pack(anchor="e", pady=5)
+    tk.Label(refresh_frame, textvariable=status_var, fg="gray").pack(side="left", padx=5)
+    tk.Button(refresh_frame, text="取消", command=pager.cancel).pack(side="left", padx=5)
+    tk.Button(refresh_frame, text="重新整理", command=refresh_logs).pack(side="left")
 
     def delete_selected_log():
+        if source_var.get() != CURRENT_LOGS:
+            messagebox.showwarning("提醒", "封存紀錄為唯讀，無法刪除")
+            return
         selected = tree.selection()
         if not selected:
             messagebox.showwarning("提醒", "請先選取一筆操作紀錄")
             return
         if messagebox.askyesno("確認", "確定要刪除所選操作紀錄？"):
-            with sqlite3.connect(db_name) as conn:
-                cursor = conn.cursor()
-                for iid in selected:
-                    cursor.execute(f"DELETE FROM {LOG_TABLE} WHERE id=?", (iid,))
-                conn.commit()
-            refresh_logs()
+            backend.call("delete_logs", ids=[int(iid) for iid in selected], username=current_user)
+            # 直接移除表格中的項目，不必重新載入
+            tree.delete(*selected)
+            if watcher is not None:
+                watcher.acknowledge(LOG_TABLE)
     def delete_all_logs():
-        if messagebox.askyesno("確認", "⚠️ 確定要刪除所有操作紀錄？此操作無法復原。"):
-            with sqlite3.connect(db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute(f"DELETE FROM {LOG_TABLE}")
-                conn.commit()
+        # 清除前先依月份封存，保留稽核紀錄
+        if not messagebox.askyesno("確認", "⚠️ 確定要清除所有操作紀錄？紀錄會先封存，可於「資料來源」選擇月份查詢。"):
+            return
+
+        def archive():
+            # 封存要讀寫網路磁碟上的封存檔，在背景執行，回傳封存筆數與最新的月份清單
+            activity_logger.flush_all()
+            count = backend.call("archive_all_logs")
+            return count, list_archive_months(LOG_ARCHIVE_DIR)
+
+        def done(result):
+            count, months = result
+            archive_button.config(state="normal")
+            source_combo.config(values=[CURRENT_LOGS] + months)
+            messagebox.showinfo("完成", f"已封存並清除 {count} 筆操作紀錄")
             refresh_logs()
 
+        def failed(e):
+            archive_button.config(state="normal")
+            if isinstance(e, ArchiveLocked):
+                messagebox.showwarning("警告", str(e))
+            else:
+                messagebox.showerror("錯誤", f"封存操作紀錄失敗：{e}")
+
+        archive_button.config(state="disabled")
+        run_in_background(tree, archive, done, failed)
+
     button_frame = tk.Frame(frame)
     button_frame.pack(anchor="e", pady=5)
 
     tk.Button(button_frame, text="刪除所選", command=delete_selected_log).pack(side="left", padx=5)
-    tk.Button(button_frame, text="刪除全部", command=delete_all_logs).pack(side="left", padx=5)
+    archive_button = tk.Button(button_frame, text="封存並清除全部", command=delete_all_logs)
+    archive_button.pack(side="left", padx=5)
     refresh_logs()
                 
 def initialize_database():
-    with sqlite3.connect(DB_NAME) as conn:
-        conn.execute("PRAGMA journal_mode=WAL;")
-        cursor = conn.cursor()
-
-        # 建立 issues 表（僅新 DB 建立用）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS issues (
-                product_code TEXT PRIMARY KEY,
-                product_name TEXT,
-                dip_sop TEXT,
-                assembly_sop TEXT,
-                test_sop TEXT,
-                packaging_sop TEXT,
-                oqc_checklist TEXT,
-                created_by TEXT,
-                created_at TEXT
-            )
-        """)
-
-        # 🔧 自動補欄位 dip_sop（防止舊 DB 出錯）
-        cursor.execute("PRAGMA table_info(issues)")
-        columns = [row[1] for row in cursor.fetchall()]
-        if "dip_sop" not in columns:
-            cursor.execute("ALTER TABLE issues ADD COLUMN dip_sop TEXT")
-            print("✅ 已自動新增 dip_sop 欄位至 issues 表")
-
-        # 建立使用者表（如不存在）
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                password TEXT,
-                role TEXT DEFAULT 'user',
-                can_add INTEGER DEFAULT 1,
-                can_delete INTEGER DEFAULT 0,
-                active INTEGER DEFAULT 1
-            )
-        """)
-
-        # 建立操作紀錄表（如不存在）
-        cursor.execute(f"""
-            CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT,
-                action TEXT,
-                filename TEXT,
-                timestamp TEXT
-            )
-        """)
-
-        # 新增預設管理者帳號
-        cursor.execute("SELECT COUNT(*) FROM users WHERE username='Nelson'")
-        if cursor.fetchone()[0] == 0:
-            hashed_pw = hash_password("8463")
-            cursor.execute("""
-                INSERT INTO users (username, password, role, can_add, can_delete, active)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, ("Nelson", hashed_pw, "admin", 1, 1, 1))
-
-        conn.commit()
-
-def save_file(file_path, target_folder, username):
+    # 依 user_version 套用尚未執行的結構升級（建表、補欄位、索引等），並建立預設管理者帳號
+    prepare_database(DB_NAME)
+
+def find_existing_sop(file_path, target_folder):
+    # 回傳 (內容雜湊, 既有檔名)；資料夾內沒有相同內容的檔案時既有檔名為 None。
+    # 大檔案計算雜湊需要時間，只在上傳佇列的工作執行緒呼叫
+    digest = file_digest(file_path)
+    path = BACKEND.call("find_sop_file", digest=digest, folder=target_folder)
+    if path and SOP_INDEX.exists(path) is False:
+        BACKEND.call("forget_sop_file", digest=digest, folder=target_folder)
+        path = None
+    return digest, (os.path.basename(path) if path else None)
+
+def register_uploaded(digest, src, target_folder, target_path):
+    note_uploaded(src, target_path)
+    BACKEND.call("register_sop_file", digest=digest, folder=target_folder, path=target_path,
+                 size=os.path.getsize(src))
+
+def prepare_sop_upload(folders, found):
+    # 建立給 TransferManager 的 prepare：在工作執行緒計算雜湊並查詢去重登記，相同內容已存在時直接引用既有檔案。
+    # folders 為 {key: 目的資料夾}；結果記入 found[key] = (內容雜湊, 是否引用既有檔案)
+    def prepare(key, src):
+        digest, existing = find_existing_sop(src, folders[key])
+        found[key] = (digest, existing is not None)
+        if existing:
+            return os.path.join(folders[key], existing), False
+        return os.path.join(folders[key], make_sop_filename(src, digest)), True
+    return prepare
+
+def save_file(file_path, target_folder, username, transfers, on_saved, on_progress=None):
+    # 交由背景佇列上傳，完成後於主執行緒呼叫 on_saved(filename)；失敗時 filename 為空字串
     if not os.path.exists(file_path):
-        return ""
-    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-    filename = f"{timestamp}_{os.path.basename(file_path)}"
-    target_path = os.path.join(target_folder, filename)
+        on_saved("")
+        return
+    found = {}
+
+    def on_complete(results):
+        ok, info = results[file_path]
+        if not ok:
+            messagebox.showerror("錯誤", f"檔案儲存失敗: {info}")
+            on_saved("")
+            return
+        digest, reused = found[file_path]
+        filename = os.path.basename(info)
+        if reused:
+            # 相同內容已存在，直接引用既有檔案
+            log_activity(username, "reuse", filename)
+        else:
+            register_uploaded(digest, file_path, target_folder, info)
+            log_activity(username, "upload", filename)
+        on_saved(filename)
+
     try:
-        shutil.copy(file_path, target_path)
-        log_activity(username, "upload", filename)
-        return filename
-    except Exception as e:
-        messagebox.showerror("錯誤", f"檔案儲存失敗: {e}")
-        return ""
+        transfers.submit_batch([(file_path, file_path, None)], on_progress, on_complete,
+                               prepare_sop_upload({file_path: target_folder}, found))
+    except TransferQueueFull as e:
+        messagebox.showerror("錯誤", str(e))
+        on_saved("")
+
+def handle_sop_update(product_code, sop_path, field_name, entry_widget, current_user, transfers, on_done,
+                      on_progress=None):
+    path = entry_widget.get().strip()
+    if not path:
+        return
+
+    def on_saved(filename):
+        if not filename:
+            return
+        BACKEND.call("update_sop_field", product_code=product_code, column=field_name,
+                     path=os.path.join(sop_path, filename))
+        on_done(filename)
 
-def update_sop_field(cursor, product_code, field_name, new_file_path):
-    cursor.execute(f"UPDATE issues SET {field_name}=?, created_at=? WHERE product_code=?",
-                   (new_file_path, datetime.now().isoformat(), product_code))
+    save_file(path, sop_path, current_user, transfers, on_saved, on_progress)
 
 
-def handle_sop_update(product_code, sop_path, field_name, entry_widget, current_user):
-    path = entry_widget.get().strip()
-    if not path:
-        return None
-    filename = save_file(path, sop_path, current_user)
-    if not filename:
-        return None
-    with sqlite3.connect(DB_NAME) as conn:
-        cursor = conn.cursor()
-        update_sop_field(cursor, product_code, field_name, os.path.join(sop_path, filename))
-        conn.commit()
-    return filename
-
-
-def create_sop_update_button(frame, row, label, sop_path, field_name, product_code_entry, entry_widget, current_user):
+def create_sop_update_button(frame, row, label, sop_path, field_name, product_code_entry, entry_widget, current_user,
+                             transfers, report_progress):
     def update_action():
         product_code = product_code_entry.get().strip()
         if not product_code:
             messagebox.showwarning("警告", "請先輸入產品編號")
             return
-        updated_filename = handle_sop_update(product_code, sop_path, field_name, entry_widget, current_user)
-        if updated_filename:
-            messagebox.showinfo("成功", f"已更新 {label} 檔案")
-    btn = tk.Button(frame, text="更新", command=update_action)
+        handle_sop_update(product_code, sop_path, field_name, entry_widget, current_user, transfers,
+                          lambda filename: messagebox.showinfo("成功", f"已更新 {label} 檔案"),
+                          lambda key, percent: report_progress(label, percent))
+    # 修改 SOP 需要新增/修改權限（服務模式下服務端也會檢查）
+    btn = tk.Button(frame, text="更新", command=update_action,
+                    state="normal" if auth.current_session().can_add else "disabled")
     btn.grid(row=row, column=3, padx=5)
     return btn
 
 
-def create_upload_field_with_update(row, label, folder, field_name, form, product_code_entry, current_user):
+def create_upload_field_with_update(row, label, folder, field_name, form, product_code_entry, current_user,
+                                    transfers, report_progress):
     tk.Label(form, text=label).grid(row=row, column=0, sticky="e")
     entry = tk.Entry(form, width=50)
     entry.grid(row=row, column=1)
@@ -237,20 +365,132 @@ def create_upload_field_with_update(row, label, folder, field_name, form, produc
             entry.delete(0, tk.END)
             entry.insert(0, path)
     tk.Button(form, text="選擇檔案", command=browse).grid(row=row, column=2)
-    create_sop_update_button(form, row, label, folder, field_name, product_code_entry, entry, current_user)
+    create_sop_update_button(form, row, label, folder, field_name, product_code_entry, entry, current_user,
+                             transfers, report_progress)
     return entry
 
 
-def create_main_interface(root, db_name, login_info):
-    current_user = login_info['user']
-    current_role = login_info['role']
-    can_add = login_info['can_add']
-    can_delete = login_info['can_delete']
+def build_sop_apply_tab(tab, backend, session):
+    # 同一份 SOP 一次套用到多個產品：檔案只上傳一次，所有產品在同一個交易內更新
+    frame = tk.Frame(tab)
+    frame.pack(fill="both", expand=True, padx=10, pady=10)
+    if not session.can_add:
+        tk.Label(frame, text="此帳號沒有新增/修改權限，無法套用 SOP").pack(anchor="w")
+        return
+
+    form = tk.LabelFrame(frame, text="套用 SOP")
+    form.pack(fill="x", pady=5)
+    labels = [label for label, _, _ in SOP_FIELDS]
+    tk.Label(form, text="SOP 類別：").grid(row=0, column=0, sticky="e")
+    field_var = tk.StringVar(value=labels[0])
+    field_combo = ttk.Combobox(form, textvariable=field_var, values=labels, state="readonly", width=20)
+    field_combo.grid(row=0, column=1, sticky="w")
+
+    tk.Label(form, text="檔案：").grid(row=1, column=0, sticky="e")
+    entry_file = tk.Entry(form, width=50)
+    entry_file.grid(row=1, column=1)
+
+    def browse():
+        path = filedialog.askopenfilename()
+        if path:
+            entry_file.delete(0, tk.END)
+            entry_file.insert(0, path)
+    tk.Button(form, text="選擇檔案", command=browse).grid(row=1, column=2, padx=5)
+
+    tk.Label(form, text="產品篩選：").grid(row=2, column=0, sticky="e")
+    entry_pattern = tk.Entry(form, width=50)
+    entry_pattern.grid(row=2, column=1)
+    tk.Label(form, text="關鍵字，或以 * ? 比對產品編號（例如 1234*）", fg="gray").grid(row=3, column=1, sticky="w")
+
+    columns = ("產品編號", "品名", "目前 SOP")
+    tree = ttk.Treeview(frame, columns=columns, show="headings", selectmode="extended")
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=250)
+    tree.pack(fill="both", expand=True, pady=5)
+
+    status_var = tk.StringVar()
+
+    def show_busy(busy):
+        if busy:
+            status_var.set("載入中…")
+        tree.configure(cursor="watch" if busy else "")
+
+    runner = QueryRunner(tree, show_busy)
+    transfers = TransferManager(frame)
+
+    def selected_field():
+        return SOP_FIELDS[labels.index(field_var.get())]
+
+    def list_products():
+        _, _, column = selected_field()
+        pattern = entry_pattern.get().strip()
+
+        def fill(rows):
+            children = tree.get_children()
+            if children:
+                tree.delete(*children)
+            for code, name, current in rows:
+                tree.insert("", "end", iid=code, values=(code, name, os.path.basename(current or "")))
+            status_var.set(f"共 {len(rows)} 筆" + ("（已達上限，請縮小篩選範圍）" if len(rows) >= APPLY_LIST_LIMIT else ""))
+
+        runner.submit(lambda: backend.call("match_issues", pattern=pattern, column=column), fill)
+
+    tk.Button(form, text="列出產品", command=list_products).grid(row=2, column=2, padx=5)
+    entry_pattern.bind("<Return>", lambda e: list_products())
+    field_combo.bind("<<ComboboxSelected>>", lambda e: list_products())
+
+    def apply_selected():
+        codes = list(tree.selection())
+        path = entry_file.get().strip()
+        label, folder, column = selected_field()
+        if not path or not os.path.exists(path):
+            messagebox.showwarning("提醒", "請先選擇要套用的檔案")
+            return
+        if not codes:
+            messagebox.showwarning("提醒", "請先選取要套用的產品")
+            return
+        if not messagebox.askyesno("確認", f"確定要將 {os.path.basename(path)} 套用為 {len(codes)} 個產品的 {label}？"):
+            return
+
+        def on_saved(filename):
+            apply_button.config(state="normal")
+            if not filename:
+                return
+            updated = backend.call("apply_sop", product_codes=codes, column=column,
+                                   path=os.path.join(folder, filename), username=session.user)
+            # 直接更新表格中的項目，不必重新查詢
+            for code in codes:
+                if tree.exists(code):
+                    tree.set(code, "目前 SOP", filename)
+            status_var.set(f"已套用至 {updated} 筆")
+            messagebox.showinfo("成功", f"已將 {label} 套用至 {updated} 個產品")
+
+        apply_button.config(state="disabled")
+        save_file(path, folder, session.user, transfers, on_saved,
+                  lambda key, percent: status_var.set(f"上傳中 {percent}%"))
+
+    button_frame = tk.Frame(frame)
+    button_frame.pack(fill="x")
+    tk.Label(button_frame, textvariable=status_var, fg="gray").pack(side="left")
+    apply_button = tk.Button(button_frame, text="套用至選取產品", command=apply_selected, bg="lightblue")
+    apply_button.pack(side="right", padx=5)
+    tk.Button(button_frame, text="取消全選", command=lambda: tree.selection_set(())).pack(side="right", padx=5)
+    tk.Button(button_frame, text="全選", command=lambda: tree.selection_set(tree.get_children())).pack(side="right", padx=5)
+
+
+def create_main_interface(root, backend, session):
+    # 權限取自登入時建立的工作階段，不再查詢資料庫
+    current_user = session.user
+    current_role = session.role
+    can_add = session.can_add
 
 
 
     notebook = ttk.Notebook(root)
     notebook.pack(fill="both", expand=True)
+    # 資料有變動時只更新受影響的畫面，不必手動按重新整理
+    watcher = ChangeWatcher(root, backend)
 
     tabs = {
         "生產資訊": tk.Frame(notebook),
@@ -258,16 +498,53 @@ def create_main_interface(root, db_name, login_info):
         "測試BOM": tk.Frame(notebook),
         "SOP套用": tk.Frame(notebook),
         "帳號管理": tk.Frame(notebook) if current_role == "admin" else None,
-        "操作紀錄": tk.Frame(notebook) if current_role == "admin" else None
+        "操作紀錄": tk.Frame(notebook) if current_role == "admin" else None,
+        "統計分析": tk.Frame(notebook) if current_role == "admin" else None,
+        "效能監控": tk.Frame(notebook) if current_role == "admin" else None,
     }
 
     for name, frame in tabs.items():
         if frame:
             notebook.add(frame, text=name)
 
+    # 其他分頁延後到第一次切換過去時才建立；分頁模組也在這時才匯入，不計入啟動時載入模組的時間
+    def build_fixture():
+        from fixture_tab import build_fixture_tab
+        build_fixture_tab(tabs["治具管理"], backend, session)
+
+    def build_bom():
+        from bom_tab import build_bom_tab
+        build_bom_tab(tabs["測試BOM"], backend, session)
+
+    def build_accounts():
+        from account_management_tab import build_user_management_tab
+        build_user_management_tab(tabs["帳號管理"], backend, current_user, watcher)
+
+    def build_analytics():
+        from analytics_tab import build_analytics_tab
+        build_analytics_tab(tabs["統計分析"], backend, watcher)
+
+    def build_perf():
+        from perf_tab import build_perf_tab
+        build_perf_tab(tabs["效能監控"])
+
+    pending_tabs = {
+        "治具管理": build_fixture,
+        "測試BOM": build_bom,
+        "SOP套用": lambda: build_sop_apply_tab(tabs["SOP套用"], backend, session),
+    }
     if current_role == "admin":
-        build_log_view_tab(tabs["操作紀錄"], db_name)
-        build_user_management_tab(tabs["帳號管理"], db_name, current_user)
+        pending_tabs["操作紀錄"] = lambda: build_log_view_tab(tabs["操作紀錄"], backend, current_user, watcher)
+        pending_tabs["帳號管理"] = build_accounts
+        pending_tabs["統計分析"] = build_analytics
+        pending_tabs["效能監控"] = build_perf
+
+    def on_tab_changed(event):
+        builder = pending_tabs.pop(notebook.tab(notebook.select(), "text"), None)
+        if builder:
+            builder()
+
+    notebook.bind("<<NotebookTabChanged>>", on_tab_changed)
 
     frame = tabs["生產資訊"]
     form = tk.LabelFrame(frame, text="新增紀錄")
@@ -281,47 +558,81 @@ def create_main_interface(root, db_name, login_info):
     entry_name = tk.Entry(form, width=50)
     entry_name.grid(row=1, column=1)
 
-    entry_dip = create_upload_field_with_update(2, "DIP SOP", DIP_SOP_PATH, "dip_sop", form, entry_code, current_user)
-    entry_assembly = create_upload_field_with_update(3, "組裝SOP", ASSEMBLY_SOP_PATH, "assembly_sop", form, entry_code, current_user)
-    entry_test = create_upload_field_with_update(4, "測試SOP", TEST_SOP_PATH, "test_sop", form, entry_code, current_user)
-    entry_packaging = create_upload_field_with_update(5, "包裝SOP", PACKAGING_SOP_PATH, "packaging_sop", form, entry_code, current_user)
-    entry_oqc = create_upload_field_with_update(6, "檢查表OQC", OQC_PATH, "oqc_checklist", form, entry_code, current_user)
+    transfers = TransferManager(frame)
+    progress = {}
+    progress_var = tk.StringVar()
+
+    def report_progress(label, percent):
+        progress[label] = percent
+        progress_var.set("上傳進度：" + " | ".join(f"{k} {v}%" for k, v in progress.items()))
+
+    sop_fields = SOP_FIELDS
+    sop_entries = [
+        create_upload_field_with_update(row, label, folder, field_name, form, entry_code, current_user,
+                                        transfers, report_progress)
+        for row, (label, folder, field_name) in enumerate(sop_fields, start=2)
+    ]
 
     def save_data():
         code = entry_code.get().strip()
         name = entry_name.get().strip()
 
-        if len(code) not in (8, 10, 12) or not code.isdigit():
+        if not is_valid_product_code(code):
             messagebox.showerror("錯誤", "產品編號必須為 8/10/12 碼數字")
             return
 
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT product_code FROM issues WHERE product_code=?", (code,))
-            if cursor.fetchone():
+        if backend.call("issue_exists", product_code=code):
+            messagebox.showerror("錯誤", "產品編號已存在，請重新確認過。")
+            return
+
+        # 五個 SOP 平行上傳，全部完成後才寫入 issues；雜湊與去重查詢在上傳執行緒進行，內容已存在的直接引用
+        folders, found, jobs = {}, {}, []
+        for entry, (label, folder, field_name) in zip(sop_entries, sop_fields):
+            path = entry.get().strip()
+            if os.path.exists(path):
+                folders[label] = folder
+                jobs.append((label, path, None))
+
+        def on_complete(results):
+            save_button.config(state="normal")
+            failed = [f"{label}: {info}" for label, (ok, info) in results.items() if not ok]
+            if failed:
+                messagebox.showerror("錯誤", "檔案儲存失敗，未新增紀錄:\n" + "\n".join(failed))
+                return
+            filenames = {label: "" for label, _, _ in sop_fields}
+            for label, src, _ in jobs:
+                target_path = results[label][1]
+                filenames[label] = os.path.basename(target_path)
+                digest, reused = found[label]
+                if reused:
+                    log_activity(current_user, "reuse", filenames[label])
+                else:
+                    register_uploaded(digest, src, folders[label], target_path)
+                    log_activity(current_user, "upload", filenames[label])
+            sop_paths = [os.path.join(folder, filenames[label]) for label, folder, _ in sop_fields]
+            if not backend.call("insert_issue", product_code=code, product_name=name, sop_paths=sop_paths,
+                                created_by=current_user):
                 messagebox.showerror("錯誤", "產品編號已存在，請重新確認過。")
                 return
 
-            d_path = save_file(entry_dip.get().strip(), DIP_SOP_PATH, current_user)
-            a_path = save_file(entry_assembly.get().strip(), ASSEMBLY_SOP_PATH, current_user)
-            t_path = save_file(entry_test.get().strip(), TEST_SOP_PATH, current_user)
-            p_path = save_file(entry_packaging.get().strip(), PACKAGING_SOP_PATH, current_user)
-            o_path = save_file(entry_oqc.get().strip(), OQC_PATH, current_user)
-
-            cursor.execute("""
-                INSERT INTO issues (product_code, product_name, dip_sop, assembly_sop, test_sop, packaging_sop, oqc_checklist, created_by, created_at)
-                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (code, name, os.path.join(DIP_SOP_PATH, d_path), os.path.join(ASSEMBLY_SOP_PATH, a_path),
-                os.path.join(TEST_SOP_PATH, t_path), os.path.join(PACKAGING_SOP_PATH, p_path),
-                os.path.join(OQC_PATH, o_path), current_user, datetime.now().isoformat()))
-            conn.commit()
+            messagebox.showinfo("成功", "已新增紀錄")
+            for e in [entry_code, entry_name, *sop_entries]:
+                e.delete(0, tk.END)
+            progress.clear()
+            progress_var.set("")
+            query_data()
 
-        messagebox.showinfo("成功", "已新增紀錄")
-        for e in [entry_code, entry_name, entry_dip, entry_assembly, entry_test, entry_packaging, entry_oqc]:
-            e.delete(0, tk.END)
-        query_data()
+        try:
+            transfers.submit_batch(jobs, lambda label, percent: report_progress(label, percent), on_complete,
+                                   prepare_sop_upload(folders, found))
+        except TransferQueueFull as e:
+            messagebox.showerror("錯誤", str(e))
+            return
+        save_button.config(state="disabled")
 
-    tk.Button(form, text="新增紀錄", command=save_data, bg="lightblue", state="normal" if can_add else "disabled").grid(row=7, column=1, pady=10)
+    save_button = tk.Button(form, text="新增紀錄", command=save_data, bg="lightblue", state="normal" if can_add else "disabled")
+    save_button.grid(row=7, column=1, pady=10)
+    tk.Label(form, textvariable=progress_var, fg="gray").grid(row=8, column=0, columnspan=4, sticky="w")
 
     query_frame = tk.Frame(frame)
     query_frame.pack(fill="x", padx=10, pady=5)
@@ -332,7 +643,19 @@ def create_main_interface(root, db_name, login_info):
 
     def toggle_sort():
         sort_desc.set(not sort_desc.get())
-        query_data()
+        if not pager.exhausted or pending_search["id"]:
+            # 只載入了部分資料（或關鍵字剛改過），另一端的資料還沒取得，需重新查詢
+            run_search()
+            return
+        # 結果已全部載入：開頭相符的排最前不變，各組內反轉順序即可，不必再查資料庫
+        search_state["sort_desc"] = sort_desc.get()
+        keyword = search_state["keyword"]
+        items = tree.get_children()
+        matched = [item for item in items if keyword and tree.set(item, "產品編號").startswith(keyword)]
+        matched_set = set(matched)
+        others = [item for item in items if item not in matched_set]
+        for index, item in enumerate(matched[::-1] + others[::-1]):
+            tree.move(item, "", index)
 
     tk.Button(query_frame, text="↕排序", command=toggle_sort).pack(side="left", padx=5)
     tk.Button(query_frame, text="查詢", command=lambda: query_data()).pack(side="left")
@@ -344,6 +667,13 @@ def create_main_interface(root, db_name, login_info):
         tree.column(col, width=120)
     tree.pack(fill="both", expand=True, padx=10, pady=5)
 
+    status_var = tk.StringVar()
+    tk.Label(query_frame, textvariable=status_var, fg="gray").pack(side="left", padx=5)
+
+    def show_busy(busy):
+        status_var.set("查詢中…（Esc 取消）" if busy else "")
+        tree.configure(cursor="watch" if busy else "")
+
     if current_role == "admin":
         def delete_selected():
             selected_items = tree.selection()
@@ -351,18 +681,13 @@ def create_main_interface(root, db_name, login_info):
                 messagebox.showwarning("提醒", "請先選取要刪除的資料")
                 return
             if messagebox.askyesno("確認", "確定要刪除選取的資料？此操作無法復原。"):
-                deleted_items = [] 
-                with sqlite3.connect(db_name) as conn:
-                    cursor = conn.cursor()
-                    for item in selected_items:
-                        product_code = tree.item(item)['values'][0]
-                        cursor.execute("DELETE FROM issues WHERE product_code=?", (product_code,))
-                        deleted_items.append(product_code)
-                    conn.commit()
-                for code in deleted_items:
-                    log_activity(current_user, "delete", code)
-
-                query_data()
+                # 產品編號以 tree.set 取字串，避免開頭的 0 被轉成整數後遺失
+                deleted_items = [tree.set(item, "產品編號") for item in selected_items]
+                backend.call("delete_issues", product_codes=deleted_items, username=current_user)
+                # 直接移除表格中的項目，不必重新查詢；快取的分頁已過時
+                tree.delete(*selected_items)
+                result_cache.clear()
+                watcher.acknowledge("issues")
 
         delete_frame = tk.Frame(frame)
         delete_frame.pack(fill="x", padx=10, pady=(0, 5), anchor="e")
@@ -370,23 +695,117 @@ def create_main_interface(root, db_name, login_info):
         tk.Button(delete_frame, text="刪除選取資料", command=delete_selected,
                 bg="lightcoral", fg="white").pack(side="right")
 
+    # 目前表格內容對應的查詢條件；捲動載入下一頁時沿用，不受輸入中的文字影響。
+    # fetch_issue_page 在背景執行緒執行，只讀這裡的值，不碰 Tk 元件
+    search_state = {"keyword": "", "sort_desc": True}
+    result_cache = ResultCache()
+
+    def display_issue(row):
+        # 產品編號當項目代號，自動更新補上新資料時可避免重複
+        row_display = list(row)
+        for i in range(2, 6):
+            row_display[i] = os.path.basename(row_display[i]) if row_display[i] else ""
+        # 依檔案索引標示網路磁碟上已不存在的 SOP
+        missing = any(path and os.path.basename(path) and SOP_INDEX.exists(path) is False for path in row[2:7])
+        return row[0], row_display, ("missing_sop",) if missing else ()
+
+    def fetch_issue_page(after, limit):
+        keyword, desc = search_state["keyword"], search_state["sort_desc"]
+        key = (keyword, desc, tuple(after) if after else None, limit)
+        cached = result_cache.get(key)
+        if cached is not None:
+            return cached
+        rows, next_after = backend.call("search_issues", keyword=keyword, sort_desc=desc,
+                                        after=after, limit=limit)
+        page = [display_issue(row) for row in rows]
+        result_cache.put(key, (page, next_after))
+        return page, next_after
+
+    pager = PagedTreeview(tree, fetch_issue_page, runner=QueryRunner(tree, show_busy), name="issues")
+    tree.tag_configure("missing_sop", foreground="red")
+
+    pending_search = {"id": None}
+
+    def run_search():
+        if pending_search["id"]:
+            tree.after_cancel(pending_search["id"])
+            pending_search["id"] = None
+        search_state["keyword"] = entry_query.get().strip()
+        search_state["sort_desc"] = sort_desc.get()
+        pager.reset()
+
+    def on_query_key(event):
+        # 停止輸入一段時間才查詢，期間的按鍵會取消尚未執行的查詢
+        if pending_search["id"]:
+            tree.after_cancel(pending_search["id"])
+            pending_search["id"] = None
+        if entry_query.get().strip() != search_state["keyword"]:
+            pending_search["id"] = tree.after(SEARCH_DELAY_MS, run_search)
+
+    entry_query.bind("<KeyRelease>", on_query_key)
+    entry_query.bind("<Return>", lambda e: query_data())
+    entry_query.bind("<Escape>", lambda e: pager.cancel())
+
     def query_data():
-        keyword = entry_query.get().strip()
-        for row in tree.get_children():
-            tree.delete(row)
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute(f"""
-                SELECT product_code, product_name, dip_sop, assembly_sop, test_sop, packaging_sop, oqc_checklist, created_by, created_at
-                FROM issues
-                WHERE product_code LIKE ? OR product_name LIKE ?
-                ORDER BY created_at {'DESC' if sort_desc.get() else 'ASC'}
-            """, ('%' + keyword + '%', '%' + keyword + '%'))
-            for row in cursor.fetchall():
-                row_display = list(row)
-                for i in range(2, 6):
-                    row_display[i] = os.path.basename(row_display[i]) if row_display[i] else ""
-                tree.insert('', tk.END, values=row_display)
+        # 明確查詢或資料異動後呼叫，一律重新讀取資料庫
+        result_cache.clear()
+        run_search()
+
+    # 其他站台新增的產品只查詢新資料並插入目前排序中的位置；有資料被修改或刪除時才重新查詢
+    change_runner = QueryRunner(tree)
+    change_state = {"high_water": None}
+
+    def fetch_new_issues(keyword, desc, newer_than):
+        rows, _ = backend.call("search_issues", keyword=keyword, sort_desc=desc, limit=PAGE_SIZE,
+                               newer_than=newer_than)
+        return [display_issue(row) for row in rows]
+
+    def insert_new_issues(page, keyword, desc, high_water):
+        change_state["high_water"] = high_water
+        if (keyword, desc) != (search_state["keyword"], search_state["sort_desc"]):
+            return  # 條件已改變，新的查詢結果已包含這些資料
+        if len(page) >= PAGE_SIZE:
+            query_data()
+            return
+        if not desc and not pager.exhausted:
+            return  # 升冪時新資料排在最後，捲動到底時自然會載入
+        matched = 0
+        if keyword:
+            for item in tree.get_children():
+                if not tree.set(item, "產品編號").startswith(keyword):
+                    break
+                matched += 1
+        # 開頭相符的排在最前一組；降冪時新資料放在各組最前，升冪時放在各組最後
+        top, bottom = 0, matched
+        for iid, values, tags in page:
+            if tree.exists(iid):
+                continue
+            grouped = bool(keyword) and iid.startswith(keyword)
+            if desc:
+                index = top if grouped else bottom
+                top += grouped
+                bottom += 1
+            else:
+                index = matched if grouped else "end"
+                matched += grouped
+            tree.insert("", index, iid=iid, values=values, tags=tags)
+
+    def on_issues_changed(old, new):
+        result_cache.clear()
+        if old[1] != new[1]:
+            change_state["high_water"] = new[0]
+            query_data()
+            return
+        # 取較小的標記：先前被較新查詢取代而沒套用的新資料也一併補上，重複的會略過
+        newer_than = old[0] or 0
+        if change_state["high_water"] is not None:
+            newer_than = min(newer_than, change_state["high_water"])
+        if (new[0] or 0) > newer_than:
+            keyword, desc = search_state["keyword"], search_state["sort_desc"]
+            change_runner.submit(lambda: fetch_new_issues(keyword, desc, newer_than),
+                                 lambda page: insert_new_issues(page, keyword, desc, new[0]))
+
+    watcher.subscribe("issues", on_issues_changed)
 
     def on_double_click(event):
         item = tree.identify_row(event.y)
@@ -398,8 +817,13 @@ def create_main_interface(root, db_name, login_info):
             filename = tree.item(item)['values'][col_index]
             base_paths = [DIP_SOP_PATH, ASSEMBLY_SOP_PATH, TEST_SOP_PATH, PACKAGING_SOP_PATH, OQC_PATH]
             full_path = os.path.join(base_paths[col_index - 2], filename)
-            if os.path.exists(full_path):
-                open_file(full_path)
+            exists = SOP_INDEX.exists(full_path)
+            if exists is None:
+                exists = os.path.exists(full_path)
+            if exists:
+                open_cached_sop(tree, full_path)
+            elif filename:
+                messagebox.showwarning("提醒", f"找不到檔案：{filename}")
 
     def on_copy(event):
         focus = tree.focus()
@@ -416,7 +840,7 @@ def create_main_interface(root, db_name, login_info):
     tree.bind("<Control-c>", on_copy)
 
 def login():
-    result = {"user": None, "role": None, "can_add": 0, "can_delete": 0}
+    # 登入成功回傳 auth.Session，關閉視窗則回傳 None
 
     def try_login():
         u = entry_user.get().strip()
@@ -425,21 +849,16 @@ def login():
             messagebox.showerror("錯誤", "請輸入帳號與密碼")
             return
 
-        hashed_pw = hash_password(p)
-
-        with sqlite3.connect(DB_NAME) as conn:
-            conn.execute("PRAGMA journal_mode=WAL;")
-            c = conn.cursor()
-            c.execute("SELECT role, can_add, can_delete FROM users WHERE username=? AND password=? AND active=1", (u, hashed_pw))
-            r = c.fetchone()
-            if r:
-                result["user"] = u
-                result["role"] = r[0]
-                result["can_add"] = r[1]
-                result["can_delete"] = r[2]
-                login_window.destroy()
-            else:
-                messagebox.showerror("錯誤", "帳號或密碼錯誤或帳號已停用")
+        try:
+            r = BACKEND.call("authenticate", username=u, password=p)
+        except ServiceError as e:
+            messagebox.showerror("錯誤", f"無法連線資料服務：{e}")
+            return
+        if r:
+            auth.start_session(u, *r)
+            login_window.destroy()
+        else:
+            messagebox.showerror("錯誤", "帳號或密碼錯誤或帳號已停用")
 
     login_window = tk.Tk()
     login_window.title("登入系統")
@@ -462,15 +881,31 @@ def login():
     login_window.protocol("WM_DELETE_WINDOW", on_close)
     login_window.mainloop()
 
-    return result
+    return auth.current_session()
 
 if __name__ == "__main__":
-    init_db()
-    initialize_database()
-    login_info = login()
-
-    if login_info and login_info.get("user"):
+    startup = StartupTimer(STARTUP_BEGIN)
+    startup.mark("載入模組")
+    if BACKEND.remote:
+        # 服務模式：資料庫由服務端持有並負責升級與封存，本機不需複製
+        startup.skip()
+    else:
+        with timed("sync.startup_replica"):
+            open_local_replica(ORIGINAL_DB, LOCAL_DB)
+        startup.mark("資料庫同步")
+        init_db()
+        initialize_database()
+        startup.mark("資料庫初始化")
+    session = login()
+    startup.skip()
+
+    if session:
+        # 補齊統計與封存舊操作紀錄會讀寫網路磁碟，放到背景執行
+        if not BACKEND.remote:
+            run_deferred(maintain_logs, DB_NAME, LOG_ARCHIVE_DIR)
+        SOP_INDEX.start()
         root = tk.Tk()
+        root.report_callback_exception = show_callback_error
         root.title("生產資訊平台")
         root.geometry("1000x750")
         try:
@@ -490,12 +925,14 @@ if __name__ == "__main__":
         # 主內容區域
         main_frame = tk.Frame(root)
         main_frame.pack(fill="both", expand=True)
-        create_main_interface(main_frame, DB_NAME, login_info)
+        create_main_interface(main_frame, BACKEND, session)
 
         def on_close():
             logout_and_exit(root)
         root.protocol("WM_DELETE_WINDOW", on_close)
 
+        startup.mark("建立主視窗")
+        root.after_idle(startup.report)
         root.mainloop()
     else:
         print("⚠️ 使用者未登入或登入失敗，系統結束。")
\ No newline at end of file
@@ -1,9 +1,14 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-import hashlib
+import time
 
-def build_user_management_tab(tab, db_name, current_user):
+from perf import TIMER
+from tk_async import QueryRunner
+
+# 篩選選項 -> data_service.list_users 的 status
+USER_FILTERS = {"全部": "all", "僅啟用": "active", "僅停用": "inactive"}
+
+def build_user_management_tab(tab, backend, current_user, watcher=None):
     frame = tk.Frame(tab)
     frame.pack(fill="both", expand=True, padx=10, pady=10)
     tk.Label(frame, text="帳號管理（僅限管理者）").pack(anchor="w")
@@ -31,24 +36,38 @@ def build_user_management_tab(tab, db_name, current_user):
         tree.column(col, width=100)
     tree.pack(fill="both", expand=True, pady=5)
 
+    status_var = tk.StringVar()
+    tk.Label(control_frame, textvariable=status_var, fg="gray").pack(side="left", padx=10)
+
+    def show_busy(busy):
+        status_var.set("載入中…" if busy else "")
+        tree.configure(cursor="watch" if busy else "")
+
+    # 查詢在背景執行，條件先在主執行緒取值；連續切換時只套用最後一次的結果
+    runner = QueryRunner(tree, show_busy)
+    tree.tag_configure("disabled", foreground="gray")
+
+    # 自動更新時保留原本選取的帳號；選取沒有改變就不重新填入編輯中的欄位
+    select_state = {"filled": ()}
+
+    def fill_users(rows, started):
+        selected = tree.selection()
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        for row in rows:
+            tags = ("disabled",) if row[4] == 0 else ()
+            tree.insert("", "end", iid=row[0], values=row, tags=tags)
+        restored = [iid for iid in selected if tree.exists(iid)]
+        if restored:
+            tree.selection_set(restored)
+        TIMER.record("ui.users", (time.perf_counter() - started) * 1000, f"{len(rows)} 筆")
+
     def refresh_users():
-        for row in tree.get_children():
-            tree.delete(row)
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            sql = "SELECT username, role, can_add, can_delete, active FROM users"
-            condition = filter_var.get()
-            if condition == "僅啟用":
-                sql += " WHERE active=1"
-            elif condition == "僅停用":
-                sql += " WHERE active=0"
-            sql += f" ORDER BY username {'ASC' if sort_asc.get() else 'DESC'}"
-            cursor.execute(sql)
-            for row in cursor.fetchall():
-                tags = ("disabled",) if row[4] == 0 else ()
-                tree.insert("", "end", values=row, tags=tags)
-
-        tree.tag_configure("disabled", foreground="gray")
+        status, ascending = USER_FILTERS[filter_var.get()], sort_asc.get()
+        started = time.perf_counter()
+        runner.submit(lambda: backend.call("list_users", status=status, ascending=ascending),
+                      lambda rows: fill_users(rows, started))
 
     filter_combo.bind("<<ComboboxSelected>>", lambda e: refresh_users())
 
@@ -76,9 +95,6 @@ def build_user_management_tab(tab, db_name, current_user):
     tk.Checkbutton(form, text="可刪除", variable=var_delete).grid(row=3, column=1, sticky="w")
     tk.Checkbutton(form, text="啟用", variable=var_active).grid(row=4, column=0)
 
-    def hash_password(password):
-        return hashlib.sha256(password.encode("utf-8")).hexdigest()
-
     def add_user():
         new_user = entry_user.get().strip()
         new_pw = entry_pass.get().strip()
@@ -91,20 +107,10 @@ def build_user_management_tab(tab, db_name, current_user):
             messagebox.showwarning("警告", "請填寫帳號與密碼")
             return
 
-        hashed_pw = hash_password(new_pw)
-
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT username FROM users WHERE username=?", (new_user,))
-            if cursor.fetchone():
-                messagebox.showerror("錯誤", "該使用者已存在")
-                return
-
-            cursor.execute("""
-                INSERT INTO users (username, password, role, can_add, can_delete, active)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (new_user, hashed_pw, role, can_add, can_delete, active))
-            conn.commit()
+        if not backend.call("add_user", username=new_user, password=new_pw, role=role,
+                            can_add=can_add, can_delete=can_delete, active=active):
+            messagebox.showerror("錯誤", "該使用者已存在")
+            return
 
         messagebox.showinfo("成功", "使用者已新增")
         entry_user.delete(0, tk.END)
@@ -139,8 +145,9 @@ def build_user_management_tab(tab, db_name, current_user):
 
     def on_select_user(event):
         selected = tree.selection()
-        if not selected:
+        if not selected or selected == select_state["filled"]:
             return
+        select_state["filled"] = selected
         item = tree.item(selected[0])["values"]
         entry_edit_user.delete(0, tk.END)
         entry_edit_user.insert(0, item[0])
@@ -164,28 +171,11 @@ def build_user_management_tab(tab, db_name, current_user):
         new_username = entry_edit_user.get().strip()
         new_pass = entry_edit_pass.get().strip()
 
-        with sqlite3.connect(db_name) as conn:
-            cursor = conn.cursor()
-            if new_username and new_username != original_username:
-                cursor.execute("SELECT username FROM users WHERE username=?", (new_username,))
-                if cursor.fetchone():
-                    messagebox.showerror("錯誤", "新帳號名稱已存在")
-                    return
-                cursor.execute("UPDATE users SET username=? WHERE username=?", (new_username, original_username))
-                original_username = new_username
-
-            if new_pass:
-                hashed_pw = hash_password(new_pass)
-                cursor.execute("""
-                    UPDATE users SET password=?, role=?, can_add=?, can_delete=?, active=?
-                    WHERE username=?
-                """, (hashed_pw, role_edit.get(), edit_add.get(), edit_delete.get(), edit_active.get(), original_username))
-            else:
-                cursor.execute("""
-                    UPDATE users SET role=?, can_add=?, can_delete=?, active=?
-                    WHERE username=?
-                """, (role_edit.get(), edit_add.get(), edit_delete.get(), edit_active.get(), original_username))
-            conn.commit()
+        if not backend.call("update_user", username=str(original_username), new_username=new_username,
+                            password=new_pass, role=role_edit.get(),
+                            can_add=edit_add.get(), can_delete=edit_delete.get(), active=edit_active.get()):
+            messagebox.showerror("錯誤", "新帳號名稱已存在")
+            return
 
         messagebox.showinfo("成功", "已更新")
         entry_edit_user.delete(0, tk.END)
@@ -204,14 +194,15 @@ def build_user_management_tab(tab, db_name, current_user):
             messagebox.showerror("錯誤", "無法刪除自己")
             return
         if messagebox.askyesno("確認", f"是否確定要刪除帳號「{username}」？"):
-            with sqlite3.connect(db_name) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM users WHERE username=?", (username,))
-                conn.commit()
+            backend.call("delete_user", username=str(username))
             messagebox.showinfo("成功", "使用者已刪除")
             refresh_users()
 
     tk.Button(frame, text="刪除選取帳號", command=delete_user, bg="#ff9999").pack(pady=5, ipady=5)
 
+    if watcher is not None:
+        # 帳號資料很少，有變動時整個清單重新讀取
+        watcher.subscribe("users", lambda old, new: refresh_users())
+
     refresh_users()
     return tree, refresh_users
\ No newline at end of file
@@ -0,0 +1,94 @@
+import threading
+from datetime import datetime
+
+# 操作紀錄先暫存在記憶體，定時或累積到一定筆數再以單一交易批次寫入；
+# 寫入經由資料存取後端（data_service），直接開檔與服務模式共用
+FLUSH_INTERVAL = 2.0
+MAX_BUFFER = 100
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class ActivityLogWriter:
+    def __init__(self, backend, flush_interval=FLUSH_INTERVAL, max_buffer=MAX_BUFFER):
+        self.backend = backend
+        self._flush_interval = flush_interval
+        self._max_buffer = max_buffer
+        self._buffer = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, user, action, filename):
+        with self._lock:
+            self._buffer.append((user, action, filename, datetime.now().isoformat()))
+            full = len(self._buffer) >= self._max_buffer
+        if full:
+            self._wake.set()
+
+    def log_many(self, entries):
+        # entries: [(user, action, filename), ...]，共用同一個時間戳記
+        timestamp = datetime.now().isoformat()
+        with self._lock:
+            self._buffer.extend((user, action, filename, timestamp) for user, action, filename in entries)
+            full = len(self._buffer) >= self._max_buffer
+        if full:
+            self._wake.set()
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                pending, self._buffer = self._buffer, []
+            if not pending:
+                return 0
+            try:
+                self.backend.call("log_events", entries=pending)
+            except Exception:
+                # 寫入失敗時放回緩衝區，下次再試
+                with self._lock:
+                    self._buffer[:0] = pending
+                raise
+            return len(pending)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ 操作紀錄寫入失敗: {e}")
+
+
+def get_writer(backend):
+    with _writers_lock:
+        writer = _writers.get(backend.key)
+        if writer is None:
+            writer = _writers[backend.key] = ActivityLogWriter(backend)
+        return writer
+
+
+def flush_all():
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.flush()
+
+
+def stop_all():
+    # 登出前呼叫：寫入剩餘紀錄並停止背景執行緒
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
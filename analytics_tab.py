@@ -0,0 +1,131 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import date, timedelta
+
+from settings import SOP_FIELDS, LOG_TABLE
+from tk_async import QueryRunner
+
+# 統計分析只讀彙總表（activity_daily / sop_upload_daily），不掃描操作紀錄
+PERIODS = ("本月", "上月", "近 30 天", "今年")
+# 分組選項 -> (activity_totals 的 by, 第一欄標題)
+GROUPS = {"依使用者": ("username", "使用者"), "依日期": ("day", "日期")}
+FOLDER_LABELS = {folder: label for label, folder, _ in SOP_FIELDS}
+
+
+def period_range(period, today=None):
+    # 回傳 (開始日, 結束日)，皆含當日
+    today = today or date.today()
+    if period == "本月":
+        return today.replace(day=1), today
+    if period == "上月":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    if period == "近 30 天":
+        return today - timedelta(days=29), today
+    return today.replace(month=1, day=1), today
+
+
+def build_analytics_tab(tab, backend, watcher=None):
+    frame = tk.Frame(tab)
+    frame.pack(fill="both", expand=True, padx=10, pady=10)
+    tk.Label(frame, text="操作統計（僅限管理者，封存後的紀錄仍會計入）").pack(anchor="w")
+
+    control_frame = tk.Frame(frame)
+    control_frame.pack(anchor="w", pady=(0, 5))
+    tk.Label(control_frame, text="期間：").pack(side="left")
+    period_var = tk.StringVar(value=PERIODS[0])
+    period_combo = ttk.Combobox(control_frame, textvariable=period_var, values=PERIODS, width=10, state="readonly")
+    period_combo.pack(side="left")
+    entry_start = tk.Entry(control_frame, width=12)
+    entry_start.pack(side="left", padx=(10, 0))
+    tk.Label(control_frame, text="～").pack(side="left")
+    entry_end = tk.Entry(control_frame, width=12)
+    entry_end.pack(side="left")
+    tk.Label(control_frame, text="分組：").pack(side="left", padx=(10, 0))
+    group_var = tk.StringVar(value="依使用者")
+    group_combo = ttk.Combobox(control_frame, textvariable=group_var, values=list(GROUPS), width=10, state="readonly")
+    group_combo.pack(side="left")
+    status_var = tk.StringVar()
+
+    activity_tree = ttk.Treeview(frame, show="headings", height=14)
+    activity_tree.pack(fill="both", expand=True, pady=5)
+
+    tk.Label(frame, text="各 SOP 資料夾新存放的檔案（內容重複而直接引用的不計）").pack(anchor="w")
+    upload_columns = ("資料夾", "檔案數", "大小(MB)")
+    upload_tree = ttk.Treeview(frame, columns=upload_columns, show="headings", height=6)
+    for col in upload_columns:
+        upload_tree.heading(col, text=col)
+        upload_tree.column(col, width=300 if col == "資料夾" else 100, anchor="w" if col == "資料夾" else "e")
+    upload_tree.pack(fill="x", pady=5)
+
+    def show_busy(busy):
+        status_var.set("查詢中…" if busy else "")
+        activity_tree.configure(cursor="watch" if busy else "")
+
+    runner = QueryRunner(activity_tree, show_busy)
+
+    def clear(tree):
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+
+    def fill(result, heading):
+        activity_rows, upload_rows = result
+        # 動作轉成欄位：每列一個使用者（或日期），最後一欄為合計
+        actions = sorted({action for _, action, _ in activity_rows})
+        columns = (heading, *actions, "合計")
+        clear(activity_tree)
+        activity_tree["columns"] = columns
+        for col in columns:
+            activity_tree.heading(col, text=col)
+            activity_tree.column(col, width=150 if col == columns[0] else 90, anchor="w" if col == columns[0] else "e")
+        table = {}
+        for key, action, count in activity_rows:
+            table.setdefault(key, {})[action] = count
+        totals = {action: 0 for action in actions}
+        for key, counts in table.items():
+            for action, count in counts.items():
+                totals[action] += count
+            activity_tree.insert("", "end", values=(key, *(counts.get(a, 0) for a in actions), sum(counts.values())))
+        if table:
+            activity_tree.insert("", "end", values=("合計", *totals.values(), sum(totals.values())))
+
+        clear(upload_tree)
+        for folder, files, size in upload_rows:
+            upload_tree.insert("", "end", values=(FOLDER_LABELS.get(folder, folder), files, f"{size / 1048576:.1f}"))
+
+    def query_stats(quiet=False):
+        # quiet：自動更新時呼叫，期間輸入到一半不跳出錯誤
+        start, end = entry_start.get().strip(), entry_end.get().strip()
+        try:
+            if date.fromisoformat(start) > date.fromisoformat(end):
+                raise ValueError
+        except ValueError:
+            if not quiet:
+                messagebox.showerror("錯誤", "請輸入正確的期間（YYYY-MM-DD，開始日不可晚於結束日）")
+            return
+        by, heading = GROUPS[group_var.get()]
+        runner.submit(lambda: (backend.call("activity_totals", start_day=start, end_day=end, by=by),
+                               backend.call("upload_totals", start_day=start, end_day=end)),
+                      lambda result: fill(result, heading))
+
+    def on_period_selected(event=None):
+        start, end = period_range(period_var.get())
+        for entry, value in ((entry_start, start), (entry_end, end)):
+            entry.delete(0, tk.END)
+            entry.insert(0, value.isoformat())
+        query_stats()
+
+    period_combo.bind("<<ComboboxSelected>>", on_period_selected)
+    group_combo.bind("<<ComboboxSelected>>", lambda e: query_stats())
+    entry_start.bind("<Return>", lambda e: query_stats())
+    entry_end.bind("<Return>", lambda e: query_stats())
+    tk.Button(control_frame, text="查詢", command=query_stats).pack(side="left", padx=10)
+    tk.Label(control_frame, textvariable=status_var, fg="gray").pack(side="left")
+
+    if watcher is not None:
+        # 彙總表很小，有新的操作紀錄就重新統計
+        watcher.subscribe(LOG_TABLE, lambda old, new: query_stats(quiet=True))
+
+    on_period_selected()
+    return query_stats
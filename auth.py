@@ -0,0 +1,100 @@
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import sys
+import time
+
+from settings import PASSWORD_ITERATIONS
+
+# 密碼雜湊與登入工作階段：GUI、帳號管理與資料服務共用。
+# 新密碼以加鹽的 PBKDF2-SHA256 儲存為 "pbkdf2_sha256$次數$鹽$雜湊"；
+# 舊版的無鹽 SHA-256（64 位十六進位）仍可登入，登入成功時自動改存新格式
+ALGORITHM = "pbkdf2_sha256"
+SALT_BYTES = 16
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii")
+
+
+def hash_password(password, iterations=None):
+    iterations = iterations or PASSWORD_ITERATIONS
+    salt = os.urandom(SALT_BYTES)
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), salt, iterations)
+    return f"{ALGORITHM}${iterations}${_b64(salt)}${_b64(digest)}"
+
+
+def verify_password(password, stored):
+    """回傳 (是否正確, 是否需要以目前設定重新雜湊)。"""
+    if not stored:
+        return False, False
+    if stored.startswith(ALGORITHM + "$"):
+        try:
+            _, iterations, salt, expected = stored.split("$")
+            iterations = int(iterations)
+            digest = hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), base64.b64decode(salt), iterations)
+        except ValueError:
+            return False, False
+        ok = hmac.compare_digest(_b64(digest), expected)
+        return ok, ok and iterations != PASSWORD_ITERATIONS
+    # 舊版格式：無鹽 SHA-256
+    legacy = hashlib.sha256(password.encode("utf-8")).hexdigest()
+    ok = hmac.compare_digest(legacy, stored)
+    return ok, ok
+
+
+class Session:
+    """登入後的使用者與權限，整個工作階段只查詢一次資料庫。"""
+
+    def __init__(self, user, role, can_add, can_delete):
+        self.user = user
+        self.role = role
+        self.can_add = bool(can_add)
+        self.can_delete = bool(can_delete)
+
+    @property
+    def is_admin(self):
+        return self.role == "admin"
+
+
+_session = None
+
+
+def start_session(user, role, can_add, can_delete):
+    global _session
+    _session = Session(user, role, can_add, can_delete)
+    return _session
+
+
+def current_session():
+    return _session
+
+
+def end_session():
+    global _session
+    _session = None
+
+
+def calibrate(target_ms=100, password="calibration"):
+    # 估算在本機上 PBKDF2 耗時約 target_ms 的次數，供設定 PASSWORD_ITERATIONS 參考
+    iterations = 10000
+    start = time.perf_counter()
+    hashlib.pbkdf2_hmac("sha256", password.encode("utf-8"), os.urandom(SALT_BYTES), iterations)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    return max(10000, int(iterations * target_ms / max(elapsed_ms, 0.001)) // 1000 * 1000)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="估算登入驗證耗時約為指定毫秒數的 PBKDF2 次數")
+    parser.add_argument("--target-ms", type=int, default=100)
+    args = parser.parse_args(argv)
+    iterations = calibrate(args.target_ms)
+    print(f"建議 PBKDF2 次數：{iterations}（目前設定 {PASSWORD_ITERATIONS}）")
+    print(f"可設定環境變數 TROUBLESHOOTING_PBKDF2_ITERATIONS={iterations}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+import argparse
+import csv
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+import activity_logger
+from data_service import LocalBackend
+from db_access import get_connection, close_all
+from migrations import run_migrations
+from products import is_valid_product_code, make_sop_filename
+from settings import ORIGINAL_DB, LOCAL_DB, SOP_FIELDS
+from sop_store import file_digest, find_stored, register_stored
+from sync_engine import open_local_replica, synchronize
+from transfer_manager import copy_file
+
+# 批次匯入產品與 SOP（不開啟 GUI）：
+#   python batch_import.py manifest.csv --user Nelson
+# 清單欄位可用英文欄位名或 GUI 上的中文標題，SOP 欄位填本機檔案路徑，可留空
+HEADER_ALIASES = {
+    "product_code": "product_code", "產品編號": "product_code",
+    "product_name": "product_name", "品名": "product_name",
+}
+for _label, _folder, _column in SOP_FIELDS:
+    HEADER_ALIASES[_column] = _column
+    HEADER_ALIASES[_label] = _column
+
+DEFAULT_WORKERS = 8
+
+
+def _read_csv(path):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return [dict(row) for row in csv.DictReader(f)]
+
+
+def _read_excel(path):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ImportError("讀取 Excel 清單需要安裝 openpyxl（pip install openpyxl），或改用 CSV") from None
+    sheet = openpyxl.load_workbook(path, read_only=True, data_only=True).active
+    rows = sheet.iter_rows(values_only=True)
+    header = [str(h or "").strip() for h in next(rows, [])]
+    return [{h: ("" if v is None else str(v)) for h, v in zip(header, row)} for row in rows]
+
+
+def read_rows(path):
+    # CSV 或 Excel 的每一列轉成 {標題: 值}；測試BOM 匯入也共用。未安裝 openpyxl 時讀取 Excel 會丟出 ImportError
+    return _read_excel(path) if path.lower().endswith((".xlsx", ".xlsm")) else _read_csv(path)
+
+
+def read_manifest(path):
+    raw = read_rows(path)
+    records = []
+    for raw_row in raw:
+        row = {}
+        for header, value in raw_row.items():
+            key = HEADER_ALIASES.get((header or "").strip())
+            if key:
+                row[key] = (value or "").strip()
+        records.append(row)
+    return records
+
+
+def validate_manifest(records, existing_codes):
+    """回傳 (可匯入的紀錄, 錯誤列表)；錯誤為 (清單列號, 訊息)，列號從 2 起算（第 1 列為標題）。"""
+    valid, errors, seen = [], [], set()
+    for line, row in enumerate(records, start=2):
+        code = row.get("product_code", "")
+        if not is_valid_product_code(code):
+            errors.append((line, f"產品編號 {code!r} 必須為 8/10/12 碼數字"))
+            continue
+        if code in existing_codes:
+            errors.append((line, f"產品編號 {code} 已存在"))
+            continue
+        if code in seen:
+            errors.append((line, f"產品編號 {code} 在清單中重複"))
+            continue
+        missing = [row[column] for _, _, column in SOP_FIELDS if row.get(column) and not os.path.exists(row[column])]
+        if missing:
+            errors.append((line, f"找不到檔案: {', '.join(missing)}"))
+            continue
+        seen.add(code)
+        valid.append(row)
+    return valid, errors
+
+
+def import_manifest(db_name, manifest_path, username, workers=DEFAULT_WORKERS, dry_run=False):
+    records = read_manifest(manifest_path)
+    conn = get_connection(db_name)
+    existing = {row[0] for row in conn.execute("SELECT product_code FROM issues")}
+    valid, errors = validate_manifest(records, existing)
+    for line, message in errors:
+        print(f"⚠️ 第 {line} 列：{message}")
+    print(f"清單共 {len(records)} 筆，可匯入 {len(valid)} 筆，略過 {len(errors)} 筆")
+    if dry_run or not valid:
+        return {"total": len(records), "imported": 0, "skipped": len(errors)}
+
+    # 相同內容的檔案（來源路徑不同也一樣）在每個資料夾只上傳一次，多個產品共用；
+    # 資料夾內已有相同內容的檔案則直接引用。以下皆以 (內容雜湊, 資料夾) 為鍵
+    digests = {}
+    targets, sources, reused = {}, {}, set()
+    for row in valid:
+        for _, folder, column in SOP_FIELDS:
+            src = row.get(column)
+            if not src:
+                continue
+            if src not in digests:
+                digests[src] = file_digest(src)
+            key = (digests[src], folder)
+            if key in targets:
+                continue
+            sources[key] = src
+            stored = find_stored(conn, key[0], folder)
+            if stored:
+                targets[key] = stored
+                reused.add(key)
+            else:
+                targets[key] = os.path.join(folder, make_sop_filename(src, key[0]))
+
+    failed = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(copy_file, sources[key], dst): key
+                   for key, dst in targets.items() if key not in reused}
+        for future in as_completed(futures):
+            done += 1
+            key = futures[future]
+            src = sources[key]
+            try:
+                future.result()
+                print(f"[{done}/{len(futures)}] 已上傳 {os.path.basename(src)}")
+            except OSError as e:
+                failed[key] = str(e)
+                print(f"[{done}/{len(futures)}] ⚠️ 上傳失敗 {src}: {e}")
+
+    now = datetime.now().isoformat()
+    rows, log_entries, skipped = [], [], len(errors)
+    for row in valid:
+        keys = [((digests[row[column]], folder) if row.get(column) else None, folder)
+                for _, folder, column in SOP_FIELDS]
+        if any(key in failed for key, _ in keys if key):
+            print(f"⚠️ {row['product_code']} 有 SOP 上傳失敗，未匯入")
+            skipped += 1
+            continue
+        paths = [targets[key] if key else os.path.join(folder, "") for key, folder in keys]
+        rows.append((row["product_code"], row.get("product_name", ""), *paths, username, now))
+        log_entries.append((username, "import", row["product_code"]))
+    log_entries += [(username, "reuse" if key in reused else "upload", os.path.basename(dst))
+                    for key, dst in targets.items() if key not in failed]
+
+    # 所有產品與新上傳檔案的去重登記在同一個交易內寫入
+    with conn:
+        for key, dst in targets.items():
+            if key not in reused and key not in failed:
+                digest, folder = key
+                register_stored(conn, digest, folder, dst, os.path.getsize(sources[key]))
+        columns = ", ".join(column for _, _, column in SOP_FIELDS)
+        conn.executemany(f"""
+            INSERT INTO issues (product_code, product_name, {columns}, created_by, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    writer = activity_logger.get_writer(LocalBackend(db_name))
+    writer.log_many(log_entries)
+    writer.flush()
+    print(f"✅ 已匯入 {len(rows)} 筆產品，略過 {skipped} 筆")
+    return {"total": len(records), "imported": len(rows), "skipped": skipped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次匯入產品與 SOP 檔案")
+    parser.add_argument("manifest", help="CSV 或 Excel (.xlsx) 清單")
+    parser.add_argument("--user", required=True, help="記錄於 created_by 與操作紀錄的帳號")
+    parser.add_argument("--db", help="直接寫入指定資料庫檔案（不經本機副本同步）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="平行上傳數")
+    parser.add_argument("--dry-run", action="store_true", help="只檢查清單，不上傳也不寫入")
+    args = parser.parse_args(argv)
+
+    db_name = args.db or LOCAL_DB
+    if not args.db:
+        open_local_replica(ORIGINAL_DB, LOCAL_DB)
+    with get_connection(db_name) as conn:
+        run_migrations(conn)
+    try:
+        result = import_manifest(db_name, args.manifest, args.user, args.workers, args.dry_run)
+    except ImportError as e:
+        print(f"⚠️ {e}")
+        return 1
+    finally:
+        activity_logger.stop_all()
+        close_all()
+    if not args.db and not args.dry_run:
+        synchronize(LOCAL_DB, ORIGINAL_DB)
+    return 0 if result["imported"] or args.dry_run else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
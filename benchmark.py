@@ -0,0 +1,247 @@
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import activity_logger
+from data_service import LocalBackend, prepare_database
+from db_access import get_connection, close_all
+from settings import SOP_FIELDS
+from sync_engine import download_full_copy, synchronize
+
+# 效能基準測試（不開啟 GUI）：產生假資料後量測主要程式路徑，結果輸出為 JSON 方便比較版本
+#   python benchmark.py --issues 100000 --logs 1000000 --output result.json
+# 量測的是 GUI 實際呼叫的 data_service 操作、操作紀錄寫入器與本機副本同步
+NAME_WORDS = ["主機板", "電源", "測試", "組裝", "模組", "控制器", "工業電腦", "網路卡", "顯示卡", "散熱器",
+              "風扇", "外殼", "連接線", "觸控", "面板", "背板", "擴充卡", "嵌入式", "閘道器", "伺服器"]
+ACTIONS = ["upload", "reuse", "import", "delete"]
+DEFAULT_REPEAT = 5
+PAGE_SIZE = 200
+
+
+def _random_code(rng, used):
+    while True:
+        code = "".join(rng.choice("0123456789") for _ in range(rng.choice((8, 10, 12))))
+        if code not in used:
+            used.add(code)
+            return code
+
+
+def generate_data(db_name, issues, users, logs, seed=0):
+    """產生假資料：issues 的品名為中文詞組、SOP 欄位指向各資料夾，時間分散在最近兩年。"""
+    rng = random.Random(seed)
+    now = datetime.now()
+    usernames = [f"user{i:04d}" for i in range(users)]
+    conn = get_connection(db_name)
+    used = {row[0] for row in conn.execute("SELECT product_code FROM issues")}
+
+    def issue_rows():
+        for _ in range(issues):
+            code = _random_code(rng, used)
+            name = "".join(rng.sample(NAME_WORDS, rng.randint(2, 4)))
+            created = now - timedelta(seconds=rng.randint(0, 2 * 365 * 86400))
+            paths = [os.path.join(folder, f"{created:%Y%m%d%H%M%S}_{code}_{label}.pdf")
+                     for label, folder, _ in SOP_FIELDS]
+            yield (code, name, *paths, rng.choice(usernames), created.isoformat())
+
+    def log_rows():
+        for _ in range(logs):
+            timestamp = now - timedelta(seconds=rng.randint(0, 90 * 86400))
+            yield (rng.choice(usernames), rng.choice(ACTIONS), f"{rng.randint(0, 10 ** 8):08d}.pdf",
+                   timestamp.isoformat())
+
+    columns = ", ".join(column for _, _, column in SOP_FIELDS)
+    with conn:
+        # 暫停變更日誌觸發器：假資料視為伺服器上原有的資料，不需要同步
+        conn.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES ('suspend', '1')")
+        conn.executemany("""
+            INSERT OR IGNORE INTO users (username, password, role, can_add, can_delete, active)
+            VALUES (?, '', 'user', 1, 0, 1)
+        """, [(name,) for name in usernames])
+        conn.executemany(f"""
+            INSERT INTO issues (product_code, product_name, {columns}, created_by, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, issue_rows())
+        conn.executemany("""
+            INSERT INTO activity_logs (username, action, filename, timestamp) VALUES (?, ?, ?, ?)
+        """, log_rows())
+        conn.execute("DELETE FROM sync_meta WHERE key='suspend'")
+    conn.execute("ANALYZE")
+
+
+def measure(func, repeat):
+    # 回傳每次執行的毫秒數
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        runs.append((time.perf_counter() - start) * 1000)
+    return runs
+
+
+def summarize(runs):
+    ordered = sorted(runs)
+    return {
+        "runs": len(runs),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "max_ms": round(ordered[-1], 3),
+    }
+
+
+def _scroll(backend, operation, pages, **params):
+    # 模擬一路捲動載入 pages 頁
+    after = None
+    for _ in range(pages):
+        _, after = backend.call(operation, after=after, limit=PAGE_SIZE, **params)
+        if after is None:
+            break
+
+
+def run_benchmarks(workdir, issues, users, logs, repeat=DEFAULT_REPEAT, seed=0):
+    server_db = os.path.join(workdir, "server.db")
+    local_db = os.path.join(workdir, "local.db")
+    results = {}
+
+    def record(name, runs):
+        results[name] = summarize(runs)
+        print(f"⏱ {name:<28} 中位數 {results[name]['median_ms']:10.2f} ms")
+
+    record("initialize_database.empty", measure(lambda: prepare_database(server_db), 1))
+    start = time.perf_counter()
+    generate_data(server_db, issues, users, logs, seed)
+    generate_seconds = time.perf_counter() - start
+    print(f"✅ 已產生 {issues} 筆產品、{users} 個帳號、{logs} 筆操作紀錄（{generate_seconds:.1f} 秒）")
+    record("initialize_database.existing", measure(lambda: prepare_database(server_db), repeat))
+
+    backend = LocalBackend(server_db)
+    conn = get_connection(server_db)
+    sample_code, sample_name = conn.execute(
+        "SELECT product_code, product_name FROM issues ORDER BY random() LIMIT 1").fetchone() or ("", "")
+    keywords = {
+        "all": "",
+        "code_prefix": sample_code[:2],
+        "code_exact": sample_code,
+        "name_trigram": sample_name[:3],
+        "no_match": "不存在的關鍵字",
+    }
+    for label, keyword in keywords.items():
+        record(f"search.{label}", measure(lambda: backend.call("search_issues", keyword=keyword, limit=PAGE_SIZE),
+                                          repeat))
+    record("search.scroll_10_pages", measure(lambda: _scroll(backend, "search_issues", 10, keyword=""), repeat))
+
+    # 測試BOM：四階、約 6000 筆用料，料號由 3000 個共用零件中抽取
+    rng = random.Random(seed)
+    bom = []
+    for a in range(10):
+        bom.append(["", f"ASM{a}", 1, ""])
+        for b in range(10):
+            bom.append([f"ASM{a}", f"SUB{a}-{b}", 2, ""])
+            for c in range(10):
+                bom.append([f"SUB{a}-{b}", f"BRD{a}-{b}-{c}", 1, ""])
+                bom += [[f"BRD{a}-{b}-{c}", f"PART{p:04d}", rng.randint(1, 4), ""] for p in rng.sample(range(3000), 5)]
+    if sample_code:
+        record("bom.import_6000_lines", measure(
+            lambda: backend.call("import_bom", boms={sample_code: bom}, username="bench"), repeat))
+        record("bom.explode", measure(lambda: backend.call("explode_bom", product_code=sample_code), repeat))
+        record("bom.explode_summary", measure(
+            lambda: backend.call("explode_bom", product_code=sample_code, summarize=True), repeat))
+        record("bom.where_used", measure(lambda: backend.call("where_used", part_code=bom[-1][1]), repeat))
+
+    record("refresh_logs.first_page", measure(lambda: backend.call("fetch_logs", limit=PAGE_SIZE), repeat))
+    record("refresh_logs.scroll_10_pages", measure(lambda: _scroll(backend, "fetch_logs", 10), repeat))
+
+    # 統計分析讀彙總表，不隨操作紀錄筆數成長
+    month_start = datetime.now().replace(day=1).date().isoformat()
+    today = datetime.now().date().isoformat()
+    record("analytics.month_by_user", measure(
+        lambda: backend.call("activity_totals", start_day=month_start, end_day=today), repeat))
+    record("analytics.month_by_day", measure(
+        lambda: backend.call("activity_totals", start_day=month_start, end_day=today, by="day"), repeat))
+
+    writer = activity_logger.get_writer(backend)
+
+    def log_burst():
+        for i in range(1000):
+            writer.log("bench", "upload", f"bench_{i}.pdf")
+        writer.flush()
+    record("log_activity.1000_entries", measure(log_burst, repeat))
+    activity_logger.stop_all()
+
+    # 本機副本：整份下載、本機有異動後的增量同步、沒有異動的同步
+    close_all()
+    record("sync.full_copy", measure(lambda: download_full_copy(server_db, local_db), repeat))
+    local = LocalBackend(local_db)
+
+    def sync_after_changes():
+        for i in range(100):
+            local.call("log_events", entries=[("bench", "sync", f"sync_{i}.pdf", datetime.now().isoformat())])
+        close_all()
+        if synchronize(local_db, server_db) is None:
+            raise RuntimeError("同步失敗")
+    record("sync.push_100_changes", measure(sync_after_changes, repeat))
+    record("sync.no_changes", measure(lambda: synchronize(local_db, server_db), repeat))
+    close_all()
+
+    return {
+        "dataset": {"issues": issues, "users": users, "logs": logs, "seed": seed,
+                    "generate_seconds": round(generate_seconds, 3),
+                    "db_bytes": os.path.getsize(server_db)},
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="產生假資料並量測主要操作的效能，輸出 JSON")
+    parser.add_argument("--issues", type=int, default=10000, help="產品筆數（建議 1 萬到 100 萬）")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logs", type=int, default=100000, help="操作紀錄筆數")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="每項量測執行次數")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--label", default="", help="記錄在結果中的標記，例如版本號")
+    parser.add_argument("--output", help="輸出 JSON 檔案；未指定時輸出到標準輸出")
+    parser.add_argument("--keep", action="store_true", help="保留產生的資料庫檔案")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="troubleshooting_bench_")
+    try:
+        # 進度與資料庫升級訊息輸出到 stderr，stdout 只留 JSON 結果
+        with contextlib.redirect_stdout(sys.stderr):
+            report = run_benchmarks(workdir, args.issues, args.users, args.logs, args.repeat, args.seed)
+    finally:
+        activity_logger.stop_all()
+        close_all()
+        if args.keep:
+            print(f"資料庫保留於 {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+    report = {
+        "label": args.label,
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        **report,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✅ 結果已寫入 {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
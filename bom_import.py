@@ -0,0 +1,100 @@
+import argparse
+import os
+import sys
+
+from batch_import import read_rows
+from data_service import LocalBackend, prepare_database
+from db_access import close_all
+from products import is_valid_product_code
+from settings import ORIGINAL_DB, LOCAL_DB
+from sync_engine import open_local_replica, synchronize
+
+# 批次匯入測試BOM（不開啟 GUI），多個檔案在同一個交易內寫入：
+#   python bom_import.py 123456789012.csv 234567890123.xlsx --user Nelson
+# 每列為一個用料；上階料號留空表示直接用於產品。也可改用「階層」欄（1 為產品下第一階），
+# 依前面各列自動推出上階。產品編號取自「產品編號」欄、--product 或檔名
+HEADER_ALIASES = {
+    "product_code": "product_code", "產品編號": "product_code",
+    "parent_code": "parent_code", "上階料號": "parent_code",
+    "child_code": "child_code", "part_code": "child_code", "料號": "child_code",
+    "quantity": "quantity", "用量": "quantity",
+    "description": "description", "說明": "description", "品名規格": "description",
+    "level": "level", "階層": "level",
+}
+
+
+def read_bom_file(path, product_code=None):
+    """讀取 BOM 檔，回傳 {產品編號: [[上階料號, 料號, 用量, 說明], ...]}；格式錯誤時拋出 ValueError。"""
+    default_product = product_code or os.path.splitext(os.path.basename(path))[0]
+    boms = {}
+    stack = []
+    for line, raw_row in enumerate(read_rows(path), start=2):
+        row = {}
+        for header, value in raw_row.items():
+            key = HEADER_ALIASES.get((header or "").strip())
+            if key:
+                row[key] = (value or "").strip()
+        child = row.get("child_code", "")
+        if not child:
+            continue
+        product = row.get("product_code") or default_product
+        if not is_valid_product_code(product):
+            raise ValueError(f"{os.path.basename(path)} 第 {line} 列：產品編號 {product!r} 必須為 8/10/12 碼數字")
+        parent = row.get("parent_code", "")
+        if not parent and row.get("level"):
+            try:
+                level = int(float(row["level"]))
+            except ValueError:
+                raise ValueError(f"{os.path.basename(path)} 第 {line} 列：階層 {row['level']!r} 不是數字")
+            if level < 1 or level > len(stack) + 1:
+                raise ValueError(f"{os.path.basename(path)} 第 {line} 列：階層 {level} 與上一列不連續")
+            del stack[level - 1:]
+            parent = stack[-1] if stack else ""
+            stack.append(child)
+        boms.setdefault(product, []).append([parent, child, row.get("quantity") or "1", row.get("description", "")])
+    return boms
+
+
+def read_bom_files(paths, product_code=None):
+    boms = {}
+    for path in paths:
+        for product, items in read_bom_file(path, product_code).items():
+            boms.setdefault(product, []).extend(items)
+    return boms
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="批次匯入測試BOM")
+    parser.add_argument("files", nargs="+", help="CSV 或 Excel (.xlsx) BOM 檔")
+    parser.add_argument("--user", required=True, help="記錄於操作紀錄的帳號")
+    parser.add_argument("--product", help="檔案中沒有產品編號欄時使用的產品編號（預設取檔名）")
+    parser.add_argument("--db", help="直接寫入指定資料庫檔案（不經本機副本同步）")
+    args = parser.parse_args(argv)
+
+    try:
+        boms = read_bom_files(args.files, args.product)
+    except (ImportError, ValueError) as e:
+        print(f"⚠️ {e}")
+        return 1
+    db_name = args.db or LOCAL_DB
+    if not args.db:
+        open_local_replica(ORIGINAL_DB, LOCAL_DB)
+    prepare_database(db_name)
+    try:
+        unknown = LocalBackend(db_name).call("import_bom", boms=boms, username=args.user)
+    except ValueError as e:
+        print(f"⚠️ {e}")
+        return 1
+    finally:
+        close_all()
+    if unknown:
+        print(f"⚠️ 找不到產品編號：{', '.join(unknown)}，未匯入")
+        return 1
+    print(f"✅ 已匯入 {len(boms)} 個產品、共 {sum(len(items) for items in boms.values())} 筆用料")
+    if not args.db:
+        synchronize(LOCAL_DB, ORIGINAL_DB)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
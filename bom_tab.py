@@ -0,0 +1,146 @@
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox
+
+from bom_import import read_bom_files
+from data_service import BOM_ROW_LIMIT
+from tk_async import QueryRunner, run_in_background
+
+def _format_quantity(value):
+    return f"{value:g}"
+
+
+def build_bom_tab(tab, backend, session):
+    frame = tk.Frame(tab)
+    frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+    query_frame = tk.Frame(frame)
+    query_frame.pack(fill="x", pady=(0, 5))
+    tk.Label(query_frame, text="產品編號 / 料號：").pack(side="left")
+    entry_code = tk.Entry(query_frame, width=25)
+    entry_code.pack(side="left")
+    summarize_var = tk.BooleanVar(value=False)
+    status_var = tk.StringVar()
+
+    # 樹狀欄位顯示料號，展開時為下階、反查時為上階
+    columns = ("用量", "總用量", "說明")
+    tree = ttk.Treeview(frame, columns=columns, show="tree headings")
+    tree.heading("#0", text="料號")
+    tree.column("#0", width=260)
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=300 if col == "說明" else 90, anchor="w" if col == "說明" else "e")
+    tree.pack(fill="both", expand=True, pady=5)
+    tree.tag_configure("product", foreground="blue")
+
+    def show_busy(busy):
+        if busy:
+            status_var.set("查詢中…")
+        tree.configure(cursor="watch" if busy else "")
+
+    runner = QueryRunner(tree, show_busy)
+
+    def clear_tree():
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+
+    def show_status(count, label):
+        suffix = f"（僅顯示前 {BOM_ROW_LIMIT} 筆）" if count >= BOM_ROW_LIMIT else ""
+        status_var.set(f"{label}共 {count} 筆{suffix}")
+
+    def fill_explosion(rows):
+        clear_tree()
+        tree.heading("#0", text="料號")
+        tree.heading("總用量", text="總用量")
+        for level, path, parent, child, quantity, total, description in rows:
+            # 路徑依序排列，上階項目一定已經插入
+            parent_path = path[:path.rstrip("/").rfind("/") + 1]
+            tree.insert(parent_path if level > 1 else "", "end", iid=path, text=child, open=level < 2,
+                        values=(_format_quantity(quantity), _format_quantity(total), description or ""))
+        show_status(len(rows), "展開")
+
+    def fill_summary(rows):
+        clear_tree()
+        tree.heading("#0", text="料號")
+        tree.heading("總用量", text="總用量")
+        for child, total, count, description in rows:
+            tree.insert("", "end", text=child, values=(f"{count} 處", _format_quantity(total), description or ""))
+        show_status(len(rows), "彙總")
+
+    def fill_where_used(rows):
+        clear_tree()
+        tree.heading("#0", text="上階料號 / 產品")
+        tree.heading("總用量", text="")
+        for level, path, parent, child, quantity, is_product in rows:
+            parent_path = path[:path.rstrip("/").rfind("/") + 1]
+            tree.insert(parent_path if level > 1 else "", "end", iid=path, text=parent, open=True,
+                        tags=("product",) if is_product else (),
+                        values=(_format_quantity(quantity), "", "產品" if is_product else ""))
+        show_status(len(rows), "反查")
+
+    def explode():
+        code = entry_code.get().strip()
+        if not code:
+            return
+        if summarize_var.get():
+            runner.submit(lambda: backend.call("explode_bom", product_code=code, summarize=True), fill_summary)
+        else:
+            runner.submit(lambda: backend.call("explode_bom", product_code=code), fill_explosion)
+
+    def where_used():
+        code = entry_code.get().strip()
+        if code:
+            runner.submit(lambda: backend.call("where_used", part_code=code), fill_where_used)
+
+    tk.Button(query_frame, text="展開", command=explode).pack(side="left", padx=5)
+    tk.Checkbutton(query_frame, text="彙總用量", variable=summarize_var).pack(side="left")
+    tk.Button(query_frame, text="反查使用處", command=where_used).pack(side="left", padx=5)
+    tk.Label(query_frame, textvariable=status_var, fg="gray").pack(side="left", padx=5)
+    entry_code.bind("<Return>", lambda e: explode())
+
+    if session.can_add:
+        def import_files():
+            paths = filedialog.askopenfilenames(title="選擇 BOM 檔",
+                                                filetypes=[("BOM", "*.csv *.xlsx *.xlsm"), ("All files", "*.*")])
+            if not paths:
+                return
+
+            def work():
+                boms = read_bom_files(paths)
+                return boms, backend.call("import_bom", boms=boms, username=session.user)
+
+            def done(result):
+                boms, unknown = result
+                status_var.set("")
+                if unknown:
+                    messagebox.showerror("錯誤", "找不到產品編號：" + ", ".join(unknown))
+                    return
+                messagebox.showinfo("成功", f"已匯入 {len(boms)} 個產品、共 "
+                                            f"{sum(len(items) for items in boms.values())} 筆用料")
+                if len(boms) == 1:
+                    entry_code.delete(0, tk.END)
+                    entry_code.insert(0, next(iter(boms)))
+                    explode()
+
+            def failed(e):
+                status_var.set("")
+                messagebox.showerror("匯入失敗", str(e))
+
+            # 寫入不走 QueryRunner，避免被之後送出的查詢取代而沒有執行
+            status_var.set("匯入中…")
+            run_in_background(tree, work, done, failed)
+
+        tk.Button(query_frame, text="匯入 BOM 檔", command=import_files, bg="lightblue").pack(side="right", padx=5)
+
+    if session.is_admin:
+        def delete_bom():
+            code = entry_code.get().strip()
+            if code and messagebox.askyesno("確認", f"確定要刪除產品「{code}」的第一階 BOM？"):
+                backend.call("delete_bom", product_code=code, username=session.user)
+                clear_tree()
+                status_var.set("")
+
+        tk.Button(query_frame, text="刪除 BOM", command=delete_bom,
+                  bg="lightcoral", fg="white").pack(side="right", padx=5)
+
+    return tree
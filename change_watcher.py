@@ -0,0 +1,90 @@
+import queue
+import threading
+
+from db_access import get_connection, close_thread_connections
+from settings import CHANGE_POLL_SECONDS, REMOTE_CHANGE_POLL_SECONDS
+
+# 資料變更偵測：背景執行緒定時檢查，有變動的資料表才通知訂閱的畫面，畫面只補上新資料或重新載入自己。
+# 直接開檔模式先看 PRAGMA data_version（其他連線或程式寫入後才會改變，幾乎不花成本），
+# 有變化才讀各資料表的變更標記；服務模式則定時呼叫服務端的 change_marks
+_watchers = []
+_watchers_lock = threading.Lock()
+
+
+class ChangeWatcher:
+    def __init__(self, widget, backend, interval=None):
+        self._widget = widget
+        self._backend = backend
+        self._interval = interval or (REMOTE_CHANGE_POLL_SECONDS if backend.remote else CHANGE_POLL_SECONDS)
+        self._subscribers = {}
+        self._marks = None
+        self._lock = threading.Lock()
+        self._changes = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="change-watcher", daemon=True)
+        self._thread.start()
+        self._widget.after(int(self._interval * 1000), self._dispatch)
+        with _watchers_lock:
+            _watchers.append(self)
+
+    def subscribe(self, table, callback):
+        # callback(舊標記, 新標記) 在主執行緒呼叫；標記為 [最大 rowid, 最後修改/刪除的變更序號]
+        self._subscribers.setdefault(table, []).append(callback)
+
+    def acknowledge(self, table):
+        # 畫面已自行套用剛才的寫入（例如直接從表格移除），更新標記，避免再通知一次
+        marks = self._backend.call("change_marks")
+        with self._lock:
+            if self._marks is not None:
+                self._marks[table] = marks[table]
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        version = None
+        try:
+            while not self._stop.wait(self._interval):
+                try:
+                    if not self._backend.remote:
+                        conn = get_connection(self._backend.db_name)
+                        current = conn.execute("PRAGMA data_version").fetchone()[0]
+                        if current == version:
+                            continue
+                        version = current
+                    marks = self._backend.call("change_marks")
+                except Exception as e:
+                    print(f"⚠️ 資料變更偵測失敗: {e}")
+                    continue
+                with self._lock:
+                    previous, self._marks = self._marks, marks
+                if previous is None:
+                    continue
+                for table, mark in marks.items():
+                    if previous.get(table) != mark:
+                        self._changes.put((table, previous.get(table), mark))
+        finally:
+            close_thread_connections()
+
+    def _dispatch(self):
+        if self._stop.is_set():
+            return
+        # 先排下一次，訂閱者拋出例外時輪詢也不會中斷
+        self._widget.after(int(self._interval * 1000), self._dispatch)
+        while True:
+            try:
+                table, old, new = self._changes.get_nowait()
+            except queue.Empty:
+                break
+            for callback in self._subscribers.get(table, ()):
+                callback(old, new)
+
+
+def stop_all():
+    # 登出前呼叫
+    with _watchers_lock:
+        watchers = list(_watchers)
+        _watchers.clear()
+    for watcher in watchers:
+        watcher.stop()
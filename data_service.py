@@ -0,0 +1,834 @@
+import argparse
+import json
+import os
+import secrets
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from auth import hash_password, verify_password
+from db_access import get_connection, close_all, close_thread_connections
+from log_archive import ArchiveLocked, archive_logs, maintain_logs
+from migrations import run_migrations
+from perf import timed
+from search_index import ISSUE_COLUMNS, search_issues_page
+from settings import ORIGINAL_DB, SOP_FIELDS, LOG_TABLE, LOG_ARCHIVE_DIR, SERVICE_PORT
+from sop_store import find_stored, forget_stored, register_stored
+from sync_engine import prune_journal
+
+# 資料存取後端：GUI 需要的 issues / users / 操作紀錄操作都集中在這裡。
+# 直接開檔模式在本機資料庫上執行；服務模式由一台主機執行 serve() 持有資料庫，
+# 各用戶端經 HTTP/JSON 呼叫同名操作，寫入在服務端統一排隊，用戶端只傳輸查詢結果。
+# 服務模式除了 authenticate 之外都需要登入取得的權杖，權限與操作者帳號一律由服務端依權杖判定。
+#   python data_service.py --db troubleshooting.db --host 0.0.0.0 --port 8765
+SOP_COLUMNS = {column for _, _, column in SOP_FIELDS}
+DEFAULT_ADMIN = ("Nelson", "8463")
+# SOP 套用一次最多列出的產品數
+APPLY_LIST_LIMIT = 5000
+# 測試BOM 展開/反查的最大階數與列數（階數同時防止資料中有循環）
+BOM_MAX_DEPTH = 20
+BOM_ROW_LIMIT = 20000
+# 自動更新畫面時偵測變更的資料表
+WATCHED_TABLES = ("issues", "users", LOG_TABLE)
+USER_FILTERS = {"all": "", "active": " WHERE active=1", "inactive": " WHERE active=0"}
+# 服務模式沒有同步流程替伺服器清理變更日誌，由服務每隔這段時間自行清理
+JOURNAL_PRUNE_SECONDS = 24 * 3600
+
+# 操作名稱 -> 函式(db_name, **params)；回傳值必須能轉成 JSON
+OPERATIONS = {}
+WRITE_OPERATIONS = set()
+# 服務模式的權限檢查：操作名稱 -> "add" / "delete" / "admin"，未列出的操作登入後即可使用
+PERMISSIONS = {}
+# 記錄操作者的參數名稱：服務模式一律以登入的帳號覆寫，不採用用戶端傳來的值
+ACTOR_PARAMS = {}
+
+
+class ServiceError(Exception):
+    pass
+
+
+def operation(writes=False, permission=None, actor=None):
+    def register(func):
+        OPERATIONS[func.__name__] = func
+        if writes:
+            WRITE_OPERATIONS.add(func.__name__)
+        if permission:
+            PERMISSIONS[func.__name__] = permission
+        if actor:
+            ACTOR_PARAMS[func.__name__] = actor
+        return func
+    return register
+
+
+def is_permitted(permission, role, can_add, can_delete):
+    if permission is None:
+        return True
+    if permission == "add":
+        return bool(can_add)
+    if permission == "delete":
+        return bool(can_delete) or role == "admin"
+    return role == "admin"
+
+
+def prepare_database(db_name):
+    # 套用結構升級並建立預設管理者帳號
+    with get_connection(db_name) as conn:
+        run_migrations(conn)
+        username, password = DEFAULT_ADMIN
+        if conn.execute("SELECT COUNT(*) FROM users WHERE username=?", (username,)).fetchone()[0] == 0:
+            conn.execute("""
+                INSERT INTO users (username, password, role, can_add, can_delete, active)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (username, hash_password(password), "admin", 1, 1, 1))
+
+
+def query_log_page(conn, after, limit):
+    """以 (timestamp, id) 做 keyset 分頁查詢操作紀錄，回傳 (rows, next_after)；封存資料庫也共用此查詢。"""
+    sql = f"SELECT id, username, action, filename, timestamp FROM {LOG_TABLE}"
+    params = []
+    if after is not None:
+        sql += " WHERE (timestamp, id) < (?, ?)"
+        params += list(after)
+    sql += " ORDER BY timestamp DESC, id DESC LIMIT ?"
+    params.append(limit)
+    rows = conn.execute(sql, params).fetchall()
+    next_after = (rows[-1][4], rows[-1][0]) if len(rows) == limit else None
+    return rows, next_after
+
+
+def _audit(conn, username, action, filename):
+    conn.execute(f"INSERT INTO {LOG_TABLE} (username, action, filename, timestamp) VALUES (?, ?, ?, ?)",
+                 (username, action, filename, datetime.now().isoformat()))
+
+
+# === 變更偵測 ===
+
+@operation()
+def change_marks(db_name):
+    """各資料表回傳 [最大 rowid, 最後一次修改或刪除的變更序號]。
+
+    新增資料只會讓前者變大，之後的修改或刪除（包含其他站台同步上來的）會改變後者；
+    兩者都只讀主鍵與索引的尾端，資料再多成本都一樣。
+    """
+    conn = get_connection(db_name)
+    marks = {}
+    for table in WATCHED_TABLES:
+        marks[table] = list(conn.execute(f"""
+            SELECT (SELECT MAX(rowid) FROM {table}),
+                   MAX(COALESCE((SELECT MAX(seq) FROM sync_journal WHERE table_name=? AND op='U'), 0),
+                       COALESCE((SELECT MAX(seq) FROM sync_journal WHERE table_name=? AND op='D'), 0))
+        """, (table, table)).fetchone())
+    return marks
+
+
+# === 生產資訊 ===
+
+@operation()
+def search_issues(db_name, keyword="", sort_desc=True, after=None, limit=200, newer_than=None):
+    return search_issues_page(get_connection(db_name), keyword, sort_desc, after, limit, newer_than)
+
+
+@operation()
+def issue_exists(db_name, product_code):
+    conn = get_connection(db_name)
+    return conn.execute("SELECT 1 FROM issues WHERE product_code=?", (product_code,)).fetchone() is not None
+
+
+@operation(writes=True, permission="add", actor="created_by")
+def insert_issue(db_name, product_code, product_name, sop_paths, created_by):
+    # sop_paths 依 SOP_FIELDS 順序；產品編號已存在時回傳 False
+    columns = ", ".join(column for _, _, column in SOP_FIELDS)
+    try:
+        with get_connection(db_name) as conn:
+            conn.execute(f"""
+                INSERT INTO issues (product_code, product_name, {columns}, created_by, created_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (product_code, product_name, *sop_paths, created_by, datetime.now().isoformat()))
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+@operation()
+def match_issues(db_name, pattern, column, limit=APPLY_LIST_LIMIT):
+    """SOP 套用用的產品清單，回傳 [[產品編號, 品名, 該欄位目前的 SOP], ...]。
+
+    pattern 含 * ? [ 時以 GLOB 比對產品編號（開頭固定時走主鍵索引），否則與生產資訊查詢相同。
+    """
+    if column not in SOP_COLUMNS:
+        raise ValueError(f"未知的 SOP 欄位：{column}")
+    conn = get_connection(db_name)
+    if any(ch in pattern for ch in "*?["):
+        return conn.execute(f"""
+            SELECT product_code, product_name, {column} FROM issues
+            WHERE product_code GLOB ? ORDER BY product_code LIMIT ?
+        """, (pattern, limit)).fetchall()
+    index = [c.strip() for c in ISSUE_COLUMNS.split(",")].index(column)
+    rows, _ = search_issues_page(conn, pattern, limit=limit)
+    return [(row[0], row[1], row[index]) for row in rows]
+
+
+@operation(writes=True, permission="add", actor="username")
+def apply_sop(db_name, product_codes, column, path, username):
+    # 同一份 SOP 套用到多個產品：一個 UPDATE、一筆稽核紀錄，在同一個交易內完成
+    if column not in SOP_COLUMNS:
+        raise ValueError(f"未知的 SOP 欄位：{column}")
+    with get_connection(db_name) as conn:
+        updated = conn.execute(f"""
+            UPDATE issues SET {column}=?, created_at=?
+            WHERE product_code IN (SELECT value FROM json_each(?))
+        """, (path, datetime.now().isoformat(), json.dumps(product_codes))).rowcount
+        if updated:
+            _audit(conn, username, "apply_sop", f"{os.path.basename(path)} → {column} × {updated}")
+    return updated
+
+
+@operation(writes=True, permission="add")
+def update_sop_field(db_name, product_code, column, path):
+    if column not in SOP_COLUMNS:
+        raise ValueError(f"未知的 SOP 欄位：{column}")
+    with get_connection(db_name) as conn:
+        conn.execute(f"UPDATE issues SET {column}=?, created_at=? WHERE product_code=?",
+                     (path, datetime.now().isoformat(), product_code))
+
+
+@operation(writes=True, permission="delete", actor="username")
+def delete_issues(db_name, product_codes, username):
+    # 以 json_each 展開清單，一個 DELETE 刪除全部，稽核紀錄在同一個交易內寫入一筆
+    selection = "product_code IN (SELECT value FROM json_each(?))"
+    params = (json.dumps(product_codes),)
+    with get_connection(db_name) as conn:
+        # 稽核只記錄實際存在的產品編號（其他站台可能已先刪除）
+        existing = [row[0] for row in conn.execute(f"SELECT product_code FROM issues WHERE {selection}", params)]
+        if existing:
+            conn.execute(f"DELETE FROM issues WHERE {selection}", params)
+            _audit(conn, username, "delete", ", ".join(existing))
+    return len(existing)
+
+
+# === SOP 檔案去重登記 ===
+
+@operation()
+def find_sop_file(db_name, digest, folder):
+    return find_stored(get_connection(db_name), digest, folder)
+
+
+@operation(writes=True, permission="add")
+def register_sop_file(db_name, digest, folder, path, size):
+    with get_connection(db_name) as conn:
+        register_stored(conn, digest, folder, path, size)
+
+
+@operation(writes=True, permission="add")
+def forget_sop_file(db_name, digest, folder):
+    with get_connection(db_name) as conn:
+        forget_stored(conn, digest, folder)
+
+
+# === 操作紀錄 ===
+
+@operation(permission="admin")
+def fetch_logs(db_name, after=None, limit=200):
+    return query_log_page(get_connection(db_name), after, limit)
+
+
+@operation(permission="admin")
+def fetch_logs_since(db_name, after_id, limit=200):
+    # 自動更新用：只取 id 大於 after_id 的新紀錄，排序與 fetch_logs 相同
+    return get_connection(db_name).execute(f"""
+        SELECT id, username, action, filename, timestamp FROM {LOG_TABLE}
+        WHERE id > ? ORDER BY timestamp DESC, id DESC LIMIT ?
+    """, (after_id, limit)).fetchall()
+
+
+@operation(writes=True, actor="username")
+def log_events(db_name, entries, username=None):
+    # entries: [(user, action, filename, timestamp), ...]；服務模式以 username（登入的帳號）取代每筆的 user
+    if username:
+        entries = [(username, *entry[1:]) for entry in entries]
+    with get_connection(db_name) as conn:
+        conn.executemany(f"""
+            INSERT INTO {LOG_TABLE} (username, action, filename, timestamp)
+            VALUES (?, ?, ?, ?)
+        """, entries)
+    return len(entries)
+
+
+@operation(writes=True, permission="admin", actor="username")
+def delete_logs(db_name, ids, username):
+    with get_connection(db_name) as conn:
+        deleted = conn.execute(f"DELETE FROM {LOG_TABLE} WHERE id IN (SELECT value FROM json_each(?))",
+                               (json.dumps(ids),)).rowcount
+        if deleted:
+            _audit(conn, username, "delete_logs", f"{deleted} 筆")
+    return deleted
+
+
+@operation(writes=True, permission="admin")
+def archive_all_logs(db_name):
+    # 封存資料夾固定為設定中的位置，不接受用戶端指定路徑
+    return archive_logs(db_name, LOG_ARCHIVE_DIR)
+
+
+# === 統計分析 ===
+
+@operation(permission="admin")
+def activity_totals(db_name, start_day, end_day, by="username"):
+    """由彙總表統計 start_day ~ end_day（含，YYYY-MM-DD）的操作次數，
+    回傳 [[使用者或日期, 動作, 次數], ...]；by 為 "username" 或 "day"。"""
+    if by not in ("username", "day"):
+        raise ValueError(f"未知的分組方式：{by}")
+    return get_connection(db_name).execute(f"""
+        SELECT {by}, action, SUM(count) FROM activity_daily
+        WHERE day BETWEEN ? AND ? GROUP BY {by}, action HAVING SUM(count) > 0 ORDER BY {by}, action
+    """, (start_day, end_day)).fetchall()
+
+
+@operation(permission="admin")
+def upload_totals(db_name, start_day, end_day):
+    """各 SOP 資料夾在期間內新存放的檔案數與大小，回傳 [[資料夾, 檔案數, 位元組], ...]。"""
+    return get_connection(db_name).execute("""
+        SELECT folder, SUM(files), SUM(bytes) FROM sop_upload_daily
+        WHERE day BETWEEN ? AND ? GROUP BY folder HAVING SUM(files) > 0 ORDER BY folder
+    """, (start_day, end_day)).fetchall()
+
+
+# === 治具管理 ===
+
+FIXTURE_COLUMNS = """
+    f.fixture_id, f.name, f.location,
+    (SELECT COALESCE(SUM(u.uses), 0) FROM fixture_usage u WHERE u.fixture_id = f.fixture_id),
+    f.usage_limit, f.last_calibrated, f.calibration_due,
+    (SELECT group_concat(p.product_code, ', ') FROM fixture_products p WHERE p.fixture_id = f.fixture_id)
+"""
+
+
+@operation()
+def find_fixtures(db_name, keyword="", limit=500):
+    """依治具編號開頭或適用的產品編號開頭查詢治具；回傳
+    [[治具編號, 名稱, 位置, 使用次數, 使用上限, 上次校正, 下次校正, 適用產品], ...]。"""
+    conn = get_connection(db_name)
+    if not keyword:
+        return conn.execute(f"SELECT {FIXTURE_COLUMNS} FROM fixtures f ORDER BY f.fixture_id LIMIT ?",
+                            (limit,)).fetchall()
+    # 以範圍比較取代 LIKE，兩個方向都能走主鍵/索引
+    low, high = keyword, keyword + "\uffff"
+    return conn.execute(f"""
+        SELECT {FIXTURE_COLUMNS} FROM fixtures f
+        WHERE f.fixture_id >= ? AND f.fixture_id < ?
+           OR f.fixture_id IN (SELECT fixture_id FROM fixture_products
+                               WHERE product_code >= ? AND product_code < ?)
+        ORDER BY f.fixture_id LIMIT ?
+    """, (low, high, low, high, limit)).fetchall()
+
+
+@operation(writes=True, permission="add", actor="username")
+def save_fixture(db_name, fixture_id, name, location, usage_limit, last_calibrated, calibration_due,
+                 product_codes, username):
+    """新增或修改治具並更新適用產品；回傳 issues 中不存在的產品編號，有的話不寫入。"""
+    conn = get_connection(db_name)
+    known = {row[0] for row in conn.execute(
+        "SELECT product_code FROM issues WHERE product_code IN (SELECT value FROM json_each(?))",
+        (json.dumps(product_codes),))}
+    unknown = [code for code in product_codes if code not in known]
+    if unknown:
+        return unknown
+    with conn:
+        conn.execute("""
+            INSERT INTO fixtures (fixture_id, name, location, usage_limit, last_calibrated, calibration_due,
+                                  updated_by, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (fixture_id) DO UPDATE SET
+                name=excluded.name, location=excluded.location, usage_limit=excluded.usage_limit,
+                last_calibrated=excluded.last_calibrated, calibration_due=excluded.calibration_due,
+                updated_by=excluded.updated_by, updated_at=excluded.updated_at
+        """, (fixture_id, name, location, usage_limit, last_calibrated, calibration_due, username,
+              datetime.now().isoformat()))
+        codes = json.dumps(product_codes)
+        conn.execute("""
+            DELETE FROM fixture_products
+            WHERE fixture_id=? AND product_code NOT IN (SELECT value FROM json_each(?))
+        """, (fixture_id, codes))
+        conn.execute("""
+            INSERT OR IGNORE INTO fixture_products (link_key, fixture_id, product_code)
+            SELECT ? || '|' || value, ?, value FROM json_each(?)
+        """, (fixture_id, fixture_id, codes))
+        _audit(conn, username, "fixture_save", fixture_id)
+    return []
+
+
+@operation(writes=True, permission="admin", actor="username")
+def delete_fixture(db_name, fixture_id, username):
+    with get_connection(db_name) as conn:
+        conn.execute("DELETE FROM fixture_products WHERE fixture_id=?", (fixture_id,))
+        conn.execute("DELETE FROM fixture_usage WHERE fixture_id=?", (fixture_id,))
+        if conn.execute("DELETE FROM fixtures WHERE fixture_id=?", (fixture_id,)).rowcount:
+            _audit(conn, username, "fixture_delete", fixture_id)
+
+
+@operation()
+def fixture_exists(db_name, fixture_id):
+    return get_connection(db_name).execute(
+        "SELECT 1 FROM fixtures WHERE fixture_id=?", (fixture_id,)).fetchone() is not None
+
+
+@operation(writes=True, actor="username")
+def record_fixture_usage(db_name, counts, username):
+    # counts: {治具編號: 使用次數}；產線累積一段時間的掃描後一次寫入。
+    # 不存在（或已被刪除）的治具編號不寫入，回傳實際寫入的次數
+    now = datetime.now().isoformat()
+    with get_connection(db_name) as conn:
+        known = {row[0] for row in conn.execute(
+            "SELECT fixture_id FROM fixtures WHERE fixture_id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(counts)),))}
+        rows = [(fixture_id, uses, username, now) for fixture_id, uses in counts.items()
+                if uses and fixture_id in known]
+        conn.executemany("""
+            INSERT INTO fixture_usage (fixture_id, uses, recorded_by, recorded_at) VALUES (?, ?, ?, ?)
+        """, rows)
+    return sum(row[1] for row in rows)
+
+
+# === 測試BOM ===
+
+@operation()
+def explode_bom(db_name, product_code, summarize=False, max_depth=BOM_MAX_DEPTH, limit=BOM_ROW_LIMIT):
+    """多階展開，回傳 [[階層, 路徑, 上階料號, 料號, 用量, 總用量, 說明], ...]，依路徑排序（上階必在下階之前）。
+
+    路徑為 "/產品/料號/.../" 形式，可直接當樹狀清單的項目代號；summarize 時改回傳
+    [[料號, 總用量, 出現次數, 說明], ...]，依料號排序。
+    """
+    conn = get_connection(db_name)
+    cte = """
+        WITH RECURSIVE bom(level, path, parent_code, child_code, quantity, total, description) AS (
+            SELECT 1, '/' || parent_code || '/' || child_code || '/', parent_code, child_code, quantity, quantity,
+                   description
+            FROM bom_items WHERE parent_code = ?
+            UNION ALL
+            SELECT b.level + 1, b.path || i.child_code || '/', i.parent_code, i.child_code, i.quantity,
+                   b.total * i.quantity, i.description
+            FROM bom b JOIN bom_items i ON i.parent_code = b.child_code
+            WHERE b.level < ? AND instr(b.path, '/' || i.child_code || '/') = 0
+        )
+    """
+    if summarize:
+        return conn.execute(cte + """
+            SELECT child_code, SUM(total), COUNT(*), MAX(description)
+            FROM bom GROUP BY child_code ORDER BY child_code LIMIT ?
+        """, (product_code, max_depth, limit)).fetchall()
+    return conn.execute(cte + """
+        SELECT level, path, parent_code, child_code, quantity, total, description
+        FROM bom ORDER BY path LIMIT ?
+    """, (product_code, max_depth, limit)).fetchall()
+
+
+@operation()
+def where_used(db_name, part_code, max_depth=BOM_MAX_DEPTH, limit=BOM_ROW_LIMIT):
+    """反查料號被哪些上階與產品使用，回傳 [[階層, 路徑, 上階料號, 料號, 用量, 是否為產品], ...]。"""
+    conn = get_connection(db_name)
+    return conn.execute("""
+        WITH RECURSIVE used(level, path, parent_code, child_code, quantity) AS (
+            SELECT 1, '/' || child_code || '/' || parent_code || '/', parent_code, child_code, quantity
+            FROM bom_items WHERE child_code = ?
+            UNION ALL
+            SELECT u.level + 1, u.path || i.parent_code || '/', i.parent_code, i.child_code, i.quantity
+            FROM used u JOIN bom_items i ON i.child_code = u.parent_code
+            WHERE u.level < ? AND instr(u.path, '/' || i.parent_code || '/') = 0
+        )
+        SELECT level, path, parent_code, child_code, quantity,
+               EXISTS (SELECT 1 FROM issues WHERE product_code = used.parent_code)
+        FROM used ORDER BY path LIMIT ?
+    """, (part_code, max_depth, limit)).fetchall()
+
+
+def _find_bom_cycle(conn, codes):
+    # 取出從 codes 往下可達的所有用料關係，以拓撲排序檢查是否有循環；回傳循環中的某個料號或 None
+    edges = conn.execute("""
+        WITH RECURSIVE reach(code) AS (
+            SELECT value FROM json_each(?)
+            UNION
+            SELECT i.child_code FROM reach r JOIN bom_items i ON i.parent_code = r.code
+        )
+        SELECT i.parent_code, i.child_code FROM reach r JOIN bom_items i ON i.parent_code = r.code
+    """, (json.dumps(sorted(codes)),)).fetchall()
+    children, indegree = {}, {}
+    for parent, child in edges:
+        children.setdefault(parent, []).append(child)
+        indegree[child] = indegree.get(child, 0) + 1
+        indegree.setdefault(parent, 0)
+    ready = [code for code, count in indegree.items() if count == 0]
+    while ready:
+        code = ready.pop()
+        del indegree[code]
+        for child in children.get(code, ()):
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                ready.append(child)
+    return min(indegree) if indegree else None
+
+
+@operation(writes=True, permission="add", actor="username")
+def import_bom(db_name, boms, username):
+    """匯入多份 BOM，全部在同一個交易內寫入；回傳 issues 中不存在的產品編號，有的話不寫入。
+
+    boms 為 {產品編號: [[上階料號, 料號, 用量, 說明], ...]}，上階料號留空表示直接用於該產品。
+    檔案中出現的每個上階（含產品本身）原有的子料號會整批換成檔案內容；形成循環時拋出 ValueError。
+    """
+    conn = get_connection(db_name)
+    products = sorted(boms)
+    known = {row[0] for row in conn.execute(
+        "SELECT product_code FROM issues WHERE product_code IN (SELECT value FROM json_each(?))",
+        (json.dumps(products),))}
+    unknown = [code for code in products if code not in known]
+    if unknown:
+        return unknown
+
+    lines, assemblies = {}, set()
+    for product_code, items in boms.items():
+        assemblies.add(product_code)
+        for parent, child, quantity, description in items:
+            parent = parent or product_code
+            try:
+                quantity = float(quantity)
+            except (TypeError, ValueError):
+                raise ValueError(f"{parent} -> {child} 用量 {quantity!r} 不是數字")
+            if not child or quantity <= 0:
+                raise ValueError(f"{parent} -> {child!r} 缺少料號或用量不是正數")
+            assemblies.add(parent)
+            # 同一上階重複列出的料號合併用量
+            key = f"{parent}|{child}"
+            if key in lines:
+                quantity += lines[key][3]
+            lines[key] = (key, parent, child, quantity, description or "")
+    now = datetime.now().isoformat()
+    with conn:
+        conn.execute("DELETE FROM bom_items WHERE parent_code IN (SELECT value FROM json_each(?))",
+                     (json.dumps(sorted(assemblies)),))
+        conn.executemany("""
+            INSERT INTO bom_items (link_key, parent_code, child_code, quantity, description, updated_by, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, [(*line, username, now) for line in lines.values()])
+        cycle = _find_bom_cycle(conn, assemblies)
+        if cycle:
+            raise ValueError(f"BOM 形成循環（包含料號 {cycle}），未匯入")
+        for product_code in products:
+            _audit(conn, username, "bom_import", product_code)
+    return []
+
+
+@operation(writes=True, permission="admin", actor="username")
+def delete_bom(db_name, product_code, username):
+    # 只刪除產品本身的第一階；子組件可能被其他產品共用，保留不動
+    with get_connection(db_name) as conn:
+        if conn.execute("DELETE FROM bom_items WHERE parent_code=?", (product_code,)).rowcount:
+            _audit(conn, username, "bom_delete", product_code)
+
+
+# === 帳號 ===
+
+@operation(writes=True)
+def authenticate(db_name, username, password):
+    # 帳密正確且啟用時回傳 [role, can_add, can_delete]，否則回傳 None。
+    # 以主鍵查出該帳號後在程式內驗證；舊格式或次數不同的雜湊在此時改存
+    conn = get_connection(db_name)
+    row = conn.execute("SELECT password, role, can_add, can_delete FROM users WHERE username=? AND active=1",
+                       (username,)).fetchone()
+    if row is None:
+        return None
+    ok, needs_rehash = verify_password(password, row[0])
+    if not ok:
+        return None
+    if needs_rehash:
+        with conn:
+            conn.execute("UPDATE users SET password=? WHERE username=?", (hash_password(password), username))
+    return list(row[1:])
+
+
+@operation(permission="admin")
+def list_users(db_name, status="all", ascending=True):
+    if status not in USER_FILTERS:
+        raise ValueError(f"未知的帳號篩選：{status}")
+    sql = "SELECT username, role, can_add, can_delete, active FROM users" + USER_FILTERS[status]
+    sql += f" ORDER BY username {'ASC' if ascending else 'DESC'}"
+    return get_connection(db_name).execute(sql).fetchall()
+
+
+@operation(writes=True, permission="admin")
+def add_user(db_name, username, password, role, can_add, can_delete, active):
+    # 帳號已存在時回傳 False
+    try:
+        with get_connection(db_name) as conn:
+            conn.execute("""
+                INSERT INTO users (username, password, role, can_add, can_delete, active)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (username, hash_password(password), role, can_add, can_delete, active))
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+@operation(writes=True, permission="admin")
+def update_user(db_name, username, new_username, password, role, can_add, can_delete, active):
+    # 改名與權限在同一個交易內更新；新帳號名稱已存在時回傳 False。password 為空表示不改密碼
+    with get_connection(db_name) as conn:
+        if new_username and new_username != username:
+            if conn.execute("SELECT 1 FROM users WHERE username=?", (new_username,)).fetchone():
+                return False
+            conn.execute("UPDATE users SET username=? WHERE username=?", (new_username, username))
+            username = new_username
+        if password:
+            conn.execute("""
+                UPDATE users SET password=?, role=?, can_add=?, can_delete=?, active=?
+                WHERE username=?
+            """, (hash_password(password), role, can_add, can_delete, active, username))
+        else:
+            conn.execute("""
+                UPDATE users SET role=?, can_add=?, can_delete=?, active=?
+                WHERE username=?
+            """, (role, can_add, can_delete, active, username))
+    return True
+
+
+@operation(writes=True, permission="admin")
+def delete_user(db_name, username):
+    with get_connection(db_name) as conn:
+        conn.execute("DELETE FROM users WHERE username=?", (username,))
+
+
+# === 後端 ===
+
+class LocalBackend:
+    """直接開啟資料庫檔案（本機副本模式）。"""
+    remote = False
+
+    def __init__(self, db_name):
+        self.db_name = db_name
+        self.key = db_name
+
+    def call(self, name, /, **params):
+        with timed(f"db.{name}"):
+            return OPERATIONS[name](self.db_name, **params)
+
+
+class RemoteBackend:
+    """經 HTTP/JSON 呼叫資料服務；每條執行緒保留一條 keep-alive 連線。"""
+    remote = True
+
+    def __init__(self, base_url, timeout=10):
+        # http.client 只有服務模式才需要，延後到建立時才匯入
+        from urllib.parse import urlsplit
+        parts = urlsplit(base_url)
+        self.key = base_url
+        self._host = parts.hostname or "localhost"
+        self._port = parts.port or SERVICE_PORT
+        self._prefix = parts.path.rstrip("/")
+        self._timeout = timeout
+        self._local = threading.local()
+        # authenticate 成功後服務端發給的權杖，之後每次呼叫都附上
+        self._token = None
+
+    def _connection(self):
+        import http.client
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.sock is not None and _closed_by_peer(conn.sock):
+            # 閒置期間已被服務端關閉的 keep-alive 連線，送出請求前就換新連線
+            conn.close()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            self._local.reused = False
+        return conn
+
+    def call(self, name, /, **params):
+        with timed(f"db.{name}"):
+            return self._call(name, params)
+
+    def _call(self, name, params):
+        import http.client
+        body = json.dumps(params, ensure_ascii=False).encode("utf-8")
+        while True:
+            conn = self._connection()
+            reused = self._local.reused
+            sent = False
+            try:
+                headers = {"Content-Type": "application/json"}
+                if self._token:
+                    headers["Authorization"] = f"Bearer {self._token}"
+                conn.request("POST", f"{self._prefix}/api/{name}", body, headers)
+                sent = True
+                response = conn.getresponse()
+                payload = json.loads(response.read().decode("utf-8"))
+                self._local.reused = True
+                break
+            except (OSError, http.client.HTTPException, ValueError) as e:
+                conn.close()
+                self._local.conn = None
+                # 重用的連線失敗時重新連線再試一次；寫入操作若已送出，服務端可能已經執行，不可重送
+                if not reused or (sent and name in WRITE_OPERATIONS):
+                    raise ServiceError(f"無法連線資料服務 {self.key}：{e}") from None
+        if response.status == 409:
+            raise ArchiveLocked(payload.get("error"))
+        if response.status != 200:
+            raise ServiceError(payload.get("error") or f"資料服務回應 {response.status}")
+        if name == "authenticate":
+            self._token = payload.get("token")
+        return payload["result"]
+
+
+def _closed_by_peer(sock):
+    # 閒置中的連線不應有資料可讀，可讀代表服務端已關閉（讀到 EOF）
+    import select
+    try:
+        readable, _, _ = select.select([sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return bool(readable)
+
+
+def open_backend(service_url, db_name):
+    # 有設定服務位址時使用服務模式，否則直接開啟資料庫檔案
+    return RemoteBackend(service_url) if service_url else LocalBackend(db_name)
+
+
+# === 服務端 ===
+
+def create_server(db_name, host="127.0.0.1", port=SERVICE_PORT):
+    """建立資料服務的 HTTP 伺服器，呼叫端負責 serve_forever 與關閉；write_lock 屬性為寫入用的鎖。"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    # 讀取可並行（WAL），寫入一次只執行一個，避免多個用戶端互相等 busy_timeout
+    write_lock = threading.Lock()
+    # 權杖 -> 帳號；權限每次呼叫都重新查詢，停用或降級的帳號立即生效
+    sessions = {}
+    sessions_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self):
+            if self.path == "/health":
+                self._reply(200, {"result": "ok"})
+            else:
+                self._reply(404, {"error": f"找不到 {self.path}"})
+
+        def do_POST(self):
+            name = self.path[len("/api/"):] if self.path.startswith("/api/") else None
+            func = OPERATIONS.get(name)
+            if func is None:
+                self._reply(404, {"error": f"未知的操作：{self.path}"})
+                return
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                params = json.loads(self.rfile.read(length) or b"{}")
+                if not isinstance(params, dict):
+                    raise ValueError("參數格式錯誤")
+                reply = {}
+                if name != "authenticate":
+                    user = self._session_user()
+                    if user is None:
+                        self._reply(401, {"error": "尚未登入或登入已失效，請重新登入"})
+                        return
+                    if not is_permitted(PERMISSIONS.get(name), *user[1:]):
+                        self._reply(403, {"error": f"帳號 {user[0]} 沒有執行 {name} 的權限"})
+                        return
+                    if name in ACTOR_PARAMS:
+                        params[ACTOR_PARAMS[name]] = user[0]
+                if name in WRITE_OPERATIONS:
+                    with write_lock:
+                        result = func(db_name, **params)
+                else:
+                    result = func(db_name, **params)
+                if name == "authenticate" and result:
+                    reply["token"] = secrets.token_urlsafe(32)
+                    with sessions_lock:
+                        sessions[reply["token"]] = params["username"]
+            except (TypeError, ValueError) as e:
+                self._reply(400, {"error": str(e)})
+                return
+            except ArchiveLocked as e:
+                # 用戶端依 409 還原成 ArchiveLocked，顯示稍後再試的提醒
+                self._reply(409, {"error": str(e)})
+                return
+            except Exception as e:
+                print(f"⚠️ 資料服務執行 {name} 失敗: {e}")
+                self._reply(500, {"error": str(e)})
+                return
+            reply["result"] = result
+            self._reply(200, reply)
+
+        def _session_user(self):
+            # 回傳 (帳號, role, can_add, can_delete)；權杖無效或帳號已停用時回傳 None
+            header = self.headers.get("Authorization") or ""
+            if not header.startswith("Bearer "):
+                return None
+            with sessions_lock:
+                username = sessions.get(header[len("Bearer "):])
+            if username is None:
+                return None
+            return get_connection(db_name).execute(
+                "SELECT username, role, can_add, can_delete FROM users WHERE username=? AND active=1",
+                (username,)).fetchone()
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def finish(self):
+            super().finish()
+            close_thread_connections()
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.write_lock = write_lock
+    return server
+
+
+def serve(db_name, host="127.0.0.1", port=SERVICE_PORT):
+    def prune_periodically():
+        # 啟動時與之後每天清理一次；保留 change_marks 需要的紀錄
+        while True:
+            try:
+                with server.write_lock, get_connection(db_name) as conn:
+                    deleted = prune_journal(conn)
+                if deleted:
+                    print(f"✅ 已清除 {deleted} 筆過舊的變更日誌")
+            except sqlite3.Error as e:
+                print(f"⚠️ 清除變更日誌失敗: {e}")
+            time.sleep(JOURNAL_PRUNE_SECONDS)
+
+    prepare_database(db_name)
+    maintain_logs(db_name, LOG_ARCHIVE_DIR)
+    server = create_server(db_name, host, port)
+    threading.Thread(target=prune_periodically, name="journal-prune", daemon=True).start()
+    print(f"✅ 資料服務已啟動：http://{host}:{port}（資料庫 {db_name}）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        close_all()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="啟動資料服務，由本機持有資料庫供多個用戶端連線")
+    parser.add_argument("--db", default=ORIGINAL_DB, help="資料庫檔案（應位於本機磁碟，不要放在網路磁碟）")
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="監聽位址（預設只接受本機連線；供其他電腦連線時指定 0.0.0.0）")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args(argv)
+    serve(args.db, args.host, args.port)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+import sqlite3
+import threading
+
+# 每條執行緒、每個資料庫檔案各保留一條長駐連線，避免每次操作重新連線與重設 PRAGMA
+CACHED_STATEMENTS = 256
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",      # 約 16MB 頁面快取
+    "PRAGMA mmap_size=67108864",     # 64MB 記憶體映射讀取
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000",
+)
+
+_local = threading.local()
+_all_connections = []
+_lock = threading.Lock()
+_generation = 0
+
+
+def _configure(conn):
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+
+
+def get_connection(db_name):
+    """取得目前執行緒對應 db_name 的共用連線。
+
+    連線可直接當作 with 區塊使用（離開時 commit / rollback，但不會關閉）。
+    """
+    connections = getattr(_local, "connections", None)
+    if connections is None or getattr(_local, "generation", None) != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+    conn = connections.get(db_name)
+    if conn is None:
+        # check_same_thread=False 只為了讓 close_all 能跨執行緒關閉，平常仍是一條執行緒一條連線
+        conn = sqlite3.connect(db_name, cached_statements=CACHED_STATEMENTS, timeout=5,
+                               check_same_thread=False)
+        _configure(conn)
+        connections[db_name] = conn
+        with _lock:
+            _all_connections.append(conn)
+    return conn
+
+
+def close_all():
+    # 登出或同步整份資料庫前呼叫，關閉所有執行緒的連線並寫回 WAL
+    global _generation
+    with _lock:
+        for conn in _all_connections:
+            conn.close()
+        _all_connections.clear()
+        _generation += 1
+
+
+def close_thread_connections():
+    # 短命的工作執行緒（例如資料服務的連線處理緒）結束前呼叫，避免連線隨執行緒累積
+    connections = getattr(_local, "connections", None) or {}
+    with _lock:
+        for conn in connections.values():
+            conn.close()
+            if conn in _all_connections:
+                _all_connections.remove(conn)
+    connections.clear()
@@ -0,0 +1,172 @@
+import tkinter as tk
+from tkinter import ttk, messagebox
+from datetime import date
+
+import fixture_usage
+from tk_async import QueryRunner, run_in_background
+
+def build_fixture_tab(tab, backend, session):
+    frame = tk.Frame(tab)
+    frame.pack(fill="both", expand=True, padx=10, pady=10)
+    counter = fixture_usage.get_counter(backend, session.user)
+
+    # === 查詢 ===
+    query_frame = tk.Frame(frame)
+    query_frame.pack(fill="x", pady=(0, 5))
+    tk.Label(query_frame, text="治具編號或產品編號：").pack(side="left")
+    entry_query = tk.Entry(query_frame)
+    entry_query.pack(side="left")
+    status_var = tk.StringVar()
+
+    columns = ("治具編號", "名稱", "位置", "使用次數", "使用上限", "上次校正", "下次校正", "適用產品")
+    tree = ttk.Treeview(frame, columns=columns, show="headings")
+    for col in columns:
+        tree.heading(col, text=col)
+        tree.column(col, width=180 if col == "適用產品" else 100)
+    tree.pack(fill="both", expand=True, pady=5)
+    # 已過校正日或達使用上限的治具以紅字標示
+    tree.tag_configure("attention", foreground="red")
+
+    def show_busy(busy):
+        if busy:
+            status_var.set("查詢中…")
+        tree.configure(cursor="watch" if busy else "")
+
+    runner = QueryRunner(tree, show_busy)
+
+    def fill_fixtures(rows):
+        children = tree.get_children()
+        if children:
+            tree.delete(*children)
+        pending = counter.pending()
+        today = date.today().isoformat()
+        for fixture_id, name, location, uses, limit, calibrated, due, products in rows:
+            uses += pending.get(fixture_id, 0)
+            attention = (due and due <= today) or (limit and uses >= limit)
+            tree.insert("", "end", iid=fixture_id, tags=("attention",) if attention else (),
+                        values=(fixture_id, name or "", location or "", uses, limit or "", calibrated or "",
+                                due or "", products or ""))
+        status_var.set(f"共 {len(rows)} 筆")
+
+    def query_fixtures():
+        keyword = entry_query.get().strip()
+        runner.submit(lambda: backend.call("find_fixtures", keyword=keyword), fill_fixtures)
+
+    tk.Button(query_frame, text="查詢", command=query_fixtures).pack(side="left", padx=5)
+    tk.Label(query_frame, textvariable=status_var, fg="gray").pack(side="left", padx=5)
+    entry_query.bind("<Return>", lambda e: query_fixtures())
+
+    # === 產線掃描：累加使用次數 ===
+    scan_frame = tk.LabelFrame(frame, text="使用登錄（掃描治具編號後按 Enter）")
+    scan_frame.pack(fill="x", pady=5)
+    entry_scan = tk.Entry(scan_frame, width=30)
+    entry_scan.pack(side="left", padx=5, pady=5)
+    scan_var = tk.StringVar()
+    scan_label = tk.Label(scan_frame, textvariable=scan_var, fg="gray")
+    scan_label.pack(side="left")
+
+    def count_scan(fixture_id):
+        counter.add(fixture_id)
+        # 直接更新表格上的數字，背景再批次寫入資料庫
+        if tree.exists(fixture_id):
+            tree.set(fixture_id, "使用次數", int(tree.set(fixture_id, "使用次數")) + 1)
+        scan_label.config(fg="gray")
+        scan_var.set(f"{fixture_id} +1")
+
+    def reject_scan(message):
+        scan_label.config(fg="red")
+        scan_var.set(message)
+        entry_scan.bell()
+
+    def on_scan(event):
+        fixture_id = entry_scan.get().strip()
+        entry_scan.delete(0, tk.END)
+        if not fixture_id:
+            return
+        # 表格中的治具來自資料庫，不必再查；其他編號先在背景確認存在才計數
+        if tree.exists(fixture_id):
+            count_scan(fixture_id)
+            return
+        run_in_background(entry_scan, lambda: backend.call("fixture_exists", fixture_id=fixture_id),
+                          lambda exists: count_scan(fixture_id) if exists
+                          else reject_scan(f"找不到治具 {fixture_id}，未登錄使用次數"),
+                          lambda e: reject_scan(f"無法確認治具 {fixture_id}：{e}"))
+
+    entry_scan.bind("<Return>", on_scan)
+
+    # === 新增 / 修改 ===
+    if session.can_add:
+        form = tk.LabelFrame(frame, text="新增 / 修改治具")
+        form.pack(fill="x", pady=5)
+        fields = [("治具編號", 20), ("名稱", 30), ("位置", 20), ("使用上限", 10),
+                  ("上次校正", 12), ("下次校正", 12), ("適用產品", 60)]
+        entries = {}
+        for index, (label, width) in enumerate(fields):
+            row, col = divmod(index, 3)
+            if label == "適用產品":
+                row, col = 3, 0
+            tk.Label(form, text=f"{label}：").grid(row=row, column=col * 2, sticky="e")
+            entry = tk.Entry(form, width=width)
+            entry.grid(row=row, column=col * 2 + 1, sticky="w", columnspan=5 if label == "適用產品" else 1)
+            entries[label] = entry
+        tk.Label(form, text="日期格式 YYYY-MM-DD；適用產品以逗號分隔", fg="gray").grid(row=4, column=1, columnspan=5, sticky="w")
+
+        def on_select(event):
+            selected = tree.selection()
+            if not selected:
+                return
+            # tree.item()["values"] 會把 "0012" 之類的數字字串轉成整數，改以 tree.set 取原字串
+            for label, entry in entries.items():
+                entry.delete(0, tk.END)
+                entry.insert(0, tree.set(selected[0], label))
+
+        tree.bind("<<TreeviewSelect>>", on_select)
+
+        def save_fixture():
+            values = {label: entry.get().strip() for label, entry in entries.items()}
+            if not values["治具編號"]:
+                messagebox.showwarning("警告", "請輸入治具編號")
+                return
+            limit = values["使用上限"]
+            if limit and not limit.isdigit():
+                messagebox.showerror("錯誤", "使用上限必須為數字")
+                return
+            for label in ("上次校正", "下次校正"):
+                if values[label]:
+                    try:
+                        date.fromisoformat(values[label])
+                    except ValueError:
+                        messagebox.showerror("錯誤", f"{label}日期格式錯誤，請使用 YYYY-MM-DD")
+                        return
+            codes = sorted({code.strip() for code in values["適用產品"].split(",") if code.strip()})
+            unknown = backend.call("save_fixture", fixture_id=values["治具編號"], name=values["名稱"],
+                                   location=values["位置"], usage_limit=int(limit) if limit else None,
+                                   last_calibrated=values["上次校正"] or None,
+                                   calibration_due=values["下次校正"] or None,
+                                   product_codes=codes, username=session.user)
+            if unknown:
+                messagebox.showerror("錯誤", "找不到產品編號：" + ", ".join(unknown))
+                return
+            messagebox.showinfo("成功", f"已儲存治具 {values['治具編號']}")
+            query_fixtures()
+
+        button_frame = tk.Frame(form)
+        button_frame.grid(row=5, column=0, columnspan=6, sticky="e", pady=5)
+        tk.Button(button_frame, text="儲存治具", command=save_fixture, bg="lightblue").pack(side="left", padx=5)
+
+        if session.is_admin:
+            def delete_fixture():
+                selected = tree.selection()
+                if not selected:
+                    messagebox.showwarning("提醒", "請先選取治具")
+                    return
+                fixture_id = selected[0]
+                if messagebox.askyesno("確認", f"確定要刪除治具「{fixture_id}」及其使用紀錄？"):
+                    backend.call("delete_fixture", fixture_id=fixture_id, username=session.user)
+                    tree.delete(fixture_id)
+
+            tk.Button(button_frame, text="刪除治具", command=delete_fixture,
+                      bg="lightcoral", fg="white").pack(side="left", padx=5)
+
+    query_fixtures()
+    return tree, query_fixtures
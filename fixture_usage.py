@@ -0,0 +1,87 @@
+import threading
+
+# 治具使用次數：產線每次掃描只在記憶體累加，定時或累積到一定次數才以一筆批次寫入，
+# 不會每次掃描都 commit；寫入經由資料存取後端，直接開檔與服務模式共用
+FLUSH_INTERVAL = 5.0
+MAX_PENDING = 200
+
+_counters = {}
+_counters_lock = threading.Lock()
+
+
+class UsageCounter:
+    def __init__(self, backend, username, flush_interval=FLUSH_INTERVAL, max_pending=MAX_PENDING):
+        self.backend = backend
+        self.username = username
+        self._flush_interval = flush_interval
+        self._max_pending = max_pending
+        self._counts = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fixture-usage", daemon=True)
+        self._thread.start()
+
+    def add(self, fixture_id, uses=1):
+        with self._lock:
+            self._counts[fixture_id] = self._counts.get(fixture_id, 0) + uses
+            self._pending += uses
+            full = self._pending >= self._max_pending
+        if full:
+            self._wake.set()
+
+    def pending(self):
+        # 尚未寫入的次數，供畫面加到資料庫的數字上顯示
+        with self._lock:
+            return dict(self._counts)
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                counts, self._counts, self._pending = self._counts, {}, 0
+            if not counts:
+                return 0
+            try:
+                return self.backend.call("record_fixture_usage", counts=counts, username=self.username)
+            except Exception:
+                # 寫入失敗時放回，下次再試
+                with self._lock:
+                    for fixture_id, uses in counts.items():
+                        self._counts[fixture_id] = self._counts.get(fixture_id, 0) + uses
+                        self._pending += uses
+                raise
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self._flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"⚠️ 治具使用次數寫入失敗: {e}")
+
+
+def get_counter(backend, username):
+    with _counters_lock:
+        key = (backend.key, username)
+        counter = _counters.get(key)
+        if counter is None:
+            counter = _counters[key] = UsageCounter(backend, username)
+        return counter
+
+
+def stop_all():
+    # 登出前呼叫：寫入剩餘次數並停止背景執行緒
+    with _counters_lock:
+        counters = list(_counters.values())
+        _counters.clear()
+    for counter in counters:
+        counter.stop()
@@ -0,0 +1,246 @@
+import gzip
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import zlib
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from db_access import get_connection
+from sync_engine import unsynced_inserts
+
+# 操作紀錄封存：超過保留天數的紀錄依月份搬到壓縮的封存資料庫，線上資料表只保留近期紀錄
+LOG_TABLE = "activity_logs"
+LOG_RETENTION_DAYS = 90
+ARCHIVE_PREFIX = "activity_logs_"
+ARCHIVE_SUFFIX = ".db.gz"
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "troubleshooting_log_archive")
+LOCK_NAME = ".archive.lock"
+# 鎖檔超過一小時視為殘留
+LOCK_STALE_SECONDS = 3600
+
+
+class ArchiveLocked(Exception):
+    pass
+
+
+def _archive_path(archive_dir, month):
+    return os.path.join(archive_dir, f"{ARCHIVE_PREFIX}{month}{ARCHIVE_SUFFIX}")
+
+
+def list_archive_months(archive_dir):
+    if not os.path.isdir(archive_dir):
+        return []
+    months = [
+        name[len(ARCHIVE_PREFIX):-len(ARCHIVE_SUFFIX)]
+        for name in os.listdir(archive_dir)
+        if name.startswith(ARCHIVE_PREFIX) and name.endswith(ARCHIVE_SUFFIX)
+    ]
+    return sorted(months, reverse=True)
+
+
+def _decompress(src, dst):
+    with gzip.open(src, "rb") as fin, open(dst, "wb") as fout:
+        shutil.copyfileobj(fin, fout)
+
+
+def _append_to_archive(archive_dir, month, rows):
+    # 解壓 → 寫入 → 重新壓縮到暫存檔再改名，過程中斷不會毀損既有封存
+    os.makedirs(archive_dir, exist_ok=True)
+    archive = _archive_path(archive_dir, month)
+    work = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    work.close()
+    try:
+        if os.path.exists(archive):
+            _decompress(archive, work.name)
+        conn = sqlite3.connect(work.name)
+        try:
+            conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+                    id INTEGER PRIMARY KEY,
+                    username TEXT,
+                    action TEXT,
+                    filename TEXT,
+                    timestamp TEXT
+                )
+            """)
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_archive_timestamp ON {LOG_TABLE} (timestamp, id)")
+            # 以 id 為主鍵，重複封存同一筆紀錄不會產生重複資料
+            conn.executemany(f"""
+                INSERT OR IGNORE INTO {LOG_TABLE} (id, username, action, filename, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        tmp_archive = archive + ".tmp"
+        with open(work.name, "rb") as fin, gzip.open(tmp_archive, "wb") as fout:
+            shutil.copyfileobj(fin, fout)
+        os.replace(tmp_archive, archive)
+    finally:
+        os.remove(work.name)
+
+
+@contextmanager
+def _archive_lock(archive_dir):
+    # 以檔案鎖避免多個站台同時封存；其他站台正在封存時丟出 ArchiveLocked
+    lock_path = os.path.join(archive_dir, LOCK_NAME)
+    os.makedirs(archive_dir, exist_ok=True)
+    try:
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        if datetime.now().timestamp() - os.path.getmtime(lock_path) < LOCK_STALE_SECONDS:
+            raise ArchiveLocked("其他站台正在封存操作紀錄，請稍後再試") from None
+        os.remove(lock_path)
+        fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        os.remove(lock_path)
+
+
+def archive_logs(db_name, archive_dir, before=None):
+    """將 timestamp 早於 before 的操作紀錄依月份封存後自線上資料表刪除，before 為 None 表示全部。
+
+    本機副本中尚未推送到伺服器的紀錄不封存。回傳封存筆數；其他站台正在封存時丟出 ArchiveLocked。
+    """
+    with _archive_lock(archive_dir):
+        return _archive_rows(db_name, archive_dir, before)
+
+
+def _archive_rows(db_name, archive_dir, before):
+    conn = get_connection(db_name)
+    # 封存以 id 辨識紀錄：本機副本中尚未推送的紀錄只有暫時的 id，留待同步取得伺服器配號後再封存
+    unsynced = [int(key) for key in unsynced_inserts(conn, LOG_TABLE)]
+    sql = f"SELECT id, username, action, filename, timestamp FROM {LOG_TABLE} WHERE id NOT IN (SELECT value FROM json_each(?))"
+    params = (json.dumps(unsynced),)
+    if before is not None:
+        sql += " AND timestamp < ?"
+        params += (before,)
+    rows = conn.execute(sql + " ORDER BY timestamp, id", params).fetchall()
+    if not rows:
+        return 0
+
+    by_month = {}
+    for row in rows:
+        month = (row[4] or "")[:7] or "unknown"
+        by_month.setdefault(month, []).append(row)
+    for month, month_rows in by_month.items():
+        _append_to_archive(archive_dir, month, month_rows)
+
+    # 確定寫入封存後才自線上資料表刪除
+    with conn:
+        conn.execute(f"DELETE FROM {LOG_TABLE} WHERE id IN (SELECT value FROM json_each(?))",
+                     (json.dumps([row[0] for row in rows]),))
+    return len(rows)
+
+
+def archive_old_logs(db_name, archive_dir, retention_days=LOG_RETENTION_DAYS):
+    # 啟動時呼叫；其他站台正在封存時直接略過
+    cutoff = (datetime.now() - timedelta(days=retention_days)).isoformat()
+    try:
+        count = archive_logs(db_name, archive_dir, cutoff)
+    except ArchiveLocked:
+        return 0
+    except OSError as e:
+        print(f"⚠️ 無法存取操作紀錄封存資料夾: {e}")
+        return 0
+    if count:
+        print(f"✅ 已封存 {count} 筆 {retention_days} 天前的操作紀錄")
+    return count
+
+
+def backfill_activity_rollups(db_name, archive_dir):
+    """由線上紀錄加上各月份封存重新計算 activity_daily；第 12 版結構升級記下待辦後，啟動時在背景呼叫。
+
+    讀不到的封存檔略過並保留該月份原本的統計，下次啟動再試；全部讀到才清除待辦。回傳是否已完成。
+    """
+    conn = get_connection(db_name)
+    pending = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='pending_backfills'").fetchone()
+    if not pending or not conn.execute("SELECT 1 FROM pending_backfills WHERE name='activity_daily'").fetchone():
+        return True
+    try:
+        if not list_archive_months(archive_dir):
+            skipped = _recount_activity(conn, [], [])
+        else:
+            # 持有封存鎖，計算期間不會有紀錄從線上資料表搬進封存
+            with _archive_lock(archive_dir):
+                skipped = _recount_activity(conn, *_read_archived_activity(archive_dir))
+    except ArchiveLocked:
+        return False
+    except OSError as e:
+        print(f"⚠️ 無法存取操作紀錄封存資料夾，統計稍後再補: {e}")
+        return False
+    if not skipped:
+        print("✅ 已將封存的操作紀錄計入統計")
+    return not skipped
+
+
+def _read_archived_activity(archive_dir):
+    # 回傳 (封存的紀錄, 讀不到的月份)
+    archived, skipped = [], []
+    for month in list_archive_months(archive_dir):
+        try:
+            archive = open_archive(archive_dir, month)
+            try:
+                archived += archive.execute(f"SELECT id, username, action, timestamp FROM {LOG_TABLE}").fetchall()
+            finally:
+                archive.close()
+        except (OSError, EOFError, zlib.error, sqlite3.Error) as e:
+            print(f"⚠️ 無法讀取 {month} 的操作紀錄封存，該月統計稍後再補: {e}")
+            skipped.append(month)
+    return archived, skipped
+
+
+def _recount_activity(conn, archived, skipped):
+    # 封存後還沒同步刪除的紀錄線上與封存兩邊都有，只算一次；讀不到的月份維持原本的統計
+    months = json.dumps(skipped)
+    conn.execute("""
+        CREATE TEMP TABLE archived_logs (
+            id INTEGER, username TEXT, action TEXT, timestamp TEXT, PRIMARY KEY (id, timestamp)
+        )
+    """)
+    try:
+        with conn:
+            conn.executemany("INSERT OR IGNORE INTO temp.archived_logs VALUES (?, ?, ?, ?)", archived)
+            conn.execute("DELETE FROM activity_daily WHERE substr(day, 1, 7) NOT IN (SELECT value FROM json_each(?))",
+                         (months,))
+            conn.execute(f"""
+                INSERT INTO activity_daily (day, username, action, count)
+                SELECT substr(timestamp, 1, 10), COALESCE(username, ''), COALESCE(action, ''), COUNT(*) FROM (
+                    SELECT username, action, timestamp FROM main.{LOG_TABLE}
+                    UNION ALL
+                    SELECT username, action, timestamp FROM temp.archived_logs a
+                    WHERE NOT EXISTS (SELECT 1 FROM main.{LOG_TABLE} l WHERE l.id = a.id AND l.timestamp IS a.timestamp)
+                )
+                WHERE substr(timestamp, 1, 7) NOT IN (SELECT value FROM json_each(?))
+                GROUP BY 1, 2, 3
+            """, (months,))
+            if not skipped:
+                conn.execute("DELETE FROM pending_backfills WHERE name='activity_daily'")
+    finally:
+        conn.execute("DROP TABLE temp.archived_logs")
+    return skipped
+
+
+def maintain_logs(db_name, archive_dir):
+    # 啟動後在背景執行：先補齊統計再封存過舊的紀錄，兩者都要讀寫網路磁碟上的封存檔
+    backfill_activity_rollups(db_name, archive_dir)
+    archive_old_logs(db_name, archive_dir)
+
+
+def open_archive(archive_dir, month):
+    """以唯讀方式開啟某月份的封存資料庫（解壓到本機快取），呼叫端負責關閉連線。"""
+    # urllib.request 會連帶載入 ssl 等模組，只在真的開啟封存時才匯入
+    from urllib.request import pathname2url
+    archive = _archive_path(archive_dir, month)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cached = os.path.join(CACHE_DIR, os.path.basename(archive)[:-len(".gz")])
+    if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(archive):
+        _decompress(archive, cached + ".tmp")
+        os.replace(cached + ".tmp", cached)
+    return sqlite3.connect(f"file:{pathname2url(cached)}?mode=ro", uri=True)
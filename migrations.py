@@ -0,0 +1,258 @@
+from search_index import install_search_index, rebuild_search_index
+from sync_engine import install_change_journal
+
+# 資料庫結構版本管理：以 PRAGMA user_version 記錄已套用到第幾版，
+# 每個版本在各自的交易中執行，中途失敗不會留下半套結構
+LOG_TABLE = "activity_logs"
+
+
+def _create_base_tables(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS issues (
+            product_code TEXT PRIMARY KEY,
+            product_name TEXT,
+            dip_sop TEXT,
+            assembly_sop TEXT,
+            test_sop TEXT,
+            packaging_sop TEXT,
+            oqc_checklist TEXT,
+            created_by TEXT,
+            created_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT,
+            role TEXT DEFAULT 'user',
+            can_add INTEGER DEFAULT 1,
+            can_delete INTEGER DEFAULT 0,
+            active INTEGER DEFAULT 1
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {LOG_TABLE} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT,
+            action TEXT,
+            filename TEXT,
+            timestamp TEXT
+        )
+    """)
+
+
+def _add_dip_sop_column(conn):
+    # 舊版 DB 的 issues 沒有 dip_sop 欄位；ADD COLUMN 只改結構定義，不需重建資料表
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(issues)")]
+    if "dip_sop" not in columns:
+        conn.execute("ALTER TABLE issues ADD COLUMN dip_sop TEXT")
+        print("✅ 已自動新增 dip_sop 欄位至 issues 表")
+
+
+def _add_sort_filter_indexes(conn):
+    # 生產資訊依建立時間排序；操作紀錄依時間排序並常以使用者/動作篩選
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_issues_created_at ON issues (created_at)")
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_activity_logs_timestamp
+        ON {LOG_TABLE} (timestamp, id, username, action, filename)
+    """)
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_activity_logs_user ON {LOG_TABLE} (username, timestamp)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_activity_logs_action ON {LOG_TABLE} (action, timestamp)")
+
+
+def _create_sop_files(conn):
+    # 已存放 SOP 的內容雜湊登記，供上傳時去重；也納入增量同步
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sop_files (
+            file_key TEXT PRIMARY KEY,
+            digest TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            path TEXT NOT NULL,
+            size INTEGER,
+            created_at TEXT
+        )
+    """)
+    install_change_journal(conn)
+
+
+def _create_fixtures(conn):
+    # 治具管理：治具與產品多對多；使用次數以事件累加（批次寫入、同步時不會互相覆蓋）
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fixtures (
+            fixture_id TEXT PRIMARY KEY,
+            name TEXT,
+            location TEXT,
+            usage_limit INTEGER,
+            last_calibrated TEXT,
+            calibration_due TEXT,
+            updated_by TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fixture_products (
+            link_key TEXT PRIMARY KEY,
+            fixture_id TEXT NOT NULL,
+            product_code TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS fixture_usage (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            fixture_id TEXT NOT NULL,
+            uses INTEGER NOT NULL,
+            recorded_by TEXT,
+            recorded_at TEXT
+        )
+    """)
+    # 依治具查產品、依產品查治具都走索引；使用次數加總只需讀索引
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_fixture_products_fixture ON fixture_products (fixture_id, product_code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixture_products_product ON fixture_products (product_code, fixture_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixture_usage_fixture ON fixture_usage (fixture_id, uses)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_fixtures_calibration_due ON fixtures (calibration_due)")
+    install_change_journal(conn)
+
+
+def _create_bom(conn):
+    # 測試BOM：每列為一個上階料號 -> 子料號的用量，最上階為 issues 的產品編號；
+    # 多階展開與反查以遞迴 CTE 沿兩個涵蓋索引查詢，不需另存展開結果
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS bom_items (
+            link_key TEXT PRIMARY KEY,
+            parent_code TEXT NOT NULL,
+            child_code TEXT NOT NULL,
+            quantity REAL NOT NULL DEFAULT 1,
+            description TEXT,
+            updated_by TEXT,
+            updated_at TEXT
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bom_items_parent ON bom_items (parent_code, child_code, quantity)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_bom_items_child ON bom_items (child_code, parent_code, quantity)")
+    install_change_journal(conn)
+
+
+def _add_change_mark_index(conn):
+    # 自動更新畫面時查詢各資料表最後一次修改或刪除的變更序號，只需讀索引的尾端
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_sync_journal_table_op ON sync_journal (table_name, op, seq)")
+
+
+def _create_activity_rollups(conn):
+    # 統計分析用的彙總表，由觸發器在寫入操作紀錄 / 登記 SOP 檔案的同一個交易內累加，
+    # 查詢某段期間只需讀彙總表，不必掃描整個操作紀錄。
+    # 刪除或封存紀錄時不扣回：彙總代表實際發生過的操作，封存後的月份仍可統計。
+    # 只有同步套用時（suspend）的刪除才扣回：那是把資料列搬到伺服器或換成伺服器版本，
+    # 稍後會再插入一次；其他站台真正刪除的資料列（remote_delete）同樣不扣回
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS activity_daily (
+            day TEXT NOT NULL,
+            username TEXT NOT NULL,
+            action TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (day, username, action)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sop_upload_daily (
+            day TEXT NOT NULL,
+            folder TEXT NOT NULL,
+            files INTEGER NOT NULL,
+            bytes INTEGER NOT NULL,
+            PRIMARY KEY (day, folder)
+        ) WITHOUT ROWID
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{LOG_TABLE}_rollup AFTER INSERT ON {LOG_TABLE}
+        BEGIN
+            INSERT INTO activity_daily (day, username, action, count)
+            VALUES (substr(NEW.timestamp, 1, 10), COALESCE(NEW.username, ''), COALESCE(NEW.action, ''), 1)
+            ON CONFLICT (day, username, action) DO UPDATE SET count = count + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_sop_files_rollup AFTER INSERT ON sop_files
+        BEGIN
+            INSERT INTO sop_upload_daily (day, folder, files, bytes)
+            VALUES (substr(NEW.created_at, 1, 10), NEW.folder, 1, COALESCE(NEW.size, 0))
+            ON CONFLICT (day, folder) DO UPDATE SET files = files + 1, bytes = bytes + excluded.bytes;
+        END
+    """)
+    moving = ("WHEN EXISTS (SELECT 1 FROM sync_meta WHERE key='suspend') "
+              "AND NOT EXISTS (SELECT 1 FROM sync_meta WHERE key='remote_delete')")
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{LOG_TABLE}_rollup_sync AFTER DELETE ON {LOG_TABLE} {moving}
+        BEGIN
+            UPDATE activity_daily SET count = count - 1
+            WHERE day = substr(OLD.timestamp, 1, 10) AND username = COALESCE(OLD.username, '')
+              AND action = COALESCE(OLD.action, '');
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_sop_files_rollup_sync AFTER DELETE ON sop_files {moving}
+        BEGIN
+            UPDATE sop_upload_daily SET files = files - 1, bytes = bytes - COALESCE(OLD.size, 0)
+            WHERE day = substr(OLD.created_at, 1, 10) AND folder = OLD.folder;
+        END
+    """)
+    # 既有資料一次補齊
+    conn.execute(f"""
+        INSERT OR IGNORE INTO activity_daily (day, username, action, count)
+        SELECT substr(timestamp, 1, 10), COALESCE(username, ''), COALESCE(action, ''), COUNT(*)
+        FROM {LOG_TABLE} GROUP BY 1, 2, 3
+    """)
+    conn.execute("""
+        INSERT OR IGNORE INTO sop_upload_daily (day, folder, files, bytes)
+        SELECT substr(created_at, 1, 10), folder, COUNT(*), COALESCE(SUM(size), 0)
+        FROM sop_files GROUP BY 1, 2
+    """)
+
+
+def _mark_rollup_backfill(conn):
+    # 第 10 版只由線上資料補齊，封存過的紀錄沒有算到，需再由各月份封存重新計算。
+    # 封存檔在網路磁碟上，讀取可能很慢或失敗，不在結構升級中進行：
+    # 這裡只記下待辦，由 log_archive.backfill_activity_rollups 在啟動後執行
+    conn.execute("CREATE TABLE IF NOT EXISTS pending_backfills (name TEXT PRIMARY KEY)")
+    conn.execute("INSERT OR IGNORE INTO pending_backfills (name) VALUES ('activity_daily')")
+
+
+# (版本, 說明, 套用函式)，只能在尾端新增，不可修改已發佈的版本
+MIGRATIONS = [
+    (1, "建立 issues / users / activity_logs", _create_base_tables),
+    (2, "issues 補 dip_sop 欄位", _add_dip_sop_column),
+    (3, "增量同步變更日誌", install_change_journal),
+    (4, "生產資訊全文索引", install_search_index),
+    (5, "排序與篩選索引", _add_sort_filter_indexes),
+    (6, "SOP 檔案去重登記", _create_sop_files),
+    (7, "治具管理", _create_fixtures),
+    (8, "測試BOM", _create_bom),
+    (9, "變更偵測索引", _add_change_mark_index),
+    (10, "操作統計彙總", _create_activity_rollups),
+    (11, "全文索引只收 SOP 檔名", rebuild_search_index),
+    (12, "操作統計待補封存紀錄", _mark_rollup_backfill),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def run_migrations(conn):
+    version = current_version(conn)
+    if version > LATEST_VERSION:
+        raise RuntimeError(f"資料庫版本 {version} 比程式支援的 {LATEST_VERSION} 新，請更新程式")
+    for target, description, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ 資料庫已升級至第 {target} 版：{description}")
+    return current_version(conn)
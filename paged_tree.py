@@ -0,0 +1,89 @@
+import time
+
+from perf import TIMER
+
+# Treeview 分頁載入：只先載入一頁，捲動到接近底部時再以 keyset 取下一頁
+PAGE_SIZE = 200
+LOAD_MORE_THRESHOLD = 0.9
+
+
+class PagedTreeview:
+    def __init__(self, tree, fetch_page, page_size=PAGE_SIZE, runner=None, name=None):
+        """fetch_page(after, limit) 需回傳 (rows, next_after)，rows 為 [(iid 或 None, values, tags), ...]。
+
+        指定 runner（tk_async.QueryRunner）時 fetch_page 在背景執行緒執行，不可存取 Tk 元件。
+        指定 name 時，每頁從開始載入到顯示完成的時間記錄為 perf 的 ui.<name>。
+        """
+        self.tree = tree
+        self._fetch_page = fetch_page
+        self._runner = runner
+        self._name = name
+        self._started = None
+        self._page_size = page_size
+        self._after = None
+        self._exhausted = True
+        self._loading = False
+        self._yscroll = str(tree.cget("yscrollcommand"))
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    @property
+    def exhausted(self):
+        # 所有資料都已載入表格
+        return self._exhausted
+
+    def reset(self):
+        # 一次清空所有項目，比逐筆 delete 快得多
+        children = self.tree.get_children()
+        if children:
+            self.tree.delete(*children)
+        self._after = None
+        self._exhausted = False
+        # 背景中尚未回來的上一頁由 runner 丟棄
+        self._loading = False
+        self.load_more()
+
+    def cancel(self):
+        # 放棄載入中的頁面；之後捲動到底部會重新載入
+        if self._runner is not None and self._loading:
+            self._runner.cancel()
+        self._loading = False
+
+    def load_more(self):
+        if self._exhausted or self._loading:
+            return
+        self._loading = True
+        self._started = time.perf_counter()
+        if self._runner is not None:
+            after, limit = self._after, self._page_size
+            self._runner.submit(lambda: self._fetch_page(after, limit), self._insert_page, self._on_error)
+            return
+        try:
+            self._insert_page(self._fetch_page(self._after, self._page_size))
+        finally:
+            self._loading = False
+
+    def _insert_page(self, result):
+        rows, self._after = result
+        for iid, values, tags in rows:
+            if iid is None:
+                self.tree.insert("", "end", values=values, tags=tags)
+            elif not self.tree.exists(iid):
+                # 自動更新可能已先補上同一筆新資料
+                self.tree.insert("", "end", iid=iid, values=values, tags=tags)
+        if self._after is None:
+            self._exhausted = True
+        self._loading = False
+        if self._name:
+            TIMER.record(f"ui.{self._name}", (time.perf_counter() - self._started) * 1000, f"{len(rows)} 筆")
+
+    def _on_error(self, exc):
+        # 查詢失敗時停止自動載入，例外交由 Tk 的錯誤處理顯示
+        self._loading = False
+        self._exhausted = True
+        raise exc
+
+    def _on_scroll(self, first, last):
+        if self._yscroll:
+            self.tree.tk.eval(f"{self._yscroll} {first} {last}")
+        if not self._exhausted and float(last) >= LOAD_MORE_THRESHOLD:
+            self.tree.after_idle(self.load_more)
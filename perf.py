@@ -0,0 +1,142 @@
+import bisect
+import collections
+import contextlib
+import threading
+import time
+from datetime import datetime
+
+from settings import SLOW_OPERATION_MS, SLOW_LOG_PATH, STARTUP_LOG_PATH
+
+# 效能量測工具
+
+
+class StartupTimer:
+    def __init__(self, start=None):
+        self._start = start if start is not None else time.perf_counter()
+        self._last = self._start
+        self.steps = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.steps.append((name, now - self._last))
+        self._last = now
+
+    def skip(self):
+        # 排除等待使用者輸入（例如登入視窗）的時間
+        self._last = time.perf_counter()
+
+    def total(self):
+        return sum(seconds for _, seconds in self.steps)
+
+    def summary(self):
+        return "，".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.steps) + \
+            f"，合計 {self.total() * 1000:.0f} ms"
+
+    def report(self, log_path=STARTUP_LOG_PATH):
+        # 除了主控台，也寫入紀錄檔並保留在 LAST_STARTUP 供「效能監控」分頁顯示
+        global LAST_STARTUP
+        LAST_STARTUP = self
+        print("⏱ 啟動時間報告：")
+        for name, seconds in self.steps:
+            print(f"   {name:<12} {seconds * 1000:8.1f} ms")
+        print(f"   {'合計':<12} {self.total() * 1000:8.1f} ms")
+        fields = [f"{name}={seconds * 1000:.1f}" for name, seconds in self.steps]
+        fields.append(f"合計={self.total() * 1000:.1f}")
+        try:
+            with open(log_path, "a", encoding="utf-8") as f:
+                f.write("\t".join([datetime.now().isoformat(timespec="seconds"), *fields]) + "\n")
+        except OSError:
+            pass
+
+
+LAST_STARTUP = None
+
+
+# === 執行期間的操作計時 ===
+# 各操作的耗時累計成直方圖；超過門檻的寫入慢操作紀錄檔，供「效能監控」分頁查看
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+RECENT_SLOW = 200
+
+
+class OperationStats:
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * len(BUCKETS_MS)
+
+    def add(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, q):
+        # 以直方圖估計：回傳累計達 q 的區間上限（最後一區回傳實際最大值）
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.buckets):
+            seen += n
+            if n and seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+
+class OperationTimer:
+    def __init__(self, slow_ms=SLOW_OPERATION_MS, slow_log_path=SLOW_LOG_PATH):
+        self.slow_ms = slow_ms
+        self.slow_log_path = slow_log_path
+        self._stats = {}
+        self._recent_slow = collections.deque(maxlen=RECENT_SLOW)
+        self._lock = threading.Lock()
+
+    def record(self, name, ms, detail=""):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = OperationStats()
+            stats.add(ms)
+            if ms < self.slow_ms:
+                return
+            entry = (datetime.now().isoformat(timespec="seconds"), name, round(ms, 1), str(detail))
+            self._recent_slow.append(entry)
+        try:
+            with open(self.slow_log_path, "a", encoding="utf-8") as f:
+                f.write("\t".join(map(str, entry)) + "\n")
+        except OSError:
+            pass
+
+    @contextlib.contextmanager
+    def timed(self, name, detail=""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000, detail)
+
+    def snapshot(self):
+        """回傳 [(名稱, 次數, 平均, p50, p95, 最大)]，單位毫秒，依總耗時排序。"""
+        with self._lock:
+            items = [(name, stats.count, stats.total_ms / stats.count, stats.percentile(0.5),
+                      stats.percentile(0.95), stats.max_ms, stats.total_ms)
+                     for name, stats in self._stats.items()]
+        items.sort(key=lambda item: item[-1], reverse=True)
+        return [item[:-1] for item in items]
+
+    def recent_slow(self):
+        # 最新的在前
+        with self._lock:
+            return list(reversed(self._recent_slow))
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._recent_slow.clear()
+
+
+TIMER = OperationTimer()
+
+
+def timed(name, detail=""):
+    # with timed("db.search_issues"): ...
+    return TIMER.timed(name, detail)
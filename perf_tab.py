@@ -0,0 +1,54 @@
+import tkinter as tk
+from tkinter import ttk
+
+import perf
+from perf import TIMER
+from settings import STARTUP_LOG_PATH
+
+def build_perf_tab(tab):
+    frame = tk.Frame(tab)
+    frame.pack(fill="both", expand=True, padx=10, pady=10)
+    tk.Label(frame, text="效能監控（僅限管理者，統計本次開啟程式後的操作）").pack(anchor="w")
+    tk.Label(frame, text=f"慢操作門檻：{TIMER.slow_ms} ms，紀錄檔：{TIMER.slow_log_path}", fg="gray").pack(anchor="w")
+    startup_var = tk.StringVar()
+    tk.Label(frame, textvariable=startup_var, fg="gray", justify="left").pack(anchor="w")
+
+    columns = ("操作", "次數", "平均(ms)", "p50(ms)", "p95(ms)", "最大(ms)")
+    stats_tree = ttk.Treeview(frame, columns=columns, show="headings", height=12)
+    for col in columns:
+        stats_tree.heading(col, text=col)
+        stats_tree.column(col, width=200 if col == "操作" else 90, anchor="w" if col == "操作" else "e")
+    stats_tree.pack(fill="both", expand=True, pady=5)
+
+    tk.Label(frame, text="最近的慢操作").pack(anchor="w")
+    slow_columns = ("時間", "操作", "耗時(ms)", "說明")
+    slow_tree = ttk.Treeview(frame, columns=slow_columns, show="headings", height=8)
+    for col in slow_columns:
+        slow_tree.heading(col, text=col)
+        slow_tree.column(col, width=300 if col == "說明" else 150)
+    slow_tree.pack(fill="both", expand=True, pady=5)
+
+    def refresh_stats():
+        # 資料都在記憶體中，直接在主執行緒更新即可
+        if perf.LAST_STARTUP is not None:
+            startup_var.set(f"本次啟動：{perf.LAST_STARTUP.summary()}\n歷次啟動紀錄：{STARTUP_LOG_PATH}")
+        for tree in (stats_tree, slow_tree):
+            children = tree.get_children()
+            if children:
+                tree.delete(*children)
+        for name, count, avg, p50, p95, max_ms in TIMER.snapshot():
+            stats_tree.insert("", "end", values=(name, count, f"{avg:.1f}", f"{p50:.1f}", f"{p95:.1f}", f"{max_ms:.1f}"))
+        for entry in TIMER.recent_slow():
+            slow_tree.insert("", "end", values=entry)
+
+    def reset_stats():
+        TIMER.reset()
+        refresh_stats()
+
+    button_frame = tk.Frame(frame)
+    button_frame.pack(anchor="e", pady=5)
+    tk.Button(button_frame, text="清除統計", command=reset_stats).pack(side="left", padx=5)
+    tk.Button(button_frame, text="重新整理", command=refresh_stats).pack(side="left", padx=5)
+
+    refresh_stats()
+    return refresh_stats
@@ -0,0 +1,15 @@
+import os
+from datetime import datetime
+
+# 產品編號規則與 SOP 檔名，GUI 與批次匯入共用
+VALID_CODE_LENGTHS = (8, 10, 12)
+
+
+def is_valid_product_code(code):
+    return len(code) in VALID_CODE_LENGTHS and code.isdigit()
+
+
+def make_sop_filename(file_path, digest):
+    # 加上內容雜湊前 8 碼：同一秒上傳、檔名相同但內容不同的檔案不會取到同一個名稱
+    timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
+    return f"{timestamp}_{digest[:8]}_{os.path.basename(file_path)}"
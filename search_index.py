@@ -0,0 +1,198 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 生產資訊查詢用的全文索引：FTS5 trigram 支援中文任意子字串比對
+ISSUE_COLUMNS = "product_code, product_name, dip_sop, assembly_sop, test_sop, packaging_sop, oqc_checklist, created_by, created_at"
+SOP_COLUMNS = ("dip_sop", "assembly_sop", "test_sop", "packaging_sop", "oqc_checklist")
+
+# trigram 最少需要 3 個字元才能比對，較短的關鍵字走 LIKE
+MIN_TRIGRAM_LENGTH = 3
+
+# 即時查詢的結果快取：保留最近的關鍵字分頁，逾時後重新查詢以取得其他站台的新資料
+RESULT_CACHE_SIZE = 64
+RESULT_CACHE_TTL = 30   # 秒
+
+_fts_available = None
+
+
+def fts_available():
+    global _fts_available
+    if _fts_available is None:
+        conn = sqlite3.connect(":memory:")
+        try:
+            conn.execute("CREATE VIRTUAL TABLE t USING fts5(a, tokenize='trigram')")
+            _fts_available = True
+        except sqlite3.OperationalError:
+            _fts_available = False
+        finally:
+            conn.close()
+    return _fts_available
+
+
+# make_sop_filename 加上的前綴：「時間_雜湊8碼_」，舊檔只有「時間_」
+_TIMESTAMP_GLOB = "[0-9]" * 14 + "_"
+_DIGEST_GLOB = "[0-9a-f]" * 8 + "_"
+
+
+def _basename(expr):
+    # 只取檔名：rtrim 去掉結尾所有非分隔字元，剩下的長度就是資料夾部分。
+    # 觸發器也會在其他連線（同步、資料服務）執行，不能依賴自訂的 Python 函式
+    return f"substr({expr}, length(rtrim({expr}, replace(replace({expr}, '/', ''), '\\', ''))) + 1)"
+
+
+def _original_name(expr):
+    # 去掉上傳時加上的時間與雜湊，否則「120」之類的數字會比對到大部分的檔名
+    name = _basename(expr)
+    return f"""CASE
+        WHEN {name} GLOB '{_TIMESTAMP_GLOB}{_DIGEST_GLOB}?*' THEN substr({name}, 25)
+        WHEN {name} GLOB '{_TIMESTAMP_GLOB}?*' THEN substr({name}, 16)
+        ELSE COALESCE({name}, '') END"""
+
+
+def _sop_text(prefix):
+    # 只收錄 SOP 的原始檔名：完整路徑與未填欄位存的資料夾路徑人人相同，
+    # 索引進去會讓「SOP」「工程部」等關鍵字比對到每個產品
+    return "trim(" + " || ' ' || ".join(_original_name(f"{prefix}.{col}") for col in SOP_COLUMNS) + ")"
+
+
+def install_search_index(conn):
+    # 建立 issues_fts 與同步觸發器；沒有 FTS5 的環境直接略過，查詢會退回 LIKE
+    if not fts_available():
+        print("⚠️ SQLite 未編入 FTS5，查詢將使用 LIKE")
+        return False
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name='issues_fts'").fetchone()
+    if not exists:
+        conn.execute("""
+            CREATE VIRTUAL TABLE issues_fts USING fts5(
+                product_code, product_name, sop_files, tokenize='trigram'
+            )
+        """)
+        conn.execute(f"""
+            INSERT INTO issues_fts (rowid, product_code, product_name, sop_files)
+            SELECT rowid, product_code, product_name, {_sop_text('issues')} FROM issues
+        """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_issues_fts_insert AFTER INSERT ON issues
+        BEGIN
+            INSERT INTO issues_fts (rowid, product_code, product_name, sop_files)
+            VALUES (NEW.rowid, NEW.product_code, NEW.product_name, {_sop_text('NEW')});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_issues_fts_update AFTER UPDATE ON issues
+        BEGIN
+            DELETE FROM issues_fts WHERE rowid = OLD.rowid;
+            INSERT INTO issues_fts (rowid, product_code, product_name, sop_files)
+            VALUES (NEW.rowid, NEW.product_code, NEW.product_name, {_sop_text('NEW')});
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_issues_fts_delete AFTER DELETE ON issues
+        BEGIN
+            DELETE FROM issues_fts WHERE rowid = OLD.rowid;
+        END
+    """)
+    return True
+
+
+def rebuild_search_index(conn):
+    # 索引內容或觸發器定義改變時重建
+    for suffix in ("insert", "update", "delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS trg_issues_fts_{suffix}")
+    conn.execute("DROP TABLE IF EXISTS issues_fts")
+    return install_search_index(conn)
+
+
+def _has_index(conn):
+    return fts_available() and conn.execute("SELECT 1 FROM sqlite_master WHERE name='issues_fts'").fetchone()
+
+
+def search_issues_page(conn, keyword, sort_desc=True, after=None, limit=None, newer_than=None):
+    """以 keyset 分頁查詢 issues，回傳 (rows, next_after)。
+
+    排序鍵為 (產品編號開頭相符, created_at, rowid)；將 next_after 傳回下一次呼叫即可取得下一頁，
+    為 None 表示沒有更多資料。limit 為 None 時一次取回全部。
+    newer_than 為 rowid，只回傳之後新增的資料，供畫面自動補上新資料。
+    """
+    direction = "DESC" if sort_desc else "ASC"
+    compare = "<" if sort_desc else ">"
+    cols = ", ".join(f"i.{c.strip()}" for c in ISSUE_COLUMNS.split(","))
+
+    if not keyword:
+        key_expr, key_params = "0", []
+        from_where, where_params = "FROM issues i WHERE 1", []
+    else:
+        escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        prefix = escaped + "%"
+        # 升冪時將相符旗標取負號，讓三個排序鍵同一方向比較，開頭相符者仍排最前
+        key_expr = "(i.product_code LIKE ? ESCAPE '\\')"
+        if not sort_desc:
+            key_expr = "-" + key_expr
+        key_params = [prefix]
+        if len(keyword) >= MIN_TRIGRAM_LENGTH and _has_index(conn):
+            from_where = "FROM issues_fts f JOIN issues i ON i.rowid = f.rowid WHERE issues_fts MATCH ?"
+            where_params = ['"' + keyword.replace('"', '""') + '"']
+        else:
+            # 與全文索引比對相同的欄位，SOP 也只比對原始檔名，關鍵字長短不影響結果
+            pattern = "%" + escaped + "%"
+            from_where = ("FROM issues i WHERE (i.product_code LIKE ? ESCAPE '\\' OR i.product_name LIKE ? ESCAPE '\\'"
+                          f" OR {_sop_text('i')} LIKE ? ESCAPE '\\')")
+            where_params = [pattern, pattern, pattern]
+
+    sql = f"SELECT {cols}, {key_expr}, i.created_at, i.rowid {from_where}"
+    params = key_params + where_params
+    if newer_than is not None:
+        sql += " AND i.rowid > ?"
+        params.append(newer_than)
+    if after is not None:
+        sql += f" AND ({key_expr}, i.created_at, i.rowid) {compare} (?, ?, ?)"
+        params += key_params + list(after)
+    if keyword:
+        sql += f" ORDER BY {key_expr} {direction}, i.created_at {direction}, i.rowid {direction}"
+        params += key_params
+    else:
+        sql += f" ORDER BY i.created_at {direction}, i.rowid {direction}"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+
+    raw = conn.execute(sql, params).fetchall()
+    rows = [r[:-3] for r in raw]
+    next_after = tuple(raw[-1][-3:]) if limit and len(raw) == limit else None
+    return rows, next_after
+
+
+class ResultCache:
+    """以 LRU 保留最近查詢過的分頁結果，key 需可雜湊；查詢在背景執行緒時也可安全使用。"""
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL):
+        self._max_entries = max_entries
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self._ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        # 新增、刪除或更新資料後呼叫
+        with self._lock:
+            self._entries.clear()
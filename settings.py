@@ -0,0 +1,42 @@
+import os
+import tempfile
+
+# 設定原始資料庫與本機暫存資料庫位置
+ORIGINAL_DB = r"C:\Users\user\Desktop\Nelson\Dev\GitHub\Troubleshooting platform\troubleshooting.db"
+LOCAL_DB = os.path.join(tempfile.gettempdir(), "troubleshooting.db")
+
+DIP_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\DIP_SOP"
+ASSEMBLY_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\組裝SOP"
+TEST_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\測試SOP"
+PACKAGING_SOP_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\包裝SOP"
+OQC_PATH = r"\\192.120.100.177\工程部\生產管理\上齊SOP大禮包\檢查表OQC"
+
+# (顯示名稱, 網路資料夾, issues 欄位)
+SOP_FIELDS = [
+    ("DIP SOP", DIP_SOP_PATH, "dip_sop"),
+    ("組裝SOP", ASSEMBLY_SOP_PATH, "assembly_sop"),
+    ("測試SOP", TEST_SOP_PATH, "test_sop"),
+    ("包裝SOP", PACKAGING_SOP_PATH, "packaging_sop"),
+    ("檢查表OQC", OQC_PATH, "oqc_checklist"),
+]
+
+LOG_TABLE = "activity_logs"
+# 操作紀錄封存檔與共用資料庫放在同一個網路資料夾
+LOG_ARCHIVE_DIR = os.path.join(os.path.dirname(ORIGINAL_DB), "log_archive")
+
+# 資料服務位址（例如 http://192.120.100.177:8765）；留空時直接開啟本機副本資料庫
+SERVICE_URL = os.environ.get("TROUBLESHOOTING_SERVICE_URL", "")
+SERVICE_PORT = 8765
+
+# 超過此毫秒數的資料庫呼叫、檔案複製與畫面更新會寫入慢操作紀錄
+SLOW_OPERATION_MS = int(os.environ.get("TROUBLESHOOTING_SLOW_MS", "500"))
+SLOW_LOG_PATH = os.path.join(tempfile.gettempdir(), "troubleshooting_slow_operations.log")
+# 打包後沒有主控台，啟動時間報告另外寫入紀錄檔（每次啟動一行）
+STARTUP_LOG_PATH = os.path.join(tempfile.gettempdir(), "troubleshooting_startup.log")
+
+# 密碼 PBKDF2 次數：越高越安全但登入越慢，產線電腦上以約 100ms 為準（可用 python auth.py 估算）
+PASSWORD_ITERATIONS = int(os.environ.get("TROUBLESHOOTING_PBKDF2_ITERATIONS", "120000"))
+
+# 自動更新畫面：每隔幾秒檢查資料是否有變動（服務模式經網路查詢，間隔較長）
+CHANGE_POLL_SECONDS = 1.0
+REMOTE_CHANGE_POLL_SECONDS = 5.0
@@ -0,0 +1,133 @@
+import hashlib
+import os
+import sqlite3
+import stat
+import tempfile
+import time
+from contextlib import closing
+
+# 本機 SOP 文件快取：以內容 SHA-256 存放，同一份 SOP 被多個產品引用也只存一份；
+# 每次開啟前以網路檔案的大小與修改時間驗證，超過容量時依最近使用時間淘汰
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "troubleshooting_sop_cache")
+MAX_CACHE_BYTES = 2 * 1024 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+
+class SopDocumentCache:
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._objects_dir = os.path.join(cache_dir, "objects")
+        os.makedirs(self._objects_dir, exist_ok=True)
+        self._db = os.path.join(cache_dir, "cache.db")
+        with closing(self._connect()) as conn, conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    source TEXT PRIMARY KEY,
+                    digest TEXT NOT NULL,
+                    size INTEGER,
+                    mtime REAL,
+                    last_used REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries (digest)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS objects (
+                    digest TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    size INTEGER
+                )
+            """)
+
+    def _connect(self):
+        # 由背景執行緒呼叫，每次使用獨立的短連線，避免執行緒結束後留下未關閉的連線
+        conn = sqlite3.connect(self._db, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, source, meta=None):
+        """回傳 source 在本機快取的路徑，必要時自網路磁碟下載。
+
+        meta 可傳入已知的 (大小, 修改時間)（例如 SOP 檔案索引的結果），省去一次網路 stat。
+        """
+        if not meta:
+            st = os.stat(source)
+            meta = (st.st_size, st.st_mtime)
+        size, mtime = meta
+        with closing(self._connect()) as conn:
+            return self._get(conn, source, size, mtime)
+
+    def _get(self, conn, source, size, mtime):
+        row = conn.execute("""
+            SELECT o.path FROM entries e JOIN objects o ON o.digest = e.digest
+            WHERE e.source=? AND e.size=? AND e.mtime=?
+        """, (source, size, mtime)).fetchone()
+        if row and os.path.exists(row[0]):
+            with conn:
+                conn.execute("UPDATE entries SET last_used=? WHERE source=?", (time.time(), source))
+            return row[0]
+
+        digest, local_path = self._download(source)
+        with conn:
+            conn.execute("INSERT OR IGNORE INTO objects (digest, path, size) VALUES (?, ?, ?)",
+                         (digest, local_path, os.path.getsize(local_path)))
+            conn.execute("""
+                INSERT OR REPLACE INTO entries (source, digest, size, mtime, last_used)
+                VALUES (?, ?, ?, ?, ?)
+            """, (source, digest, size, mtime, time.time()))
+        self._evict(conn, keep=digest)
+        return local_path
+
+    def _download(self, source):
+        # 邊複製邊計算雜湊；內容已存在快取時丟棄暫存檔
+        ext = os.path.splitext(source)[1]
+        sha = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=self._objects_dir, suffix=".part")
+        try:
+            with open(source, "rb") as fin, os.fdopen(fd, "wb") as fout:
+                while True:
+                    chunk = fin.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    sha.update(chunk)
+                    fout.write(chunk)
+            digest = sha.hexdigest()
+            local_path = os.path.join(self._objects_dir, digest + ext)
+            if os.path.exists(local_path):
+                os.remove(tmp)
+            else:
+                os.replace(tmp, local_path)
+                # 設為唯讀，避免誤把快取副本當成正本修改
+                os.chmod(local_path, stat.S_IREAD)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        return digest, local_path
+
+    def _evict(self, conn, keep=None):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        candidates = conn.execute("""
+            SELECT o.digest, o.path, o.size FROM objects o
+            LEFT JOIN entries e ON e.digest = o.digest
+            GROUP BY o.digest
+            ORDER BY COALESCE(MAX(e.last_used), 0)
+        """).fetchall()
+        with conn:
+            for digest, path, size in candidates:
+                if total <= self.max_bytes:
+                    break
+                if digest == keep:
+                    continue
+                try:
+                    if os.path.exists(path):
+                        os.chmod(path, stat.S_IWRITE | stat.S_IREAD)
+                        os.remove(path)
+                except OSError:
+                    # 檔案仍被檢視器開啟中（Windows），下次再淘汰
+                    continue
+                conn.execute("DELETE FROM entries WHERE digest=?", (digest,))
+                conn.execute("DELETE FROM objects WHERE digest=?", (digest,))
+                total -= size
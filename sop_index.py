@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+# SOP 資料夾檔案索引：背景以 scandir 列出整個資料夾（每個資料夾一次網路往返），
+# 記錄檔案大小與修改時間，介面查詢檔案是否存在時不必再對網路路徑逐一 stat
+INDEX_TTL = 300          # 秒；超過即使資料夾修改時間未變也重新列舉
+SCAN_INTERVAL = 60       # 秒；背景檢查資料夾是否有異動的間隔
+CACHE_PATH = os.path.join(tempfile.gettempdir(), "troubleshooting_sop_index.json")
+
+
+def _key(path):
+    return os.path.normcase(os.path.normpath(path))
+
+
+class SopFileIndex:
+    def __init__(self, folders, cache_path=CACHE_PATH, ttl=INDEX_TTL, interval=SCAN_INTERVAL):
+        self._folders = [_key(folder) for folder in folders]
+        self._cache_path = cache_path
+        self._ttl = ttl
+        self._interval = interval
+        self._lock = threading.Lock()
+        # folder -> {"mtime": 資料夾修改時間, "scanned_at": 掃描時間, "files": {檔名: [大小, 修改時間]}}
+        self._folder_state = {}
+        self._stop = threading.Event()
+        self._thread = None
+        self._load_cache()
+
+    def _load_cache(self):
+        # 先載入上次的索引，啟動後馬上可用，背景再慢慢更新
+        try:
+            with open(self._cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            self._folder_state = {k: v for k, v in data.items() if k in self._folders}
+
+    def _save_cache(self):
+        with self._lock:
+            data = json.dumps(self._folder_state, ensure_ascii=False)
+        tmp = self._cache_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self._cache_path)
+        except OSError:
+            pass
+
+    def lookup(self, path):
+        """回傳 (大小, 修改時間)；檔案不存在回傳 False；資料夾尚未掃描過回傳 None。"""
+        key = _key(path)
+        folder, name = os.path.split(key)
+        with self._lock:
+            state = self._folder_state.get(folder)
+            if state is None:
+                return None
+            entry = state["files"].get(name)
+        return tuple(entry) if entry else False
+
+    def exists(self, path):
+        # True / False；索引沒有資料時回傳 None，由呼叫端自行判斷
+        result = self.lookup(path)
+        return None if result is None else bool(result)
+
+    def record(self, path, size, mtime):
+        # 剛上傳的檔案直接記入索引，不必等下次掃描
+        folder, name = os.path.split(_key(path))
+        with self._lock:
+            state = self._folder_state.get(folder)
+            if state is not None:
+                state["files"][name] = [size, mtime]
+
+    def refresh(self, force=False):
+        changed = False
+        now = time.time()
+        for folder in self._folders:
+            try:
+                folder_mtime = os.stat(folder).st_mtime
+            except OSError:
+                continue
+            with self._lock:
+                state = self._folder_state.get(folder)
+            if (not force and state and state["mtime"] == folder_mtime
+                    and now - state["scanned_at"] < self._ttl):
+                continue
+            files = {}
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.is_file():
+                            st = entry.stat()
+                            files[os.path.normcase(entry.name)] = [st.st_size, st.st_mtime]
+            except OSError:
+                continue
+            with self._lock:
+                self._folder_state[folder] = {"mtime": folder_mtime, "scanned_at": now, "files": files}
+            changed = True
+        if changed:
+            self._save_cache()
+        return changed
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="sop-index", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ SOP 檔案索引更新失敗: {e}")
+            self._stop.wait(self._interval)
@@ -0,0 +1,95 @@
+import argparse
+import hashlib
+import os
+import sys
+from datetime import datetime
+
+# SOP 檔案去重：上傳前以內容 SHA-256 查詢同一資料夾是否已有相同檔案，
+# 有的話直接讓 issues 引用既有檔案，不再另存一份
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _file_key(digest, folder):
+    return f"{digest}@{os.path.normcase(os.path.normpath(folder))}"
+
+
+def find_stored(conn, digest, folder):
+    # 回傳已存放於 folder 的相同內容檔案路徑，沒有則回傳 None
+    row = conn.execute("SELECT path FROM sop_files WHERE file_key=?", (_file_key(digest, folder),)).fetchone()
+    return row[0] if row else None
+
+
+def register_stored(conn, digest, folder, path, size):
+    conn.execute("""
+        INSERT OR REPLACE INTO sop_files (file_key, digest, folder, path, size, created_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, (_file_key(digest, folder), digest, folder, path, size, datetime.now().isoformat()))
+
+
+def forget_stored(conn, digest, folder):
+    # 登記的檔案已不在網路磁碟上時呼叫，下次上傳會重新複製
+    conn.execute("DELETE FROM sop_files WHERE file_key=?", (_file_key(digest, folder),))
+
+
+def duplicate_report(folders):
+    """掃描 SOP 資料夾找出內容相同的檔案，回傳 (重複群組列表, 可回收位元組)。
+
+    只對大小相同的檔案計算雜湊，避免把整個網路資料夾都讀一遍。
+    """
+    by_size = {}
+    for folder in folders:
+        try:
+            with os.scandir(folder) as it:
+                for entry in it:
+                    if entry.is_file():
+                        by_size.setdefault((folder, entry.stat().st_size), []).append(entry.path)
+        except OSError as e:
+            print(f"⚠️ 無法讀取資料夾 {folder}: {e}")
+
+    groups, reclaimable = [], 0
+    for (folder, size), paths in by_size.items():
+        if len(paths) < 2:
+            continue
+        by_digest = {}
+        for path in paths:
+            try:
+                by_digest.setdefault(file_digest(path), []).append(path)
+            except OSError:
+                continue
+        for digest, same in by_digest.items():
+            if len(same) > 1:
+                groups.append({"digest": digest, "size": size, "paths": sorted(same)})
+                reclaimable += size * (len(same) - 1)
+    return groups, reclaimable
+
+
+def main(argv=None):
+    from settings import SOP_FIELDS
+
+    parser = argparse.ArgumentParser(description="列出 SOP 資料夾中內容重複的檔案與可回收空間")
+    parser.add_argument("folders", nargs="*", help="要掃描的資料夾（預設為五個 SOP 資料夾）")
+    args = parser.parse_args(argv)
+    folders = args.folders or [folder for _, folder, _ in SOP_FIELDS]
+
+    groups, reclaimable = duplicate_report(folders)
+    for group in groups:
+        print(f"{group['size']:>12,} bytes × {len(group['paths'])}  {group['digest'][:12]}")
+        for path in group["paths"]:
+            print(f"    {path}")
+    print(f"共 {len(groups)} 組重複檔案，可回收 {reclaimable / 1024 / 1024:.1f} MB")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
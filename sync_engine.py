@@ -0,0 +1,317 @@
+import os
+import shutil
+import sqlite3
+import uuid
+
+# 需要同步的資料表與其主鍵
+SYNC_TABLES = {
+    "issues": "product_code",
+    "users": "username",
+    "activity_logs": "id",
+    "sop_files": "file_key",
+    "fixtures": "fixture_id",
+    "fixture_products": "link_key",
+    "fixture_usage": "id",
+    "bom_items": "link_key",
+}
+LOG_TABLE = "activity_logs"
+# 只會新增的事件表：本機新增的資料列推送時由伺服器重新配號，各站台的資料不會互相覆蓋
+APPEND_ONLY_TABLES = {LOG_TABLE, "fixture_usage"}
+
+# 伺服器端變更日誌保留天數，超過的站台需整份重新下載
+JOURNAL_RETENTION_DAYS = 30
+
+
+def install_change_journal(conn, schema="main"):
+    # 建立變更日誌與觸發器：每筆 INSERT/UPDATE/DELETE 都會記下 (資料表, 主鍵, 動作)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.sync_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_key TEXT NOT NULL,
+            op TEXT NOT NULL,
+            changed_at TEXT
+        )
+    """)
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {schema}.sync_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {schema}.sync_conflicts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT,
+            row_key TEXT,
+            detected_at TEXT
+        )
+    """)
+    conn.execute(f"INSERT OR IGNORE INTO {schema}.sync_meta (key, value) VALUES ('db_id', ?)", (uuid.uuid4().hex,))
+
+    # 同步套用遠端資料時會暫時寫入 suspend，避免回寫的資料又被記成本機變更
+    guard = "WHEN NOT EXISTS (SELECT 1 FROM sync_meta WHERE key='suspend')"
+    now = "datetime('now', 'localtime')"
+    for table, key in SYNC_TABLES.items():
+        # 後續版本才新增的資料表，等建立後再次呼叫時補上觸發器
+        if not conn.execute(f"SELECT 1 FROM {schema}.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone():
+            continue
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.trg_{table}_sync_insert AFTER INSERT ON {table} {guard}
+            BEGIN
+                INSERT INTO sync_journal (table_name, row_key, op, changed_at) VALUES ('{table}', NEW.{key}, 'I', {now});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.trg_{table}_sync_update AFTER UPDATE ON {table} {guard}
+            BEGIN
+                INSERT INTO sync_journal (table_name, row_key, op, changed_at)
+                    SELECT '{table}', OLD.{key}, 'D', {now} WHERE OLD.{key} IS NOT NEW.{key};
+                INSERT INTO sync_journal (table_name, row_key, op, changed_at) VALUES ('{table}', NEW.{key}, 'U', {now});
+            END
+        """)
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {schema}.trg_{table}_sync_delete AFTER DELETE ON {table} {guard}
+            BEGIN
+                INSERT INTO sync_journal (table_name, row_key, op, changed_at) VALUES ('{table}', OLD.{key}, 'D', {now});
+            END
+        """)
+
+
+def prune_journal(conn, schema="main", retention_days=JOURNAL_RETENTION_DAYS):
+    """刪除超過保留天數的變更日誌並記下 pruned_seq（落後於此的站台需整份重新下載），回傳刪除筆數。
+
+    各資料表最後一筆修改與刪除紀錄保留下來，資料服務的 change_marks 靠它判斷資料是否有變動。
+    """
+    cutoff = conn.execute(
+        f"SELECT MAX(seq) FROM {schema}.sync_journal WHERE changed_at < datetime('now', 'localtime', ?)",
+        (f"-{retention_days} days",)
+    ).fetchone()[0]
+    if not cutoff:
+        return 0
+    deleted = conn.execute(f"""
+        DELETE FROM {schema}.sync_journal WHERE seq <= ? AND seq NOT IN (
+            SELECT MAX(seq) FROM {schema}.sync_journal WHERE op IN ('U', 'D') GROUP BY table_name, op
+        )
+    """, (cutoff,)).rowcount
+    _meta_set(conn, schema, "pruned_seq", cutoff)
+    return deleted
+
+
+def unsynced_inserts(conn, table, schema="main"):
+    """回傳本機副本中新增後尚未推送的資料列主鍵；不是本機副本（伺服器或服務端資料庫）時回傳空清單。
+
+    只會新增的事件表推送時由伺服器重新配號，這些暫時的 id 可能與其他站台的紀錄相同。
+    """
+    if _meta_get(conn, schema, "last_pulled_seq") is None:
+        return []
+    return [row[0] for row in conn.execute(
+        f"SELECT DISTINCT row_key FROM {schema}.sync_journal WHERE table_name=? AND op='I'", (table,)
+    )]
+
+
+def _meta_get(conn, schema, key, default=None):
+    row = conn.execute(f"SELECT value FROM {schema}.sync_meta WHERE key=?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _meta_set(conn, schema, key, value):
+    conn.execute(f"INSERT OR REPLACE INTO {schema}.sync_meta (key, value) VALUES (?, ?)", (key, str(value)))
+
+
+def _common_columns(conn, table):
+    local_cols = [row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")]
+    server_cols = {row[1] for row in conn.execute(f"PRAGMA server.table_info({table})")}
+    return [c for c in local_cols if c in server_cols]
+
+
+def _pending_changes(conn):
+    # 依主鍵合併本機變更，取得第一個與最後一個動作
+    cursor = conn.execute("""
+        SELECT table_name, row_key,
+               (SELECT op FROM main.sync_journal j2 WHERE j2.table_name=j.table_name AND j2.row_key=j.row_key ORDER BY seq ASC LIMIT 1),
+               (SELECT op FROM main.sync_journal j2 WHERE j2.table_name=j.table_name AND j2.row_key=j.row_key ORDER BY seq DESC LIMIT 1)
+        FROM main.sync_journal j
+        GROUP BY table_name, row_key
+        ORDER BY MIN(seq)
+    """)
+    return cursor.fetchall()
+
+
+def _attach_server(conn, server_db):
+    conn.execute("ATTACH DATABASE ? AS server", (server_db,))
+    # 網路磁碟無法共用 WAL 的共享記憶體，伺服器端一律使用 rollback journal
+    conn.execute("PRAGMA server.journal_mode=DELETE")
+    # 本機新版程式建立的同步資料表，伺服器端若還沒有就照本機結構建立
+    for table in SYNC_TABLES:
+        row = conn.execute("SELECT sql FROM main.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        exists = conn.execute("SELECT 1 FROM server.sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+        if row and not exists:
+            conn.execute(row[0].replace(f"CREATE TABLE {table}", f"CREATE TABLE server.{table}", 1))
+        elif row:
+            # 本機補過的欄位（例如 dip_sop）也補到伺服器端，否則同步時會被略過
+            server_cols = {r[1] for r in conn.execute(f"PRAGMA server.table_info({table})")}
+            for _, name, col_type, *_ in conn.execute(f"PRAGMA main.table_info({table})").fetchall():
+                if name not in server_cols:
+                    conn.execute(f"ALTER TABLE server.{table} ADD COLUMN {name} {col_type}")
+    install_change_journal(conn, "server")
+
+
+def synchronize(local_db, server_db):
+    """將本機變更推送到伺服器並拉回其他站台的變更，只傳輸有異動的資料列。
+
+    回傳 {"pushed", "pulled", "conflicts", "resync"}；失敗時回傳 None。
+    resync 為 True 代表本機落後過多（伺服器日誌已被清除），需重新下載整份資料庫。
+    """
+    stats = {"pushed": 0, "pulled": 0, "conflicts": 0, "resync": False}
+    conn = sqlite3.connect(local_db, isolation_level=None)
+    try:
+        install_change_journal(conn, "main")
+        _attach_server(conn, server_db)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            last_pulled = int(_meta_get(conn, "main", "last_pulled_seq", 0))
+            pruned_seq = int(_meta_get(conn, "server", "pruned_seq", 0))
+            if last_pulled < pruned_seq:
+                stats["resync"] = True
+
+            # 上次同步之後被其他站台改過的資料列，本機若也改過就視為衝突
+            remote_changed = set(conn.execute(
+                "SELECT DISTINCT table_name, row_key FROM server.sync_journal WHERE seq > ?", (last_pulled,)
+            ).fetchall())
+
+            _meta_set(conn, "main", "suspend", 1)
+
+            for table, key, first_op, last_op in _pending_changes(conn):
+                pk = SYNC_TABLES[table]
+                cols = _common_columns(conn, table)
+                if table in APPEND_ONLY_TABLES and first_op == "I":
+                    # 本機新增的紀錄：由伺服器重新配號，本機這筆稍後會以伺服器 id 拉回
+                    if last_op != "D":
+                        data_cols = ", ".join(c for c in cols if c != pk)
+                        conn.execute(f"""
+                            INSERT INTO server.{table} ({data_cols})
+                            SELECT {data_cols} FROM main.{table} WHERE {pk}=?
+                        """, (key,))
+                        conn.execute(f"DELETE FROM main.{table} WHERE {pk}=?", (key,))
+                        stats["pushed"] += 1
+                    continue
+                if (table, key) in remote_changed:
+                    conn.execute("""
+                        INSERT INTO main.sync_conflicts (table_name, row_key, detected_at)
+                        VALUES (?, ?, datetime('now', 'localtime'))
+                    """, (table, key))
+                    stats["conflicts"] += 1
+                    print(f"⚠️ 同步衝突：{table}.{key} 已被其他站台修改，保留伺服器版本")
+                    continue
+                col_list = ", ".join(cols)
+                exists = conn.execute(f"SELECT 1 FROM main.{table} WHERE {pk}=?", (key,)).fetchone()
+                if exists:
+                    conn.execute(f"""
+                        INSERT OR REPLACE INTO server.{table} ({col_list})
+                        SELECT {col_list} FROM main.{table} WHERE {pk}=?
+                    """, (key,))
+                else:
+                    conn.execute(f"DELETE FROM server.{table} WHERE {pk}=?", (key,))
+                stats["pushed"] += 1
+
+            # 需要整份重新下載時不拉回任何異動，維持原本的序號，之後仍會判斷為落後
+            pulled_seq = last_pulled
+            if not stats["resync"]:
+                # 拉回伺服器端異動（含剛推送的紀錄），以伺服器版本為準
+                pulled_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM server.sync_journal").fetchone()[0]
+                replaced, removed = [], []
+                for table, key in conn.execute(
+                    "SELECT DISTINCT table_name, row_key FROM server.sync_journal WHERE seq > ? AND seq <= ?",
+                    (last_pulled, pulled_seq)
+                ).fetchall():
+                    if table not in SYNC_TABLES:
+                        continue
+                    pk = SYNC_TABLES[table]
+                    exists = conn.execute(f"SELECT 1 FROM server.{table} WHERE {pk}=?", (key,)).fetchone()
+                    (replaced if exists else removed).append((table, key))
+                # 伺服器上已刪除的資料列：標記 remote_delete，觸發器可與「取代成伺服器版本」區分
+                _meta_set(conn, "main", "remote_delete", 1)
+                for table, key in removed:
+                    conn.execute(f"DELETE FROM main.{table} WHERE {SYNC_TABLES[table]}=?", (key,))
+                conn.execute("DELETE FROM main.sync_meta WHERE key='remote_delete'")
+                for table, key in replaced:
+                    pk = SYNC_TABLES[table]
+                    col_list = ", ".join(_common_columns(conn, table))
+                    conn.execute(f"DELETE FROM main.{table} WHERE {pk}=?", (key,))
+                    conn.execute(f"""
+                        INSERT INTO main.{table} ({col_list})
+                        SELECT {col_list} FROM server.{table} WHERE {pk}=?
+                    """, (key,))
+                stats["pulled"] += len(replaced) + len(removed)
+
+            conn.execute("DELETE FROM main.sync_journal")
+            conn.execute("DELETE FROM main.sync_meta WHERE key='suspend'")
+            _meta_set(conn, "main", "last_pulled_seq", pulled_seq)
+
+            # 清除過舊的伺服器日誌
+            prune_journal(conn, "server")
+
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return stats
+    except Exception as e:
+        print(f"⚠️ 資料同步失敗: {e}")
+        return None
+    finally:
+        conn.close()
+
+
+def _remove_local_files(local_db):
+    # 舊的 -wal/-shm 若殘留，覆蓋主檔後會被錯誤套用
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        path = local_db + suffix
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _prepare_server(server_db):
+    # 確保伺服器資料庫已有變更日誌，回傳 (db_id, 目前最大序號)
+    conn = sqlite3.connect(server_db, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=DELETE")
+        install_change_journal(conn, "main")
+        db_id = _meta_get(conn, "main", "db_id")
+        server_seq = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM sync_journal").fetchone()[0]
+    finally:
+        conn.close()
+    return db_id, server_seq
+
+
+def download_full_copy(server_db, local_db):
+    _, server_seq = _prepare_server(server_db)
+    _remove_local_files(local_db)
+    shutil.copy(server_db, local_db)
+    conn = sqlite3.connect(local_db)
+    try:
+        # 複製來的是伺服器自己的變更日誌，不是本機待推送的異動
+        conn.execute("DELETE FROM main.sync_journal")
+        _meta_set(conn, "main", "last_pulled_seq", server_seq)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def open_local_replica(server_db, local_db):
+    # 啟動時：本機已有同一份資料庫的副本就只做增量同步，否則整份下載
+    if os.path.exists(local_db):
+        try:
+            server_id, _ = _prepare_server(server_db)
+            conn = sqlite3.connect(local_db)
+            try:
+                local_id = _meta_get(conn, "main", "db_id")
+            finally:
+                conn.close()
+        except sqlite3.DatabaseError as e:
+            print(f"⚠️ 本機資料庫無法使用，重新下載: {e}")
+            local_id = server_id = None
+        if local_id and local_id == server_id:
+            stats = synchronize(local_db, server_db)
+            if stats is not None and not stats["resync"]:
+                print(f"✅ 增量同步完成：推送 {stats['pushed']} 筆、下載 {stats['pulled']} 筆")
+                return stats
+    download_full_copy(server_db, local_db)
+    print("✅ 已下載完整資料庫")
+    return None
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+import auth
+import data_service
+import log_archive
+from data_service import ArchiveLocked, LocalBackend, RemoteBackend, ServiceError
+from db_access import close_all, get_connection
+from migrations import LATEST_VERSION, current_version, run_migrations
+
+ADMIN, ADMIN_PASSWORD = data_service.DEFAULT_ADMIN
+
+
+class DatabaseTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db = os.path.join(self.tmp.name, "t.db")
+        data_service.prepare_database(self.db)
+        self.backend = LocalBackend(self.db)
+
+    def tearDown(self):
+        close_all()
+        self.tmp.cleanup()
+
+    def _add_product(self, code):
+        with get_connection(self.db) as conn:
+            conn.execute("INSERT INTO issues (product_code, product_name) VALUES (?, '')", (code,))
+
+    def _audit_users(self, action):
+        return [row[0] for row in get_connection(self.db).execute(
+            "SELECT username FROM activity_logs WHERE action=?", (action,))]
+
+
+class MigrationTest(unittest.TestCase):
+    def test_migrations_are_idempotent(self):
+        conn = sqlite3.connect(":memory:")
+        self.addCleanup(conn.close)
+        self.assertEqual(run_migrations(conn), LATEST_VERSION)
+        self.assertEqual(run_migrations(conn), LATEST_VERSION)
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        for table in ("issues", "users", "activity_logs", "sync_journal", "sop_files", "fixtures", "bom_items",
+                      "activity_daily", "pending_backfills"):
+            self.assertIn(table, tables)
+
+    def test_newer_database_is_rejected(self):
+        conn = sqlite3.connect(":memory:")
+        self.addCleanup(conn.close)
+        conn.execute(f"PRAGMA user_version={LATEST_VERSION + 1}")
+        with self.assertRaises(RuntimeError):
+            run_migrations(conn)
+        self.assertEqual(current_version(conn), LATEST_VERSION + 1)
+
+
+class PasswordTest(DatabaseTestCase):
+    def _stored(self, username):
+        return get_connection(self.db).execute("SELECT password FROM users WHERE username=?",
+                                               (username,)).fetchone()[0]
+
+    def test_hash_is_salted(self):
+        first, second = auth.hash_password("pw", 1000), auth.hash_password("pw", 1000)
+        self.assertNotEqual(first, second)
+        self.assertTrue(first.startswith("pbkdf2_sha256$1000$"))
+        self.assertEqual(auth.verify_password("pw", first), (True, True))
+        self.assertEqual(auth.verify_password("wrong", first), (False, False))
+        self.assertEqual(auth.verify_password("pw", "pbkdf2_sha256$broken"), (False, False))
+        self.assertEqual(auth.verify_password("pw", None), (False, False))
+
+    def test_legacy_hash_is_rehashed_on_login(self):
+        with get_connection(self.db) as conn:
+            conn.execute("UPDATE users SET password=? WHERE username=?",
+                         (hashlib.sha256(ADMIN_PASSWORD.encode("utf-8")).hexdigest(), ADMIN))
+
+        self.assertIsNone(self.backend.call("authenticate", username=ADMIN, password="wrong"))
+        self.assertFalse(self._stored(ADMIN).startswith(auth.ALGORITHM))
+        self.assertEqual(self.backend.call("authenticate", username=ADMIN, password=ADMIN_PASSWORD), ["admin", 1, 1])
+        stored = self._stored(ADMIN)
+        self.assertTrue(stored.startswith(auth.ALGORITHM))
+        self.assertEqual(auth.verify_password(ADMIN_PASSWORD, stored), (True, False))
+
+    def test_inactive_user_cannot_log_in(self):
+        self.backend.call("add_user", username="op", password="pw", role="user", can_add=1, can_delete=0,
+                          active=0)
+        self.assertIsNone(self.backend.call("authenticate", username="op", password="pw"))
+
+
+class PermissionTest(unittest.TestCase):
+    def test_is_permitted(self):
+        cases = [
+            (None, "user", 0, 0, True),
+            ("add", "user", 1, 0, True),
+            ("add", "admin", 0, 1, False),
+            ("delete", "user", 0, 1, True),
+            ("delete", "admin", 0, 0, True),
+            ("delete", "user", 1, 0, False),
+            ("admin", "admin", 0, 0, True),
+            ("admin", "user", 1, 1, False),
+        ]
+        for permission, role, can_add, can_delete, expected in cases:
+            self.assertEqual(data_service.is_permitted(permission, role, can_add, can_delete), expected,
+                             (permission, role, can_add, can_delete))
+
+    def test_writes_that_record_an_actor_declare_it(self):
+        for name, param in data_service.ACTOR_PARAMS.items():
+            self.assertIn(name, data_service.OPERATIONS)
+            self.assertIn(param, data_service.OPERATIONS[name].__code__.co_varnames)
+
+
+class BomTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self._add_product("12345678")
+
+    def _import(self, items):
+        return self.backend.call("import_bom", boms={"12345678": items}, username=ADMIN)
+
+    def test_explode_and_where_used(self):
+        self.assertEqual(self._import([["", "A", 2, ""], ["A", "B", 3, "螺絲"]]), [])
+        rows = self.backend.call("explode_bom", product_code="12345678")
+        self.assertEqual([(row[0], row[1], row[5]) for row in rows],
+                         [(1, "/12345678/A/", 2.0), (2, "/12345678/A/B/", 6.0)])
+        used = self.backend.call("where_used", part_code="B")
+        self.assertEqual([(row[2], row[5]) for row in used], [("A", 0), ("12345678", 1)])
+
+    def test_cycle_is_rejected_and_nothing_written(self):
+        self._import([["", "A", 1, ""]])
+        with self.assertRaises(ValueError):
+            self._import([["", "A", 1, ""], ["A", "B", 1, ""], ["B", "A", 1, ""]])
+        rows = self.backend.call("explode_bom", product_code="12345678")
+        self.assertEqual([row[1] for row in rows], ["/12345678/A/"])
+
+    def test_unknown_product_is_reported(self):
+        self.assertEqual(self.backend.call("import_bom", boms={"99999999": [["", "A", 1, ""]]}, username=ADMIN),
+                         ["99999999"])
+
+
+class ServiceTest(DatabaseTestCase):
+    def setUp(self):
+        super().setUp()
+        archive_dir = data_service.LOG_ARCHIVE_DIR
+        data_service.LOG_ARCHIVE_DIR = os.path.join(self.tmp.name, "archive")
+        self.addCleanup(setattr, data_service, "LOG_ARCHIVE_DIR", archive_dir)
+        self.backend.call("add_user", username="op", password="pw", role="user", can_add=1, can_delete=0,
+                          active=1)
+        self.server = data_service.create_server(self.db, "127.0.0.1", 0)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def _login(self, username, password):
+        client = RemoteBackend(self.url)
+        self.assertIsNotNone(client.call("authenticate", username=username, password=password))
+        return client
+
+    def _save_fixture(self, client, **params):
+        # name 也是 call 的第一個參數名稱，需能當作操作的參數傳入
+        return client.call("save_fixture", fixture_id="0012", name="治具", location="", usage_limit=None,
+                           last_calibrated=None, calibration_due=None, product_codes=[], **params)
+
+    def test_name_can_be_an_operation_parameter(self):
+        self.assertEqual(self._save_fixture(self.backend, username=ADMIN), [])
+        self.assertEqual(self._save_fixture(self._login(ADMIN, ADMIN_PASSWORD), username=ADMIN), [])
+        self.assertEqual(self.backend.call("find_fixtures")[0][:2], ("0012", "治具"))
+
+    def test_calls_require_a_token(self):
+        client = RemoteBackend(self.url)
+        with self.assertRaises(ServiceError):
+            client.call("find_fixtures")
+        self.assertIsNone(client.call("authenticate", username="op", password="wrong"))
+        with self.assertRaises(ServiceError):
+            client.call("find_fixtures")
+        client.call("authenticate", username="op", password="pw")
+        self.assertEqual(client.call("find_fixtures"), [])
+
+    def test_permissions_are_checked_per_call(self):
+        client = self._login("op", "pw")
+        with self.assertRaises(ServiceError):
+            client.call("list_users")
+        with self.assertRaises(ServiceError):
+            client.call("delete_fixture", fixture_id="0012", username="op")
+        # 停用的帳號即使持有權杖也立即失效
+        self.backend.call("update_user", username="op", new_username="", password="", role="user", can_add=1,
+                          can_delete=0, active=0)
+        with self.assertRaises(ServiceError):
+            client.call("find_fixtures")
+
+    def test_actor_is_the_logged_in_user(self):
+        self._save_fixture(self._login("op", "pw"), username=ADMIN)
+        self.assertEqual(self._audit_users("fixture_save"), ["op"])
+
+    def test_locked_archive_is_raised_as_archive_locked(self):
+        client = self._login(ADMIN, ADMIN_PASSWORD)
+        client.call("log_events", entries=[[ADMIN, "login", "", "2025-01-15T08:00:00"]])
+        with log_archive._archive_lock(data_service.LOG_ARCHIVE_DIR):
+            with self.assertRaises(ArchiveLocked):
+                client.call("archive_all_logs")
+        self.assertEqual(client.call("archive_all_logs"), 1)
+        self.assertEqual(log_archive.list_archive_months(data_service.LOG_ARCHIVE_DIR), ["2025-01"])
+
+
+if __name__ == "__main__":
+    unittest.main()
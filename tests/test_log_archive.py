@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import log_archive
+import sync_engine
+from db_access import close_all, get_connection
+from migrations import run_migrations
+
+SCHEMA = """
+    CREATE TABLE activity_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        action TEXT,
+        filename TEXT,
+        timestamp TEXT
+    );
+"""
+
+
+class ArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        cache_dir = log_archive.CACHE_DIR
+        log_archive.CACHE_DIR = os.path.join(self.tmp.name, "cache")
+        self.addCleanup(setattr, log_archive, "CACHE_DIR", cache_dir)
+        self.archive_dir = self._path("archive")
+        self.server = self._path("server.db")
+        with self._connect(self.server) as conn:
+            conn.executescript(SCHEMA)
+            sync_engine.install_change_journal(conn)
+            self._log(conn, "Nelson", "server-0")
+
+    def tearDown(self):
+        close_all()
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _connect(self, path):
+        conn = sqlite3.connect(path)
+        self.addCleanup(conn.close)
+        return conn
+
+    def _log(self, conn, username, filename, timestamp="2025-01-15T08:00:00"):
+        conn.execute("INSERT INTO activity_logs (username, action, filename, timestamp) VALUES (?, 'upload', ?, ?)",
+                     (username, filename, timestamp))
+
+    def _logs(self, path):
+        return sorted(row[0] for row in self._connect(path).execute("SELECT filename FROM activity_logs"))
+
+    def _archived(self):
+        names = []
+        for month in log_archive.list_archive_months(self.archive_dir):
+            conn = log_archive.open_archive(self.archive_dir, month)
+            self.addCleanup(conn.close)
+            names += [row[0] for row in conn.execute("SELECT filename FROM activity_logs")]
+        return sorted(names)
+
+    def test_archive_all_moves_rows_by_month(self):
+        with self._connect(self.server) as conn:
+            self._log(conn, "Nelson", "server-1", "2025-02-01T08:00:00")
+
+        self.assertEqual(log_archive.archive_logs(self.server, self.archive_dir), 2)
+
+        self.assertEqual(log_archive.list_archive_months(self.archive_dir), ["2025-02", "2025-01"])
+        self.assertEqual(self._archived(), ["server-0", "server-1"])
+        self.assertEqual(self._logs(self.server), [])
+
+    def test_unsynced_rows_in_replica_are_not_archived(self):
+        # 兩個站台各自新增的紀錄在本機拿到相同的暫時 id，不可用暫時 id 封存
+        replica_a, replica_b = self._path("a.db"), self._path("b.db")
+        sync_engine.download_full_copy(self.server, replica_a)
+        sync_engine.download_full_copy(self.server, replica_b)
+        with self._connect(replica_a) as conn:
+            self._log(conn, "A", "a-0")
+        with self._connect(replica_b) as conn:
+            self._log(conn, "B", "b-0")
+
+        self.assertEqual(log_archive.archive_logs(replica_a, self.archive_dir), 1)
+        self.assertEqual(self._logs(replica_a), ["a-0"])
+        close_all()
+        for replica in (replica_a, replica_b):
+            self.assertIsNotNone(sync_engine.synchronize(replica, self.server))
+        log_archive.archive_logs(replica_b, self.archive_dir)
+        close_all()
+        self.assertIsNotNone(sync_engine.synchronize(replica_b, self.server))
+
+        self.assertEqual(self._archived(), ["a-0", "b-0", "server-0"])
+        self.assertEqual(self._logs(self.server), [])
+
+    def test_locked_archive_raises(self):
+        with log_archive._archive_lock(self.archive_dir):
+            with self.assertRaises(log_archive.ArchiveLocked):
+                log_archive.archive_logs(self.server, self.archive_dir)
+            self.assertEqual(log_archive.archive_old_logs(self.server, self.archive_dir, retention_days=0), 0)
+        self.assertEqual(self._logs(self.server), ["server-0"])
+        self.assertEqual(log_archive.archive_logs(self.server, self.archive_dir), 1)
+
+
+class RollupBackfillTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        cache_dir = log_archive.CACHE_DIR
+        log_archive.CACHE_DIR = os.path.join(self.tmp.name, "cache")
+        self.addCleanup(setattr, log_archive, "CACHE_DIR", cache_dir)
+        self.archive_dir = os.path.join(self.tmp.name, "archive")
+        self.db = os.path.join(self.tmp.name, "t.db")
+        with get_connection(self.db) as conn:
+            run_migrations(conn)
+            for day in ("2025-01-15", "2025-02-15", "2025-03-15"):
+                conn.execute("INSERT INTO activity_logs (username, action, filename, timestamp) "
+                             "VALUES ('Nelson', 'upload', 'x.pdf', ?)", (f"{day}T08:00:00",))
+
+    def tearDown(self):
+        close_all()
+        self.tmp.cleanup()
+
+    def _counts(self):
+        return get_connection(self.db).execute("SELECT day, count FROM activity_daily ORDER BY day").fetchall()
+
+    def _pending(self):
+        return get_connection(self.db).execute("SELECT name FROM pending_backfills").fetchall()
+
+    def test_migration_only_marks_backfill(self):
+        self.assertFalse(os.path.exists(self.archive_dir))
+        self.assertEqual(self._pending(), [("activity_daily",)])
+
+    def test_archived_rows_are_counted_once(self):
+        log_archive.archive_logs(self.db, self.archive_dir, before="2025-03")
+        # 模擬封存後彙總表被重新計算（例如整份重新下載的副本）而少了封存的月份
+        with get_connection(self.db) as conn:
+            conn.execute("DELETE FROM activity_daily WHERE day < '2025-03'")
+            conn.execute("INSERT INTO activity_logs (id, username, action, filename, timestamp) "
+                         "SELECT 1, 'Nelson', 'upload', 'x.pdf', '2025-01-15T08:00:00'")
+
+        self.assertTrue(log_archive.backfill_activity_rollups(self.db, self.archive_dir))
+
+        self.assertEqual(self._counts(), [("2025-01-15", 1), ("2025-02-15", 1), ("2025-03-15", 1)])
+        self.assertEqual(self._pending(), [])
+
+    def test_unreadable_archive_is_skipped_and_retried(self):
+        log_archive.archive_logs(self.db, self.archive_dir, before="2025-03")
+        broken = log_archive._archive_path(self.archive_dir, "2025-01")
+        with open(broken, "rb") as f:
+            good = f.read()
+        with open(broken, "wb") as f:
+            f.write(b"not a gzip file")
+        with get_connection(self.db) as conn:
+            conn.execute("UPDATE activity_daily SET count = 7 WHERE day = '2025-01-15'")
+            conn.execute("DELETE FROM activity_daily WHERE day = '2025-02-15'")
+
+        self.assertFalse(log_archive.backfill_activity_rollups(self.db, self.archive_dir))
+        self.assertEqual(self._counts(), [("2025-01-15", 7), ("2025-02-15", 1), ("2025-03-15", 1)])
+        self.assertEqual(self._pending(), [("activity_daily",)])
+
+        with open(broken, "wb") as f:
+            f.write(good)
+        self.assertTrue(log_archive.backfill_activity_rollups(self.db, self.archive_dir))
+        self.assertEqual(self._counts(), [("2025-01-15", 1), ("2025-02-15", 1), ("2025-03-15", 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
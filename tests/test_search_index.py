@@ -0,0 +1,80 @@
+import sqlite3
+import unittest
+
+import search_index
+from migrations import run_migrations
+
+SOP_DIR = "\\\\192.120.100.177\\工程部\\生產管理\\上齊SOP大禮包\\組裝SOP\\"
+
+
+class SearchIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.addCleanup(self.conn.close)
+        run_migrations(self.conn)
+        products = [
+            ("12345678", "電源板", SOP_DIR + "20250101080000_0a1b2c3d_POWER_SOP.pdf", "2025-01-01"),
+            ("87654321", "控制板", SOP_DIR + "20250102080000_CTRL.pdf", "2025-01-02"),
+            ("11112222", "顯示板", SOP_DIR, "2025-01-03"),
+        ]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO issues (product_code, product_name, assembly_sop, created_at) VALUES (?, ?, ?, ?)",
+                products)
+
+    def _codes(self, keyword, **kwargs):
+        rows, _ = search_index.search_issues_page(self.conn, keyword, **kwargs)
+        return [row[0] for row in rows]
+
+    def test_original_name_strips_upload_prefix(self):
+        for stored, expected in [
+            (SOP_DIR + "20250101080000_0a1b2c3d_POWER_SOP.pdf", "POWER_SOP.pdf"),
+            ("a/b/20250101080000_CTRL.pdf", "CTRL.pdf"),
+            ("plain.pdf", "plain.pdf"),
+            (SOP_DIR, ""),
+            (None, ""),
+        ]:
+            name = self.conn.execute(f"SELECT {search_index._original_name('v')} FROM (SELECT ? AS v)",
+                                     (stored,)).fetchone()[0]
+            self.assertEqual(name, expected, stored)
+
+    @unittest.skipUnless(search_index.fts_available(), "SQLite 未編入 FTS5")
+    def test_index_holds_only_original_file_names(self):
+        texts = [row[0] for row in self.conn.execute("SELECT sop_files FROM issues_fts ORDER BY rowid")]
+        self.assertEqual(texts, ["POWER_SOP.pdf", "CTRL.pdf", ""])
+        # 資料夾路徑與上傳時加上的時間、雜湊不應比對到
+        self.assertEqual(self._codes("工程部"), [])
+        self.assertEqual(self._codes("2025010"), [])
+        self.assertEqual(self._codes("0a1b2c"), [])
+        self.assertEqual(self._codes("POWER"), ["12345678"])
+
+    def test_short_keywords_match_sop_names(self):
+        self.assertEqual(self._codes("CT"), ["87654321"])
+        self.assertEqual(self._codes("工程"), [])
+        self.assertEqual(self._codes("_S"), ["12345678"])
+
+    def test_prefix_matches_first_then_keyset_pages(self):
+        with self.conn:
+            self.conn.execute("INSERT INTO issues (product_code, product_name, created_at) "
+                              "VALUES ('99999999', '12345678 替代品', '2025-02-01')")
+        self.assertEqual(self._codes("12345678"), ["12345678", "99999999"])
+
+        pages, after = [], None
+        while True:
+            rows, after = search_index.search_issues_page(self.conn, "", after=after, limit=2)
+            pages.append([row[0] for row in rows])
+            if after is None:
+                break
+        # 最後一頁剛好取滿時還會多查一次空頁
+        self.assertEqual(pages, [["99999999", "11112222"], ["87654321", "12345678"], []])
+        self.assertEqual(self._codes("", sort_desc=False), ["12345678", "87654321", "11112222", "99999999"])
+
+    def test_updates_are_reindexed(self):
+        with self.conn:
+            self.conn.execute("UPDATE issues SET assembly_sop=? WHERE product_code='11112222'",
+                              (SOP_DIR + "20250301080000_deadbeef_LCD.pdf",))
+        self.assertEqual(self._codes("LCD"), ["11112222"])
+
+
+if __name__ == "__main__":
+    unittest.main()
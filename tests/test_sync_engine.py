@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import sync_engine
+
+SCHEMA = """
+    CREATE TABLE issues (
+        product_code TEXT PRIMARY KEY,
+        product_name TEXT,
+        assembly_sop TEXT,
+        test_sop TEXT,
+        packaging_sop TEXT,
+        oqc_checklist TEXT,
+        created_by TEXT,
+        created_at TEXT
+    );
+    CREATE TABLE users (
+        username TEXT PRIMARY KEY,
+        password TEXT,
+        role TEXT DEFAULT 'user',
+        can_add INTEGER DEFAULT 1,
+        can_delete INTEGER DEFAULT 0,
+        active INTEGER DEFAULT 1
+    );
+    CREATE TABLE activity_logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT,
+        action TEXT,
+        filename TEXT,
+        timestamp TEXT
+    );
+"""
+
+
+class TwoReplicaSyncTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.server = self._path("server.db")
+        with self._connect(self.server) as conn:
+            conn.executescript(SCHEMA)
+            sync_engine.install_change_journal(conn)
+            for i in range(3):
+                self._log(conn, "Nelson", f"server-{i}")
+        self.replica_a = self._path("a.db")
+        self.replica_b = self._path("b.db")
+        sync_engine.download_full_copy(self.server, self.replica_a)
+        sync_engine.download_full_copy(self.server, self.replica_b)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def _connect(self, path):
+        conn = sqlite3.connect(path)
+        self.addCleanup(conn.close)
+        return conn
+
+    def _log(self, conn, username, filename):
+        conn.execute("INSERT INTO activity_logs (username, action, filename, timestamp) VALUES (?, 'upload', ?, '')",
+                     (username, filename))
+
+    def _logs(self, path):
+        return sorted(row[0] for row in self._connect(path).execute("SELECT filename FROM activity_logs"))
+
+    def test_full_download_does_not_push_server_rows_back(self):
+        for replica in (self.replica_a, self.replica_b):
+            stats = sync_engine.synchronize(replica, self.server)
+            self.assertEqual(stats["pushed"], 0)
+        self.assertEqual(self._logs(self.server), ["server-0", "server-1", "server-2"])
+        self.assertEqual(self._logs(self.replica_a), self._logs(self.server))
+        self.assertEqual(self._logs(self.replica_b), self._logs(self.server))
+
+    def test_replicas_converge(self):
+        with self._connect(self.replica_a) as conn:
+            self._log(conn, "A", "a-0")
+            conn.execute("INSERT INTO issues (product_code, product_name) VALUES ('123456789012', 'from A')")
+        with self._connect(self.replica_b) as conn:
+            self._log(conn, "B", "b-0")
+
+        for replica in (self.replica_a, self.replica_b, self.replica_a):
+            self.assertIsNotNone(sync_engine.synchronize(replica, self.server))
+
+        expected = ["a-0", "b-0", "server-0", "server-1", "server-2"]
+        for path in (self.server, self.replica_a, self.replica_b):
+            self.assertEqual(self._logs(path), expected)
+            names = self._connect(path).execute("SELECT product_name FROM issues").fetchall()
+            self.assertEqual(names, [("from A",)])
+
+    def test_local_only_column_is_added_on_server(self):
+        with self._connect(self.replica_a) as conn:
+            conn.execute("ALTER TABLE issues ADD COLUMN dip_sop TEXT")
+            conn.execute("INSERT INTO issues (product_code, dip_sop) VALUES ('123456789012', 'dip.pdf')")
+
+        self.assertIsNotNone(sync_engine.synchronize(self.replica_a, self.server))
+
+        row = self._connect(self.server).execute("SELECT dip_sop FROM issues").fetchone()
+        self.assertEqual(row, ("dip.pdf",))
+
+    def _last_pulled(self, path):
+        return int(self._connect(path).execute("SELECT value FROM sync_meta WHERE key='last_pulled_seq'").fetchone()[0])
+
+    def test_resync_keeps_last_applied_seq(self):
+        before = self._last_pulled(self.replica_b)
+        with self._connect(self.replica_a) as conn:
+            self._log(conn, "A", "a-0")
+        self.assertIsNotNone(sync_engine.synchronize(self.replica_a, self.server))
+        # 伺服器日誌已清到 B 上次同步之後，B 沒拉到的異動不能跳過
+        with self._connect(self.server) as conn:
+            seq = conn.execute("SELECT MAX(seq) FROM sync_journal").fetchone()[0]
+            sync_engine._meta_set(conn, "main", "pruned_seq", seq)
+        with self._connect(self.replica_b) as conn:
+            self._log(conn, "B", "b-0")
+
+        stats = sync_engine.synchronize(self.replica_b, self.server)
+
+        self.assertTrue(stats["resync"])
+        self.assertEqual(stats["pulled"], 0)
+        self.assertEqual(self._last_pulled(self.replica_b), before)
+        # 下次啟動整份重新下載，兩個站台的紀錄都在
+        self.assertEqual(sync_engine.open_local_replica(self.server, self.replica_b), None)
+        self.assertEqual(self._logs(self.replica_b), ["a-0", "b-0", "server-0", "server-1", "server-2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
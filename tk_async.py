@@ -0,0 +1,112 @@
+import queue
+import threading
+
+from db_access import close_thread_connections
+
+# 在背景執行緒執行耗時工作，完成後透過 after() 輪詢把結果交回 Tk 主執行緒
+POLL_INTERVAL_MS = 50
+
+
+def run_in_background(widget, func, on_done, on_error=None):
+    """於背景執行 func()，成功時在主執行緒呼叫 on_done(result)，失敗時呼叫 on_error(exc)。"""
+    results = queue.Queue(maxsize=1)
+
+    def worker():
+        # 每次都是新的執行緒，結束前關閉 func 經 db_access 開啟的連線，否則會一直留在連線清單中
+        try:
+            results.put((True, func()))
+        except Exception as e:
+            results.put((False, e))
+        finally:
+            close_thread_connections()
+
+    def poll():
+        try:
+            ok, value = results.get_nowait()
+        except queue.Empty:
+            widget.after(POLL_INTERVAL_MS, poll)
+            return
+        if ok:
+            on_done(value)
+        elif on_error:
+            on_error(value)
+
+    threading.Thread(target=worker, daemon=True).start()
+    widget.after(POLL_INTERVAL_MS, poll)
+
+
+class QueryRunner:
+    """以一條常駐背景執行緒執行查詢，結果經 after() 交回主執行緒。
+
+    只有最新送出的查詢有效：送出新查詢或呼叫 cancel() 後，較舊的查詢若尚未開始就不執行，
+    已在執行的結果也會被丟棄。on_busy(bool) 於開始與結束等待時在主執行緒呼叫，供顯示載入中。
+    查詢固定在同一條執行緒執行，db_access 的每執行緒連線可以重複使用。
+    """
+
+    def __init__(self, widget, on_busy=None):
+        self._widget = widget
+        self._on_busy = on_busy
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        self._generation = 0
+        self._busy = False
+        self._polling = False
+        threading.Thread(target=self._work, name="query-runner", daemon=True).start()
+
+    @property
+    def busy(self):
+        return self._busy
+
+    def submit(self, func, on_done, on_error=None):
+        # on_error 為 None 時例外交由 Tk 的 report_callback_exception 處理
+        self._generation += 1
+        self._requests.put((self._generation, func, on_done, on_error))
+        self._set_busy(True)
+        if not self._polling:
+            self._polling = True
+            self._widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def cancel(self):
+        self._generation += 1
+        self._set_busy(False)
+
+    def _set_busy(self, busy):
+        if busy != self._busy:
+            self._busy = busy
+            if self._on_busy:
+                self._on_busy(busy)
+
+    def _work(self):
+        while True:
+            generation, func, on_done, on_error = self._requests.get()
+            if generation != self._generation:
+                continue
+            try:
+                self._results.put((generation, True, func(), on_done, on_error))
+            except Exception as e:
+                self._results.put((generation, False, e, on_done, on_error))
+
+    def _poll(self):
+        # 已被取代的結果直接丟棄
+        result = None
+        while result is None:
+            try:
+                result = self._results.get_nowait()
+            except queue.Empty:
+                break
+            if result[0] != self._generation:
+                result = None
+        if self._busy and result is None:
+            self._widget.after(POLL_INTERVAL_MS, self._poll)
+            return
+        self._polling = False
+        if result is None:
+            return
+        _, ok, value, on_done, on_error = result
+        self._set_busy(False)
+        if ok:
+            on_done(value)
+        elif on_error:
+            on_error(value)
+        else:
+            raise value
@@ -0,0 +1,153 @@
+import errno
+import os
+import queue
+import threading
+import time
+
+from perf import timed
+
+# 上傳 SOP 到網路磁碟的背景佇列：多條工作執行緒平行複製，結果透過 Tk 的 after() 輪詢回主執行緒
+CHUNK_SIZE = 1024 * 1024
+POLL_INTERVAL_MS = 100
+
+
+class TransferQueueFull(Exception):
+    pass
+
+
+def _check_not_exists(dst):
+    if os.path.exists(dst):
+        raise FileExistsError(errno.EEXIST, "目的檔案已存在，不覆蓋", dst)
+
+
+def _copy_once(src, dst, on_progress):
+    total = os.path.getsize(src) or 1
+    done = 0
+    # 先寫入暫存檔再改名，避免網路磁碟上留下不完整的 SOP；已存在的 SOP 一律不覆蓋
+    _check_not_exists(dst)
+    part = dst + ".part"
+    try:
+        with open(src, "rb") as fin, open(part, "wb") as fout:
+            while True:
+                chunk = fin.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                fout.write(chunk)
+                done += len(chunk)
+                if on_progress:
+                    on_progress(min(99, done * 100 // total))
+        _check_not_exists(dst)
+        os.replace(part, dst)
+    except OSError:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    if on_progress:
+        on_progress(100)
+
+
+def copy_file(src, dst, retries=3, retry_delay=0.5, on_progress=None):
+    # 分塊複製並回報進度；網路磁碟偶發斷線時退避重試，來源檔不存在則直接失敗
+    attempt = 0
+    while True:
+        try:
+            with timed("file.copy", os.path.basename(src)):
+                _copy_once(src, dst, on_progress)
+            return
+        except FileExistsError:
+            raise
+        except OSError:
+            attempt += 1
+            if attempt > retries or not os.path.exists(src):
+                raise
+            time.sleep(retry_delay * (2 ** (attempt - 1)))
+
+
+class TransferManager:
+    def __init__(self, widget, max_workers=4, max_pending=32, retries=3, retry_delay=0.5):
+        self._widget = widget
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._events = queue.Queue()
+        self._retries = retries
+        self._retry_delay = retry_delay
+        self._batches = {}
+        self._batch_seq = 0
+        self._polling = False
+        for i in range(max_workers):
+            threading.Thread(target=self._worker, name=f"sop-upload-{i}", daemon=True).start()
+
+    def submit_batch(self, jobs, on_progress=None, on_complete=None, prepare=None):
+        """排入一批檔案複製工作，jobs 為 [(key, 來源路徑, 目的路徑), ...]。
+
+        on_progress(key, percent) 與 on_complete(results) 都在 Tk 主執行緒呼叫；
+        results 為 {key: (成功與否, 目的路徑或錯誤訊息)}。佇列已滿時丟出 TransferQueueFull。
+        prepare(key, 來源路徑) 會先在工作執行緒呼叫（例如計算內容雜湊），回傳 (目的路徑, 是否需要複製)，
+        此時 jobs 的目的路徑可為 None；不需複製時直接以該路徑回報成功。
+        """
+        self._batch_seq += 1
+        batch_id = self._batch_seq
+        if not jobs:
+            if on_complete:
+                self._widget.after(0, on_complete, {})
+            return batch_id
+        if self._jobs.maxsize - self._jobs.qsize() < len(jobs):
+            raise TransferQueueFull("上傳佇列已滿，請稍後再試")
+        self._batches[batch_id] = {
+            "remaining": len(jobs),
+            "results": {},
+            "on_progress": on_progress,
+            "on_complete": on_complete,
+        }
+        for key, src, dst in jobs:
+            self._jobs.put_nowait((batch_id, key, src, dst, prepare))
+        self._start_polling()
+        return batch_id
+
+    def _worker(self):
+        while True:
+            batch_id, key, src, dst, prepare = self._jobs.get()
+            try:
+                needs_copy = True
+                if prepare:
+                    dst, needs_copy = prepare(key, src)
+                if needs_copy:
+                    self._copy_with_retry(batch_id, key, src, dst)
+                self._events.put(("done", batch_id, key, True, dst))
+            except Exception as e:
+                self._events.put(("done", batch_id, key, False, str(e)))
+            finally:
+                self._jobs.task_done()
+
+    def _copy_with_retry(self, batch_id, key, src, dst):
+        copy_file(src, dst, self._retries, self._retry_delay,
+                  lambda percent: self._events.put(("progress", batch_id, key, percent)))
+
+    def _start_polling(self):
+        if not self._polling:
+            self._polling = True
+            self._widget.after(POLL_INTERVAL_MS, self._poll)
+
+    def _poll(self):
+        while True:
+            try:
+                event = self._events.get_nowait()
+            except queue.Empty:
+                break
+            batch = self._batches.get(event[1])
+            if batch is None:
+                continue
+            if event[0] == "progress":
+                if batch["on_progress"]:
+                    batch["on_progress"](event[2], event[3])
+            else:
+                _, batch_id, key, ok, info = event
+                batch["results"][key] = (ok, info)
+                batch["remaining"] -= 1
+                if batch["remaining"] == 0:
+                    del self._batches[batch_id]
+                    if batch["on_complete"]:
+                        batch["on_complete"](batch["results"])
+        if self._batches:
+            self._widget.after(POLL_INTERVAL_MS, self._poll)
+        else:
+            self._polling = False